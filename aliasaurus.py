@@ -1,11 +1,30 @@
 import sys
+import time
 
-from PyQt5.QtWidgets import QApplication
+if __name__ == "__main__":
+    start = time.perf_counter()
+    args = sys.argv[1:]
+    profile_startup = "--profile-startup" in args
+    if profile_startup:
+        args.remove("--profile-startup")
 
-from app.main_window import MainWindow
+    if args:
+        # Command line usage never imports Qt, so it starts quickly.
+        from app.cli import main
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
+        sys.exit(main(args))
+
+    from PyQt5.QtWidgets import QApplication
+
+    from app.main_window import MainWindow
+    from app.startup_profile import StartupProfile
+
+    startup_profile = StartupProfile(start) if profile_startup else None
+    if startup_profile is not None:
+        startup_profile.mark("imports")
+    app = QApplication(sys.argv[:1] + args)
+    if startup_profile is not None:
+        startup_profile.mark("application created")
+    window = MainWindow(startup_profile)
     window.show()
     sys.exit(app.exec_())
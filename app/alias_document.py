@@ -0,0 +1,166 @@
+import os
+from collections.abc import Mapping
+
+from app.alias_groups import LOAD_MACRO, LOAD_MACRO_NAME, is_load_macro
+from app.alias_index import (
+    MACROFILE_PREFIX,
+    decode_commands,
+    encode_commands,
+    is_definition,
+    parse_definition,
+    parse_loader,
+)
+from app.atomic_write import atomic_write
+
+
+class DocumentLine:
+    """A single line of an alias file, kept verbatim including its line ending."""
+
+    __slots__ = ("_commands", "body", "load_macro", "loader", "name", "text")
+
+    def __init__(self, text: str, macrofile: bool):
+        self.text = text
+        self.name: str | None = None
+        self.body = ""
+        self.loader: str | None = None
+        self.load_macro = False
+        self._commands: list[str] | None = None
+        if is_definition(text, macrofile):
+            definition = parse_definition(text, macrofile)
+            if definition is not None and not macrofile and is_load_macro(*definition):
+                self.load_macro = True
+            elif definition is not None:
+                self.name, self.body = definition
+        elif not macrofile:
+            self.loader = parse_loader(text)
+
+    def is_managed(self) -> bool:
+        """Check whether the line is one the app writes to `alias.cmd` to load the aliases, rather than an alias."""
+        return self.loader is not None or self.load_macro
+
+    def commands(self) -> list[str]:
+        """The decoded commands of a definition line."""
+        if self._commands is None:
+            self._commands = decode_commands(self.body)
+        return self._commands
+
+
+class AliasDocument:
+    """A lossless concrete syntax tree of an alias file or macro file.
+
+    Every line is kept verbatim, including lines Aliasaurus does not understand such as `set`, `cd` and `REM`. Updating
+    the document only re-renders the definitions that changed, and saving skips the write entirely when nothing did.
+    """
+
+    def __init__(self, path: str, macrofile: bool):
+        self.path = path
+        self.macrofile = macrofile
+        self.lines: list[DocumentLine] = []
+        self.newline = os.linesep
+        self.stamp: tuple[int, int] | None = None
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                text = file.read().decode("utf-8", errors="replace")
+            self.lines = [DocumentLine(line, macrofile) for line in text.splitlines(keepends=True)]
+            if self.lines and self.lines[0].text.endswith("\r\n"):
+                self.newline = "\r\n"
+            elif self.lines and self.lines[0].text.endswith("\n"):
+                self.newline = "\n"
+            self.stamp = self._stat()
+
+    def is_stale(self) -> bool:
+        """Check whether the file has changed on disk since it was loaded or saved."""
+        return self.stamp != self._stat()
+
+    def update(self, aliases: Mapping[str, list[str]]) -> bool:
+        """Update the definitions in the document to match the aliases.
+
+        Definitions are filled in order into the lines that held definitions before, surplus definitions are removed and
+        new ones are appended after the last definition. Definitions that are unchanged keep their original text.
+
+        Args:
+            aliases (Mapping[str, list[str]]): A mapping of aliases to their commands, in order.
+
+        Returns:
+            bool: True if the document changed.
+        """
+        existing = {line.name: line for line in self.lines if line.name is not None}
+        pending = iter(aliases.items())
+        lines = []
+        last_definition = -1
+        for line in self.lines:
+            if line.name is None:
+                lines.append(line)
+                continue
+            item = next(pending, None)
+            if item is not None:
+                lines.append(self._definition(*item, existing))
+                last_definition = len(lines) - 1
+        appended = [self._definition(name, commands, existing) for name, commands in pending]
+        if last_definition == -1:
+            lines.extend(appended)
+        else:
+            lines[last_definition + 1 : last_definition + 1] = appended
+        return self._replace_lines(lines)
+
+    def set_loaders(self, macrofiles: list[str], load_macro: bool = False) -> bool:
+        """Make the document load macro files, with one `DOSKEY /MACROFILE=...` line each, in order.
+
+        Args:
+            macrofiles (list[str]): The paths of the macro files as written to the file. Any other macro files loaded
+                by the document are no longer loaded.
+            load_macro (bool): Also define the macro that loads alias groups on demand, after the macro files so an
+                alias can't replace it.
+
+        Returns:
+            bool: True if the document changed.
+        """
+        lines = [line for line in self.lines if not line.is_managed()]
+        loaders = {line.loader: line for line in self.lines if line.loader is not None}
+        managed = []
+        for macrofile_data in macrofiles:
+            loader = loaders.get(macrofile_data)
+            if loader is None:
+                loader = DocumentLine(f'{MACROFILE_PREFIX.upper()}"{macrofile_data}"{self.newline}', macrofile=False)
+            managed.append(loader)
+        if load_macro:
+            macro = next((line for line in self.lines if line.load_macro), None)
+            if macro is None:
+                macro = DocumentLine(f"DOSKEY {LOAD_MACRO_NAME}={LOAD_MACRO}{self.newline}", macrofile=False)
+            managed.append(macro)
+        # Keep the loaders after the @echo off so loading them is not echoed.
+        position = 1 if lines and lines[0].text.strip().lower() == "@echo off" else 0
+        lines[position:position] = managed
+        return self._replace_lines(lines)
+
+    def render(self) -> str:
+        """Render the document back to text."""
+        texts = [line.text for line in self.lines]
+        for i, text in enumerate(texts[:-1]):
+            if not text.endswith("\n"):
+                texts[i] = text + self.newline
+        return "".join(texts)
+
+    def save(self):
+        """Atomically write the document to its file."""
+        atomic_write(self.path, self.render())
+        self.stamp = self._stat()
+
+    def _definition(self, name: str, commands: list[str], existing: dict[str, DocumentLine]) -> DocumentLine:
+        line = existing.get(name)
+        if line is not None and line.commands() == commands:
+            return line
+        prefix = "" if self.macrofile else "DOSKEY "
+        return DocumentLine(f"{prefix}{name}={encode_commands(commands)}{self.newline}", self.macrofile)
+
+    def _replace_lines(self, lines: list[DocumentLine]) -> bool:
+        changed = len(lines) != len(self.lines) or any(a is not b for a, b in zip(lines, self.lines, strict=True))
+        self.lines = lines
+        return changed
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
@@ -1,6 +1,15 @@
+import html
+
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QLabel, QLineEdit, QPlainTextEdit, QVBoxLayout, QWidget
+from PyQt5.QtGui import QColor, QFont, QTextCharFormat, QTextCursor
+from PyQt5.QtWidgets import QLabel, QLineEdit, QPlainTextEdit, QTextEdit, QVBoxLayout, QWidget
+
+from app.alias_store import COMMAND_SEPARATOR
+from app.macro_lint import ERROR, Diagnostic
+
+ERROR_COLOR = QColor(220, 50, 47)
+WARNING_COLOR = QColor(203, 140, 0)
+MAX_LISTED_DIAGNOSTICS = 5
 
 
 class AliasEdit(QWidget):
@@ -11,8 +20,12 @@ class AliasEdit(QWidget):
     def __init__(self):
         super().__init__()
         self.selected_alias = ""
-        self.selected_alias_commands: list[str] = []
+        # Shared with the alias store rather than copied.
+        self.original_text = ""
         self.has_unsaved_changes = False
+        # The saved commands are only compared with the edited ones when the lengths match, and then by hash.
+        self._original_length = 0
+        self._original_hash = hash("")
 
         self.name_edit = QLineEdit()
         self.name_edit.setFont(QFont("Consolas"))
@@ -21,36 +34,52 @@ class AliasEdit(QWidget):
         self.commands_edit = QPlainTextEdit()
         self.commands_edit.setFont(QFont("Consolas"))
         self.commands_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
-        self.commands_edit.textChanged.connect(self._check_unsaved_changes)
         self.commands_edit.setEnabled(False)
+        # The document tracks whether it was modified, including undoing back to the saved commands.
+        document = self.commands_edit.document()
+        assert document is not None
+        self.document = document
+        self.document.contentsChanged.connect(self._check_unsaved_changes)
+        self.document.modificationChanged.connect(self._check_unsaved_changes)
+
+        self.diagnostics_label = QLabel()
+        self.diagnostics_label.setWordWrap(True)
+        self.diagnostics_label.setVisible(False)
 
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Alias"))
         layout.addWidget(self.name_edit)
         layout.addWidget(QLabel("Commands"))
         layout.addWidget(self.commands_edit)
+        layout.addWidget(self.diagnostics_label)
         self.setLayout(layout)
 
     def clear(self):
         """Clear the alias edit fields and disable editing."""
-        self.selected_alias = ""
-        self.selected_alias_commands = []
-        self.name_edit.clear()
-        self.commands_edit.clear()
+        self.set("", "")
         self.name_edit.setEnabled(False)
         self.commands_edit.setEnabled(False)
 
-    def set(self, name: str, commands: list[str]):
+    def set(self, name: str, text: str):
         """
-        Set the alias edit fields and enable editing. This will also save a copy of the original alias so it can be
-        reverted to later or checked for unsaved changes.
+        Set the alias edit fields and enable editing. This will also keep the original alias so it can be reverted to
+        later or checked for unsaved changes.
+
+        Args:
+            name (str): The name of the alias.
+            text (str): The commands of the alias, one per line, e.g. from `AliasStore.text`.
         """
         self.selected_alias = name
-        self.selected_alias_commands = commands
+        self.original_text = text
+        self._original_length = len(text)
+        self._original_hash = hash(text)
+        self.set_diagnostics(())
         self.name_edit.setText(name)
-        self.commands_edit.setPlainText("\n".join(commands))
+        self.commands_edit.setPlainText(text)
+        self.document.setModified(False)
         self.name_edit.setEnabled(True)
         self.commands_edit.setEnabled(True)
+        self._check_unsaved_changes()
 
     def get(self) -> tuple[str, str, list[str]]:
         """Get the current alias edit fields.
@@ -58,14 +87,72 @@ class AliasEdit(QWidget):
         Returns:
             tuple[str, str, list[str]]: The original alias name, the new alias name, and the new alias commands.
         """
-        return self.selected_alias, self.name_edit.text(), self.commands_edit.toPlainText().split("\n")
+        if not self.document.isModified():
+            return self.selected_alias, self.name_edit.text(), self.original_text.split(COMMAND_SEPARATOR)
+        return self.selected_alias, self.name_edit.text(), self.commands_edit.toPlainText().split(COMMAND_SEPARATOR)
+
+    def set_original(self, text: str):
+        """Replace the saved alias that edits are compared against and reverted to, keeping any edits."""
+        self.original_text = text
+        self._original_length = len(text)
+        self._original_hash = hash(text)
+        # The edits may now match the saved copy, or the unedited text may no longer.
+        self.document.setModified(hash(self.commands_edit.toPlainText()) != self._original_hash)
+        self._check_unsaved_changes()
+
+    def set_diagnostics(self, diagnostics: tuple[Diagnostic, ...]):
+        """Show lint problems: underlined in the commands and listed below them.
+
+        Args:
+            diagnostics (tuple[Diagnostic, ...]): The problems found in the alias as it is being edited.
+        """
+        selections = []
+        for diagnostic in diagnostics:
+            block = self.document.findBlockByNumber(diagnostic.line)
+            if diagnostic.line < 0 or not block.isValid():
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.format = QTextCharFormat()
+            selection.format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.WaveUnderline)
+            selection.format.setUnderlineColor(ERROR_COLOR if diagnostic.severity == ERROR else WARNING_COLOR)
+            selection.format.setToolTip(diagnostic.message)
+            cursor = QTextCursor(block)
+            if diagnostic.length:
+                cursor.movePosition(QTextCursor.MoveOperation.Right, n=diagnostic.column)
+                cursor.movePosition(QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor, diagnostic.length)
+            else:
+                cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+        self.commands_edit.setExtraSelections(selections)
+
+        lines = [
+            f'<span style="color: {(ERROR_COLOR if diagnostic.severity == ERROR else WARNING_COLOR).name()}">'
+            f"{html.escape(diagnostic.describe())}</span>"
+            for diagnostic in diagnostics[:MAX_LISTED_DIAGNOSTICS]
+        ]
+        if len(diagnostics) > MAX_LISTED_DIAGNOSTICS:
+            lines.append(f"... and {len(diagnostics) - MAX_LISTED_DIAGNOSTICS} more")
+        self.diagnostics_label.setText("<br>".join(lines))
+        self.diagnostics_label.setVisible(bool(lines))
 
     def revert(self):
         """Revert any unsaved changes to the original alias."""
-        self.set(self.selected_alias, self.selected_alias_commands)
+        self.set(self.selected_alias, self.original_text)
 
     def _check_unsaved_changes(self):
-        unsaved_changes = self.commands_edit.toPlainText() != "\n".join(self.selected_alias_commands)
-        unsaved_changes |= self.name_edit.text() != self.selected_alias
-        self.has_unsaved_changes = unsaved_changes
-        self.unsaved_changes.emit(unsaved_changes)
+        """Update whether there are unsaved changes, emitting `unsaved_changes` if that changed.
+
+        Called on every key press, so the commands are only compared when the document says it was modified and its
+        length matches the saved commands (e.g. after retyping a deleted character), and then only by hash.
+        """
+        unsaved_changes = self.name_edit.text() != self.selected_alias
+        if not unsaved_changes and self.document.isModified():
+            # The document counts a final paragraph separator that is not part of the text.
+            if self.document.characterCount() - 1 != self._original_length:
+                unsaved_changes = True
+            else:
+                unsaved_changes = hash(self.commands_edit.toPlainText()) != self._original_hash
+        if unsaved_changes != self.has_unsaved_changes:
+            self.has_unsaved_changes = unsaved_changes
+            self.unsaved_changes.emit(unsaved_changes)
@@ -0,0 +1,221 @@
+import hashlib
+import itertools
+import logging
+import os
+from collections.abc import Iterable, Iterator, Mapping
+from typing import NamedTuple, TextIO
+
+from app.alias_formats import FORMATS, AliasFormat
+from app.alias_index import AliasIndex, ParseIssue, is_valid_command, is_valid_name
+from app.atomic_write import atomic_write
+
+# This module must never import PyQt5, the command line interface uses it.
+
+CONFLICT_SKIP = "skip"
+"""Keep the existing alias."""
+CONFLICT_OVERWRITE = "overwrite"
+"""Replace the commands of the existing alias."""
+CONFLICT_RENAME = "rename"
+"""Keep the existing alias and import the other one as `name_2`, `name_3` and so on."""
+CONFLICT_POLICIES = [CONFLICT_SKIP, CONFLICT_OVERWRITE, CONFLICT_RENAME]
+
+EXPORT_BATCH_SIZE = 1000
+"""The number of aliases decoded at a time when exporting straight from the alias file."""
+SHELL_EXPORT_NAME = "aliases"
+
+
+class ImportReport(NamedTuple):
+    """What an import changed, or would change."""
+
+    added: list[str]
+    overwritten: list[str]
+    renamed: dict[str, str]
+    """The aliases imported under a new name because the name was taken, by their name in the imported file."""
+    skipped: list[str]
+    """The aliases not imported because the name was taken."""
+    unchanged: list[str]
+    """The aliases that already exist with the same commands."""
+    issues: list[ParseIssue]
+    """The definitions that could not be imported."""
+
+    def describe(self) -> list[str]:
+        lines = [
+            f"{len(self.added)} added, {len(self.overwritten)} overwritten, {len(self.renamed)} renamed, "
+            f"{len(self.skipped)} skipped, {len(self.unchanged)} unchanged, {len(self.issues)} problem(s)"
+        ]
+        lines += [f"+ {name}" for name in self.added]
+        lines += [f"~ {name}" for name in self.overwritten]
+        lines += [f"> {name} as {new_name}" for name, new_name in self.renamed.items()]
+        lines += [f"= {name} (skipped)" for name in self.skipped]
+        lines += [f"! {issue}" for issue in self.issues]
+        return lines
+
+
+class ImportPlan(NamedTuple):
+    """The changes an import makes, worked out in one go before anything is changed."""
+
+    added: dict[str, list[str]]
+    """The new aliases in import order, including renamed ones under their new names."""
+    overwritten: dict[str, list[str]]
+    """The new commands of existing aliases."""
+    report: ImportReport
+
+
+def read_aliases(file: TextIO, path: str, alias_format: AliasFormat) -> tuple[dict[str, list[str]], list[ParseIssue]]:
+    """Read the aliases from a file. Like DOSKEY, the last definition of a name wins. Aliases with an invalid name or a
+    command that spans several lines are skipped.
+
+    Args:
+        file (TextIO): The file to read, one line at a time.
+        path (str): The path of the file, for the issues.
+        alias_format (AliasFormat): The format of the file.
+
+    Returns:
+        tuple[dict[str, list[str]], list[ParseIssue]]: The aliases in order, and the definitions that were skipped.
+    """
+    issues: list[ParseIssue] = []
+    aliases: dict[str, list[str]] = {}
+    lines: dict[str, int] = {}
+    for alias in alias_format.read(file, path, issues):
+        if not is_valid_name(alias.name):
+            issues.append(ParseIssue(path, alias.line_number, f"invalid alias name '{alias.name}'"))
+            continue
+        if not all(is_valid_command(command) for command in alias.commands):
+            # It would be written as more than one line, each run by cmd.exe as is.
+            issues.append(ParseIssue(path, alias.line_number, f"alias '{alias.name}' has a command with a line break"))
+            continue
+        if alias.name in aliases:
+            message = f"duplicate alias '{alias.name}', replaces the one at line {lines[alias.name]}"
+            issues.append(ParseIssue(path, alias.line_number, message))
+        aliases[alias.name] = alias.commands
+        lines[alias.name] = alias.line_number
+    return aliases, issues
+
+
+def plan_import(
+    imported: Mapping[str, list[str]], existing: Mapping[str, list[str]], policy: str, issues: list[ParseIssue]
+) -> ImportPlan:
+    """Resolve every conflict between imported aliases and existing ones in one batch.
+
+    Args:
+        imported (Mapping[str, list[str]]): The aliases to import, in order.
+        existing (Mapping[str, list[str]]): The current aliases. Only the commands of conflicting names are read.
+        policy (str): What to do with an imported alias whose name is taken by a different alias, see
+            `CONFLICT_POLICIES`.
+        issues (list[ParseIssue]): The problems found while reading the imported aliases, for the report.
+    """
+    assert policy in CONFLICT_POLICIES
+    report = ImportReport([], [], {}, [], [], issues)
+    added: dict[str, list[str]] = {}
+    overwritten: dict[str, list[str]] = {}
+    for name, commands in imported.items():
+        if name not in existing:
+            added[name] = commands
+            report.added.append(name)
+        elif existing[name] == commands:
+            report.unchanged.append(name)
+        elif policy == CONFLICT_OVERWRITE:
+            overwritten[name] = commands
+            report.overwritten.append(name)
+        elif policy == CONFLICT_RENAME:
+            new_name = next(
+                f"{name}_{suffix}"
+                for suffix in itertools.count(2)
+                if f"{name}_{suffix}" not in existing
+                and f"{name}_{suffix}" not in imported
+                and f"{name}_{suffix}" not in added
+            )
+            added[new_name] = commands
+            report.renamed[name] = new_name
+        else:
+            report.skipped.append(name)
+    return ImportPlan(added, overwritten, report)
+
+
+def iter_index(index: AliasIndex, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple[str, list[str]]]:
+    """Decode the aliases in an alias file a batch at a time, so exporting never holds them all in memory."""
+    names = iter(index.names())
+    while batch := list(itertools.islice(names, batch_size)):
+        yield from index.read(batch).items()
+
+
+def export_aliases(aliases: Iterable[tuple[str, list[str]]], path: str, alias_format: AliasFormat) -> int:
+    """Write aliases to a file in another format, one at a time.
+
+    Raises:
+        OSError: If the file can't be written.
+
+    Returns:
+        int: The number of aliases exported.
+    """
+    with open(path, "w", encoding="utf-8", newline=alias_format.newline) as file:
+        return alias_format.write(aliases, file)
+
+
+class ShellExports:
+    """Keeps copies of the aliases in the formats of other shells up to date, e.g. `aliases.sh` to source from bash.
+
+    Only the aliases that changed since the last update are rendered again, and a file is only written if its contents
+    changed. The rendered aliases are cached in memory, so updates after the first are cheap.
+    """
+
+    def __init__(self, directory: str, formats: Iterable[str] = ()):
+        """
+        Args:
+            directory (str): The directory to write the exports to.
+            formats (Iterable[str]): The formats to keep up to date, see `alias_formats.FORMATS`.
+        """
+        self.directory = directory
+        self.formats = list(formats)
+        self._rendered: dict[str, dict[str, tuple[list[str], str]]] = {}
+        self._digests: dict[str, bytes] = {}
+
+    def path(self, format_name: str) -> str:
+        return os.path.join(self.directory, SHELL_EXPORT_NAME + FORMATS[format_name].extensions[0])
+
+    def set_formats(self, formats: Iterable[str]):
+        """Change the formats to keep up to date. The exports of other formats are left as they are."""
+        self.formats = list(formats)
+
+    def update(self, aliases: Mapping[str, list[str]]) -> list[str]:
+        """Bring the exports up to date with the aliases.
+
+        Args:
+            aliases (Mapping[str, list[str]]): All the aliases, in order.
+
+        Returns:
+            list[str]: The paths of the files that were written.
+        """
+        written = []
+        formats = self.formats
+        for format_name in list(self._rendered):
+            if format_name not in formats:
+                del self._rendered[format_name]
+                self._digests.pop(format_name, None)
+        for format_name in formats:
+            alias_format = FORMATS[format_name]
+            previous = self._rendered.get(format_name, {})
+            rendered: dict[str, tuple[list[str], str]] = {}
+            reused = 0
+            for name, commands in aliases.items():
+                cached = previous.get(name)
+                if cached is not None and cached[0] == commands:
+                    rendered[name] = cached
+                    reused += 1
+                else:
+                    rendered[name] = (commands, alias_format.render(name, commands))
+            self._rendered[format_name] = rendered
+            text = (
+                alias_format.header
+                + alias_format.separator.join(entry[1] for entry in rendered.values())
+                + alias_format.footer
+            ).replace("\n", alias_format.newline)
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            path = self.path(format_name)
+            if digest == self._digests.get(format_name) and os.path.exists(path):
+                continue
+            atomic_write(path, text)
+            self._digests[format_name] = digest
+            written.append(path)
+            logging.info(f"Updated {path}, {len(rendered) - reused} of {len(rendered)} aliases rendered.")
+        return written
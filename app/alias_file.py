@@ -1,84 +1,349 @@
+import contextlib
+import json
 import logging
 import os
-import shutil
-import winreg as reg
-from datetime import datetime
+import time
+from collections.abc import Iterable, Mapping
+from typing import NamedTuple
+
+from app.alias_document import AliasDocument
+from app.alias_exchange import ShellExports
+from app.alias_groups import (
+    CORE_GROUP,
+    GROUP_EXTENSION,
+    GROUP_MANIFEST_NAME,
+    AliasGroup,
+    group_loader,
+    load_groups,
+    save_groups,
+)
+from app.alias_index import AliasIndex, decode_commands, encode_commands, escape_batch, unescape_batch
+from app.atomic_write import atomic_write
+from app.backup_store import BackupStore, RetentionPolicy, Snapshot
+from app.platform_backend import PlatformBackend, default_backend
+from app.timings import TIMINGS
 
-KEY_PATH = r"Software\Microsoft\Command Processor"
-VALUE_NAME = "AutoRun"
 VALUE_DATA = "%APPDATA%\\aliasaurus\\alias.cmd"
+MACROFILE_DATA = "%APPDATA%\\aliasaurus\\macros.doskey"
+
+SETUP_STATE_VERSION = 1
+SETUP_RECHECK_S = 24 * 60 * 60
+"""How long a verified setup is trusted for before the registry is checked again, in case another program changed it."""
+
+FILE_FORMAT_INLINE = "inline"
+"""One `DOSKEY name=...` line per alias in `alias.cmd`. Runs `doskey.exe` once per alias on every shell start."""
+FILE_FORMAT_MACROFILE = "macrofile"
+"""All aliases in a single macro file, loaded by one `DOSKEY /MACROFILE=...` line in `alias.cmd`."""
+FILE_FORMATS = [FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE]
+
 
-ALIAS_CMD_PATH = os.path.join(os.environ["APPDATA"], "aliasaurus", "alias.cmd")
+class Migration(NamedTuple):
+    """The aliases a change of the alias file format rewrote."""
+
+    translated: dict[str, list[str]]
+    """The new commands of the aliases whose escapes were translated to the new format."""
+    expanded: list[str]
+    """The aliases with `%VARIABLES%` or batch arguments, which were expanded when `alias.cmd` ran and are now expanded
+    when the alias runs."""
 
 
 class AliasFile:
-    def __init__(self):
-        self.setup()
+    def __init__(
+        self,
+        file_format: str = FILE_FORMAT_INLINE,
+        defer_setup: bool = False,
+        backend: PlatformBackend | None = None,
+        shell_exports: Iterable[str] = (),
+    ):
+        """
+        Args:
+            file_format (str): The format to encode the aliases in.
+            defer_setup (bool): Don't set up the alias file yet. `setup` must be called before the file is used.
+            backend (PlatformBackend | None): The registry and paths to use. Defaults to those of this platform.
+            shell_exports (Iterable[str]): The formats of other shells to keep a copy of the aliases in, see
+                `alias_formats.FORMATS`.
+        """
+        assert file_format in FILE_FORMATS
+        self.file_format = file_format
+        self.backend = default_backend() if backend is None else backend
+        self.paths = self.backend.paths()
+        self._documents: dict[str, AliasDocument] = {}
+        self.groups = load_groups(self.paths.groups)
+        """The named groups, in order. The core group comes before them and is not listed."""
+        self.backups = BackupStore(self.paths.backups, [self.paths.alias_cmd, self.paths.macrofile], self.paths.groups)
+        self.exports = ShellExports(self.paths.exports, shell_exports)
+        if not defer_setup:
+            self.setup()
 
-    def setup(self):
-        """Set up the alias file."""
+    def setup(self, force: bool = False):
+        """Set up the alias file: make cmd.exe run it on start and create it if needed.
+
+        The registry is only checked if the setup has not been verified recently, so most launches skip it.
+
+        Args:
+            force (bool): Check the registry even if the setup was verified recently.
+        """
         logging.info("Setting up alias file...")
-        try:
-            with reg.OpenKey(reg.HKEY_CURRENT_USER, KEY_PATH, 0, reg.KEY_ALL_ACCESS) as key:
-                if reg.QueryValueEx(key, VALUE_NAME)[0] == VALUE_DATA:
-                    logging.info("Alias file already set up.")
+        if not force and self._setup_verified():
+            logging.info("Registry key verified recently, skipping the check.")
+        else:
+            autorun = self.backend.read_autorun()
+            if autorun == VALUE_DATA:
+                logging.info("Alias file already set up.")
+            else:
+                if autorun is None:
+                    logging.info("Registry key not found, creating it...")
                 else:
                     logging.info("Alias file not set up correctly, fixing it...")
-                    reg.SetValueEx(key, VALUE_NAME, 0, reg.REG_SZ, VALUE_DATA)
-        except FileNotFoundError:
-            logging.info("Registry key not found, creating it...")
-            with reg.CreateKey(reg.HKEY_CURRENT_USER, KEY_PATH) as key:
-                reg.SetValueEx(key, VALUE_NAME, 0, reg.REG_SZ, VALUE_DATA)
-        logging.info("Registry key set up successfully.")
+                self.backend.write_autorun(VALUE_DATA)
+            logging.info("Registry key set up successfully.")
+            self._save_setup_state()
 
         logging.info("Checking for alias file...")
-        if not os.path.exists(os.path.dirname(ALIAS_CMD_PATH)):
-            os.makedirs(os.path.dirname(ALIAS_CMD_PATH), exist_ok=True)
-        if not os.path.exists(ALIAS_CMD_PATH):
+        if not os.path.exists(self.paths.alias_cmd):
             logging.info("Alias file not found, creating it...")
-            with open(ALIAS_CMD_PATH, "w", encoding="utf-8") as file:
+            os.makedirs(self.paths.directory, exist_ok=True)
+            with open(self.paths.alias_cmd, "w", encoding="utf-8") as file:
                 file.write("@echo off\n")
         logging.info("Alias file set up successfully.")
 
-    def backup(self):
-        """Create a backup of the alias file."""
+    def backup(self, label: str = "", retention: RetentionPolicy | None = None) -> tuple[Snapshot, bool]:
+        """Create a backup of the alias file and macro file, unless they are unchanged since the last backup.
+
+        Args:
+            label (str): A description of the backup.
+            retention (RetentionPolicy | None): The policy used to prune old backups.
+
+        Returns:
+            tuple[Snapshot, bool]: The backup, and whether it was created (False if the last backup was reused).
+        """
         logging.info("Creating backup of alias file...")
-        backup_path = os.path.join(
-            os.path.dirname(ALIAS_CMD_PATH), f"alias_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.cmd"
-        )
-        shutil.copyfile(ALIAS_CMD_PATH, backup_path)
-        logging.info("Backup created successfully.")
+        return self.backups.create(label, retention)
+
+    def restore(self, snapshot: Snapshot, retention: RetentionPolicy | None = None) -> Snapshot:
+        """Restore a backup of the alias file and macro file. The current files are backed up first.
+
+        Args:
+            snapshot (Snapshot): The backup to restore.
+            retention (RetentionPolicy | None): The policy used to prune old backups.
+
+        Returns:
+            Snapshot: The backup of the files from before the restore.
+
+        Raises:
+            OSError: If a file could not be written. The message lists the files that were restored.
+        """
+        try:
+            return self.backups.restore(snapshot, retention)
+        finally:
+            # Some files may have been restored even if the restore failed.
+            self._documents.clear()
+            self.groups = load_groups(self.paths.groups)
 
     def open(self):
         """Open the directory containing the alias file."""
-        os.startfile(os.path.dirname(ALIAS_CMD_PATH))
+        self.backend.open_directory(self.paths.directory)
+
+    def index(self) -> AliasIndex:
+        """Index the alias file without decoding any commands. Any malformed or duplicate definitions are logged.
+
+        Returns:
+            AliasIndex: The location of each alias in the alias file or macro file.
+        """
+        with TIMINGS.span("index alias file") as details:
+            index = AliasIndex(self.paths.alias_cmd, self.backend.expand, self.group_paths())
+            details["aliases"] = len(index)
+        for issue in index.issues:
+            logging.warning(f"Alias file issue: {issue}")
+        return index
 
     def decode(self) -> dict[str, list[str]]:
-        """Decodes the alias file.
+        """Decodes the alias file. Both the inline and the macro file formats are supported, including a mix of both.
 
         Returns:
             dict[str, list[str]]: A dictionary of aliases and their commands.
         """
-        aliases = {}
-        with open(ALIAS_CMD_PATH) as file:
-            prefix_len = len("doskey ")
-            for line in file:
-                if line.lower().startswith("doskey "):
-                    name, commands = line[prefix_len:].split("=", 1)
-                    commands = [cmd.strip() for cmd in commands.split("$T")]
-                    aliases[name] = commands
-        return aliases
-
-    def encode(self, aliases: dict[str, list[str]]):
-        """Encodes the aliases to the alias file.
+        with TIMINGS.span("decode alias file"):
+            return self.index().read_all()
+
+    def encode(self, aliases: Mapping[str, list[str]], groups: Mapping[str, str] | None = None):
+        """Encodes the aliases to the alias file using the current file format. Lines that are not alias definitions are
+        preserved, only the changed definitions are rewritten and each file is replaced atomically (if it changed at
+        all). The shell exports are then brought up to date.
+
+        The aliases of each named group are written to the group's macro file, and `alias.cmd` loads the groups that are
+        loaded at startup. The core group is written in the current file format.
+
+        Args:
+            aliases (Mapping[str, list[str]]): A mapping of aliases to their commands.
+            groups (Mapping[str, str] | None): The group of each alias in a named group, the others are in the core
+                group. Defaults to the groups the aliases are saved in now.
+        """
+        with TIMINGS.span("encode alias file", aliases=len(aliases), file_format=self.file_format):
+            named = list(self.groups)
+            core = aliases
+            if named:
+                if groups is None:
+                    groups = self._saved_groups()
+                partitions: dict[str, dict[str, list[str]]] = {group.name: {} for group in named}
+                core = {}
+                for name, commands in aliases.items():
+                    partitions.get(groups.get(name, CORE_GROUP), core)[name] = commands
+                # Write the groups before the loader so a shell never loads a stale group.
+                for group in named:
+                    document = self._document(self.group_path(group.name), macrofile=True)
+                    # Written even if empty, so loading the group never fails.
+                    if document.update(partitions[group.name]) or document.stamp is None:
+                        document.save()
+            loaders = [group_loader(group.name) for group in named if group.autoload]
+            if self.file_format == FILE_FORMAT_MACROFILE:
+                # Write the macros before the loader so a shell never loads a stale macro file.
+                macros = self._document(self.paths.macrofile, macrofile=True)
+                if macros.update(core):
+                    macros.save()
+                alias_cmd = self._document(self.paths.alias_cmd, macrofile=False)
+                changed = alias_cmd.update({})
+                changed |= alias_cmd.set_loaders([MACROFILE_DATA, *loaders], load_macro=bool(named))
+            else:
+                alias_cmd = self._document(self.paths.alias_cmd, macrofile=False)
+                changed = alias_cmd.update(core)
+                changed |= alias_cmd.set_loaders(loaders, load_macro=bool(named))
+            if changed:
+                alias_cmd.save()
+        if self.exports.formats:
+            try:
+                with TIMINGS.span("update shell exports", formats=len(self.exports.formats)):
+                    self.exports.update(aliases)
+            except OSError as error:
+                # The aliases are saved, only the copies for other shells are out of date.
+                logging.warning(f"Failed to update the shell exports: {error}")
+
+    def migrate(self, file_format: str) -> Migration:
+        """Re-encode the existing aliases using a different file format.
+
+        cmd.exe processes `%%` and `^` escapes in `alias.cmd` but not in a macro file, so the core aliases that move
+        between the two are translated to define the same macros. The aliases of named groups are always in macro files
+        and are left as they are.
+
+        Args:
+            file_format (str): The file format to migrate to.
+
+        Returns:
+            Migration: The aliases that were translated, and those to check because the translation can't be exact.
+        """
+        assert file_format in FILE_FORMATS
+        logging.info(f"Migrating alias file to the {file_format} format...")
+        index = self.index()
+        aliases = index.read_all()
+        memberships = self.memberships(index)
+        migration = Migration({}, [])
+        to_macrofile = file_format == FILE_FORMAT_MACROFILE
+        for name, entry in index.entries.items():
+            if name in memberships or entry.macrofile == to_macrofile:
+                continue
+            body = encode_commands(aliases[name])
+            if to_macrofile:
+                new_body, expanded = unescape_batch(body)
+                if expanded:
+                    migration.expanded.append(name)
+            else:
+                new_body = escape_batch(body)
+            if new_body != body:
+                aliases[name] = migration.translated[name] = decode_commands(new_body)
+        self.file_format = file_format
+        self.encode(aliases, memberships)
+        logging.info(f"Alias file migrated successfully, {len(migration.translated)} aliases translated.")
+        for name in migration.expanded:
+            logging.warning(f"The %VARIABLES% of '{name}' are now expanded when it runs, not when cmd.exe starts.")
+        return migration
+
+    def group_path(self, name: str) -> str:
+        """Get the macro file of a named group."""
+        return os.path.join(self.paths.groups, f"{name}{GROUP_EXTENSION}")
+
+    def group_paths(self) -> list[str]:
+        """Get the macro files of the named groups, in order."""
+        return [self.group_path(group.name) for group in self.groups]
+
+    def saved_paths(self) -> list[str]:
+        """Get everything the aliases are saved in: the alias file, the macro file, and the groups directory with the
+        manifest and the macro file of each group."""
+        manifest = os.path.join(self.paths.groups, GROUP_MANIFEST_NAME)
+        return [self.paths.alias_cmd, self.paths.macrofile, self.paths.groups, manifest, *self.group_paths()]
+
+    def set_groups(self, groups: list[AliasGroup]):
+        """Change the named groups, e.g. to add one or load one at startup. The manifest is written and the macro files
+        of new groups are created straight away, `alias.cmd` is updated the next time the aliases are encoded.
 
         Args:
-            aliases (dict[str, list[str]]): A dictionary of aliases and their commands.
+            groups (list[AliasGroup]): The named groups, in order. Groups left out must have no aliases left, their
+                macro files are deleted.
+        """
+        removed = {group.name for group in self.groups} - {group.name for group in groups}
+        save_groups(self.paths.groups, groups)
+        for group in groups:
+            path = self.group_path(group.name)
+            if not os.path.exists(path):
+                atomic_write(path, "")
+        for name in removed:
+            path = self.group_path(name)
+            self._documents.pop(path, None)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        self.groups = groups
+
+    def memberships(self, index: AliasIndex) -> dict[str, str]:
+        """Get the group of each alias in an index that is in a named group, from the macro file it is defined in.
+
+        Returns:
+            dict[str, str]: The group of each alias in a named group. The others are in the core group.
         """
-        with open(ALIAS_CMD_PATH, "w", encoding="utf-8") as file:
-            file.write("@echo off\n")
-            for name, commands in aliases.items():
-                file.write(f"DOSKEY {name}={commands[0]}")
-                for cmd in commands[1:]:
-                    file.write(f" $T {cmd}")
-                file.write("\n")
+        files = {os.path.normcase(os.path.abspath(self.group_path(group.name))): group.name for group in self.groups}
+        if not files:
+            return {}
+        # Most aliases are in a few files, so each path is only normalised once.
+        path_groups: dict[str, str | None] = {}
+        memberships = {}
+        for name, entry in index.entries.items():
+            if entry.path not in path_groups:
+                path_groups[entry.path] = files.get(os.path.normcase(os.path.abspath(entry.path)))
+            group = path_groups[entry.path]
+            if group is not None:
+                memberships[name] = group
+        return memberships
+
+    def _saved_groups(self) -> dict[str, str]:
+        """Get the group of each alias saved in the macro file of a named group."""
+        return {
+            line.name: group.name
+            for group in self.groups
+            for line in self._document(self.group_path(group.name), macrofile=True).lines
+            if line.name is not None
+        }
+
+    def _document(self, path: str, macrofile: bool) -> AliasDocument:
+        """Get the parsed document of a file, only re-parsing it if it changed on disk since it was last used."""
+        document = self._documents.get(path)
+        if document is None or document.is_stale():
+            document = AliasDocument(path, macrofile)
+            self._documents[path] = document
+        return document
+
+    def _setup_state(self) -> dict:
+        return {"version": SETUP_STATE_VERSION, "backend": self.backend.name, "autorun": VALUE_DATA}
+
+    def _setup_verified(self) -> bool:
+        """Check whether the registry was verified recently, with the same backend and AutoRun value."""
+        try:
+            with open(self.paths.setup_state, encoding="utf-8") as file:
+                state = json.load(file)
+            verified = state.pop("verified")
+            return state == self._setup_state() and 0 <= time.time() - verified < SETUP_RECHECK_S
+        except (OSError, ValueError, TypeError, AttributeError, KeyError):
+            return False
+
+    def _save_setup_state(self):
+        try:
+            atomic_write(self.paths.setup_state, json.dumps({**self._setup_state(), "verified": time.time()}))
+        except OSError as error:
+            logging.warning(f"Failed to save the setup state: {error}")
@@ -0,0 +1,84 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont, QKeyEvent
+from PyQt5.QtWidgets import QLineEdit, QListWidget, QStackedWidget, QVBoxLayout, QWidget
+
+from app.alias_list import AliasList
+from app.alias_search import AliasSearchIndex
+
+
+class AliasFilter(QWidget):
+    """A filter box above the alias list. While the box has text, the list is replaced with the ranked matches."""
+
+    def __init__(self, alias_list: AliasList, search_index: AliasSearchIndex, parent=None):
+        super().__init__(parent)
+        self.alias_list = alias_list
+        self.search_index = search_index
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter aliases...")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self.refresh)
+        self.filter_edit.returnPressed.connect(self._on_return_pressed)
+        self.filter_edit.installEventFilter(self)
+
+        self.results = QListWidget()
+        self.results.setFont(QFont("Consolas"))
+        self.results.setUniformItemSizes(True)
+        self.results.setAlternatingRowColors(True)
+        self.results.currentTextChanged.connect(self._on_result_selected)
+
+        self.stack = QStackedWidget()
+        self.stack.addWidget(self.alias_list)
+        self.stack.addWidget(self.results)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.stack)
+        self.setLayout(layout)
+
+    def is_active(self) -> bool:
+        """Check whether the list is currently filtered."""
+        return bool(self.filter_edit.text().strip())
+
+    def refresh(self):
+        """Re-run the search, e.g. after an alias has been added, renamed or deleted."""
+        if not self.is_active():
+            if self.stack.currentWidget() is not self.alias_list:
+                self.stack.setCurrentWidget(self.alias_list)
+                self.alias_list.scrollTo(self.alias_list.currentIndex())
+            return
+        current = self.results.currentItem()
+        current_name = current.text() if current is not None else ""
+        matches = self.search_index.search(self.filter_edit.text())
+        self.results.blockSignals(True)
+        self.results.clear()
+        self.results.addItems(matches)
+        if current_name in matches:
+            self.results.setCurrentRow(matches.index(current_name))
+        self.results.blockSignals(False)
+        self.stack.setCurrentWidget(self.results)
+
+    def clear(self):
+        """Clear the filter and show the full list."""
+        self.filter_edit.clear()
+
+    def eventFilter(self, watched, event):
+        # Let the arrow keys move through the results while typing.
+        if watched is self.filter_edit and isinstance(event, QKeyEvent) and event.type() == QKeyEvent.Type.KeyPress:
+            if event.key() in (Qt.Key.Key_Down, Qt.Key.Key_Up) and self.is_active():
+                row = self.results.currentRow() + (1 if event.key() == Qt.Key.Key_Down else -1)
+                self.results.setCurrentRow(max(0, min(row, self.results.count() - 1)))
+                return True
+            if event.key() == Qt.Key.Key_Escape:
+                self.clear()
+                return True
+        return super().eventFilter(watched, event)
+
+    def _on_return_pressed(self):
+        if self.is_active() and self.results.count() > 0 and self.results.currentRow() < 0:
+            self.results.setCurrentRow(0)
+
+    def _on_result_selected(self, name: str):
+        if name:
+            self.alias_list.select(name)
@@ -0,0 +1,507 @@
+import json
+import os
+import re
+import shlex
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple, TextIO
+
+from app.alias_index import DOSKEY_PREFIX, ParseIssue, decode_commands, encode_commands, is_definition, parse_definition
+from app.macro_expand import expand_codes, uses_arguments
+
+# This module must never import PyQt5, the command line interface uses it.
+
+FORMAT_DOSKEY = "doskey"
+FORMAT_BASH = "bash"
+FORMAT_POWERSHELL = "powershell"
+FORMAT_JSON = "json"
+FORMAT_YAML = "yaml"
+
+JSON_CHUNK_SIZE = 64 * 1024
+"""How much of a JSON file is read at a time. Only the alias being parsed is held in memory, not the whole file."""
+JSON_TOKEN_LENGTH = len("-Infinity")
+"""The longest JSON token other than a string or a number, e.g. a literal or an escape, that a chunk can cut short."""
+HEADER_COMMENT = "Exported from Aliasaurus"
+
+BASH_NAME_PATTERN = re.compile(r"[^\s'\"\\$`=/|&;<>()]+")
+BASH_ARGUMENTS_PATTERN = re.compile(r"\"?\$(?:\{([1-9])\}|([1-9])|[@*])\"?")
+BASH_FUNCTION_PATTERN = re.compile(r"^(?:function\s+([^\s(){}=]+)\s*(?:\(\s*\))?|([^\s(){}=]+)\s*\(\s*\))\s*\{(.*)$")
+POWERSHELL_FUNCTION_PATTERN = re.compile(r"^function\s+(?:global:|script:)?([^\s(){}]+)\s*\{(.*)$", re.IGNORECASE)
+POWERSHELL_ALIAS_PATTERN = re.compile(r"^(?:set|new)-alias\s", re.IGNORECASE)
+POWERSHELL_ARGUMENTS_PATTERN = re.compile(r"\$args\[(\d)\]|[@$]args\b", re.IGNORECASE)
+YAML_KEY_PATTERN = re.compile(r"""^("(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^\s#'"][^:#]*?)\s*:(?:\s+(.*))?$""")
+
+
+class ImportedAlias(NamedTuple):
+    """An alias read from a file in another format."""
+
+    name: str
+    commands: list[str]
+    line_number: int
+
+
+class AliasFormat(ABC):
+    """A file format aliases can be imported from and exported to.
+
+    Files are read and written one alias at a time, so only the alias being converted is held in memory.
+    """
+
+    name = ""
+    description = ""
+    extensions: tuple[str, ...] = ()
+    """The file extensions (or file names, e.g. `.bashrc`) of the format. The first is used for new files."""
+    newline = "\n"
+    header = ""
+    separator = ""
+    footer = ""
+
+    @abstractmethod
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        """Read the aliases from a file, in order.
+
+        Args:
+            file (TextIO): The file to read.
+            path (str): The path of the file, for the issues.
+            issues (list[ParseIssue]): Definitions that can't be imported are reported here and skipped.
+        """
+
+    @abstractmethod
+    def render(self, name: str, commands: list[str]) -> str:
+        """Get the text that defines an alias, ending in a line break."""
+
+    def write(self, aliases: Iterable[tuple[str, list[str]]], file: TextIO) -> int:
+        """Write aliases to a file.
+
+        Args:
+            aliases (Iterable[tuple[str, list[str]]]): The names and commands of the aliases, in order.
+            file (TextIO): The file to write, opened with the `newline` of the format.
+
+        Returns:
+            int: The number of aliases written.
+        """
+        count = 0
+        file.write(self.header)
+        for name, commands in aliases:
+            if count:
+                file.write(self.separator)
+            file.write(self.render(name, commands))
+            count += 1
+        file.write(self.footer)
+        return count
+
+
+class DoskeyFormat(AliasFormat):
+    """DOSKEY macro files (`name=command $T command`), and batch files of `DOSKEY name=...` lines like `alias.cmd`."""
+
+    name = FORMAT_DOSKEY
+    description = "DOSKEY macro file"
+    extensions = (".doskey", ".mac", ".macros", ".cmd", ".bat")
+    newline = "\r\n"
+
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        for line_number, line in enumerate(file, start=1):
+            macrofile = not line.lower().startswith(DOSKEY_PREFIX)
+            # Other lines of batch files, such as @echo off, are not definitions.
+            if macrofile and os.path.splitext(path)[1].lower() in (".cmd", ".bat"):
+                continue
+            if not is_definition(line, macrofile):
+                continue
+            definition = parse_definition(line, macrofile)
+            if definition is None:
+                issues.append(ParseIssue(path, line_number, f"malformed definition: {line.strip()}"))
+                continue
+            yield ImportedAlias(definition[0], decode_commands(definition[1]), line_number)
+
+    def render(self, name: str, commands: list[str]) -> str:
+        return f"{name}={encode_commands(commands)}\n"
+
+
+class BashFormat(AliasFormat):
+    """Bash (and zsh) `alias name='...'` definitions and simple functions.
+
+    DOSKEY drops the arguments of a macro unless it uses `$*` or `$1` to `$9`, while a shell alias appends them to the
+    end. Imported aliases get a `$*` so they keep working the same, and exported aliases that use their arguments
+    anywhere but at the end become functions.
+    """
+
+    name = FORMAT_BASH
+    description = "Bash aliases"
+    extensions = (".sh", ".bash", ".zsh", ".bashrc", ".bash_aliases", ".zshrc")
+    header = f"# {HEADER_COMMENT}\n"
+
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        function: tuple[str, int] | None = None
+        body: list[str] = []
+        for line_number, raw_line in enumerate(file, start=1):
+            line = raw_line.strip()
+            if function is not None:
+                # The body of a multi-line function, up to its closing brace.
+                if line.startswith("}"):
+                    yield ImportedAlias(function[0], self._function_commands(body), function[1])
+                    function, body = None, []
+                elif not line.startswith("#"):
+                    body.append(line)
+                continue
+            if line.startswith("alias "):
+                yield from self._read_aliases(line, path, line_number, issues)
+            elif (match := BASH_FUNCTION_PATTERN.match(line)) is not None:
+                name, rest = match.group(1) or match.group(2), match.group(3).strip()
+                if rest.endswith("}"):
+                    yield ImportedAlias(name, self._function_commands([rest[:-1]]), line_number)
+                else:
+                    function, body = (name, line_number), [rest]
+        if function is not None:
+            issues.append(ParseIssue(path, function[1], f"function '{function[0]}' is never closed"))
+
+    def render(self, name: str, commands: list[str]) -> str:
+        if BASH_NAME_PATTERN.fullmatch(name) is None:
+            return f"# Skipped {name}: not a valid alias name in bash\n"
+        # An alias appends its arguments anyway, so only arguments used anywhere else need a function.
+        trimmed = [*commands[:-1], commands[-1].removesuffix(" $*")] if commands else []
+        if any(uses_arguments(command) for command in trimmed):
+            body = "; ".join(expand_codes(command, _bash_argument, separator="; ") for command in commands)
+            return f"{name}() {{ {body}; }}\n"
+        value = "; ".join(expand_codes(command, _bash_argument, separator="; ") for command in trimmed)
+        return f"alias {name}={shlex.quote(value)}\n"
+
+    def _read_aliases(
+        self, line: str, path: str, line_number: int, issues: list[ParseIssue]
+    ) -> Iterator[ImportedAlias]:
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as error:
+            issues.append(ParseIssue(path, line_number, f"can't parse alias: {error}"))
+            return
+        for word in words[1:]:
+            name, separator, value = word.partition("=")
+            if word.startswith("-") or not separator:
+                continue
+            commands = _split_commands([value])
+            # A shell alias appends its arguments, a DOSKEY macro only uses them where it says.
+            commands[-1] = f"{commands[-1]} $*".lstrip()
+            yield ImportedAlias(name, commands, line_number)
+
+    def _function_commands(self, lines: list[str]) -> list[str]:
+        def argument(match: re.Match) -> str:
+            number = match.group(1) or match.group(2)
+            return f"${number}" if number else "$*"
+
+        return [BASH_ARGUMENTS_PATTERN.sub(argument, command) for command in _split_commands(lines)]
+
+
+class PowerShellFormat(AliasFormat):
+    """PowerShell `Set-Alias` definitions and functions, e.g. from a profile.
+
+    Aliases are exported as functions, since a PowerShell alias can't take arguments or run several commands. Each
+    function first removes any built-in alias of the same name, which would otherwise hide it.
+    """
+
+    name = FORMAT_POWERSHELL
+    description = "PowerShell functions"
+    extensions = (".ps1", ".psm1")
+    header = f"# {HEADER_COMMENT}\n"
+
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        function: tuple[str, int] | None = None
+        body: list[str] = []
+        in_comment = False
+        for line_number, raw_line in enumerate(file, start=1):
+            line = raw_line.strip()
+            if in_comment or line.startswith("<#"):
+                in_comment = "#>" not in line
+                continue
+            if function is not None:
+                if line.startswith("}"):
+                    yield ImportedAlias(function[0], self._function_commands(body), function[1])
+                    function, body = None, []
+                elif not line.startswith("#"):
+                    body.append(line)
+                continue
+            if POWERSHELL_ALIAS_PATTERN.match(line) is not None:
+                alias = self._read_alias(line, path, line_number, issues)
+                if alias is not None:
+                    yield alias
+            elif (match := POWERSHELL_FUNCTION_PATTERN.match(line)) is not None:
+                name, rest = match.group(1), match.group(2).strip()
+                if rest.endswith("}"):
+                    yield ImportedAlias(name, self._function_commands([rest[:-1]]), line_number)
+                else:
+                    function, body = (name, line_number), [rest]
+        if function is not None:
+            issues.append(ParseIssue(path, function[1], f"function '{function[0]}' is never closed"))
+
+    def render(self, name: str, commands: list[str]) -> str:
+        body = "; ".join(expand_codes(command, _powershell_argument, separator="; ") for command in commands)
+        quoted_path = "'Alias:" + name.replace("'", "''") + "'"
+        return (
+            f"Remove-Item -LiteralPath {quoted_path} -Force -ErrorAction SilentlyContinue\n"
+            f"function {name} {{ {body} }}\n"
+        )
+
+    def _read_alias(self, line: str, path: str, line_number: int, issues: list[ParseIssue]) -> ImportedAlias | None:
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as error:
+            issues.append(ParseIssue(path, line_number, f"can't parse alias: {error}"))
+            return None
+        named: dict[str, str] = {}
+        positional = []
+        words = iter(words[1:])
+        for word in words:
+            if word.startswith("-"):
+                if word.lower() not in ("-force", "-passthru", "-whatif", "-confirm"):
+                    named[word.lower()] = next(words, "")
+            else:
+                positional.append(word)
+        name = named.get("-name") or (positional.pop(0) if positional else "")
+        value = named.get("-value") or (positional.pop(0) if positional else "")
+        if not name or not value:
+            issues.append(ParseIssue(path, line_number, f"can't parse alias: {line}"))
+            return None
+        # The alias passes its arguments on to the command.
+        return ImportedAlias(name, [f"{value} $*"], line_number)
+
+    def _function_commands(self, lines: list[str]) -> list[str]:
+        def argument(match: re.Match) -> str:
+            return "$*" if match.group(1) is None else f"${int(match.group(1)) + 1}"
+
+        return [POWERSHELL_ARGUMENTS_PATTERN.sub(argument, command) for command in _split_commands(lines)]
+
+
+class JsonFormat(AliasFormat):
+    """A JSON object of alias names to a command or a list of commands, as written by `aliasaurus export`."""
+
+    name = FORMAT_JSON
+    description = "JSON manifest"
+    extensions = (".json",)
+    header = "{"
+    separator = ","
+    footer = "\n}\n"
+
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        stream = _JsonStream(file)
+        try:
+            stream.expect("{")
+            if stream.peek() == "}":
+                return
+            while True:
+                stream.peek()
+                line_number = stream.line_number
+                name = stream.value()
+                stream.expect(":")
+                value = stream.value()
+                commands = _commands_of(value)
+                if not isinstance(name, str) or commands is None:
+                    issues.append(ParseIssue(path, line_number, "commands must be a string or a list of strings"))
+                else:
+                    yield ImportedAlias(name, commands, line_number)
+                if stream.expect(",}") == "}":
+                    return
+        except ValueError as error:
+            issues.append(ParseIssue(path, stream.line_number, f"invalid JSON: {error}"))
+
+    def render(self, name: str, commands: list[str]) -> str:
+        return f"\n  {json.dumps(name, ensure_ascii=False)}: {json.dumps(commands, ensure_ascii=False)}"
+
+
+class YamlFormat(AliasFormat):
+    """A YAML mapping of alias names to a command or a list of commands.
+
+    Only this simple form of YAML is read: `name: command`, or `name:` followed by `- command` lines. Values can be
+    plain, single quoted or double quoted, or a flow sequence like `[a, b]`.
+    """
+
+    name = FORMAT_YAML
+    description = "YAML manifest"
+    extensions = (".yaml", ".yml")
+    header = f"# {HEADER_COMMENT}\n"
+
+    def read(self, file: TextIO, path: str, issues: list[ParseIssue]) -> Iterator[ImportedAlias]:
+        pending: tuple[str, int] | None = None
+        items: list[str] = []
+        for line_number, raw_line in enumerate(file, start=1):
+            line = raw_line.rstrip()
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#") or stripped in ("---", "..."):
+                continue
+            try:
+                if line[0].isspace() or stripped.startswith("- "):
+                    if pending is None or not stripped.startswith("-"):
+                        raise ValueError(f"unexpected line: {stripped}")
+                    items.append(_yaml_scalar(stripped[1:].strip()))
+                    continue
+                if pending is not None:
+                    yield from self._alias(pending, items, path, issues)
+                    pending, items = None, []
+                match = YAML_KEY_PATTERN.match(line)
+                if match is None:
+                    raise ValueError(f"expected 'name: commands': {stripped}")
+                name, value = _yaml_scalar(match.group(1)), (match.group(2) or "").strip()
+                if not value or value.startswith("#"):
+                    pending = (name, line_number)
+                elif value.startswith("["):
+                    yield ImportedAlias(name, _yaml_flow_sequence(value), line_number)
+                elif value[0] in "|>&*!":
+                    raise ValueError(f"unsupported YAML: {value}")
+                else:
+                    yield ImportedAlias(name, [_yaml_scalar(value)], line_number)
+            except ValueError as error:
+                issues.append(ParseIssue(path, line_number, str(error)))
+        if pending is not None:
+            yield from self._alias(pending, items, path, issues)
+
+    def render(self, name: str, commands: list[str]) -> str:
+        key = json.dumps(name, ensure_ascii=False)
+        if len(commands) == 1:
+            return f"{key}: {json.dumps(commands[0], ensure_ascii=False)}\n"
+        return f"{key}:\n" + "".join(f"  - {json.dumps(command, ensure_ascii=False)}\n" for command in commands)
+
+    def _alias(
+        self, pending: tuple[str, int], items: list[str], path: str, issues: list[ParseIssue]
+    ) -> Iterator[ImportedAlias]:
+        if items:
+            yield ImportedAlias(pending[0], items, pending[1])
+        else:
+            issues.append(ParseIssue(path, pending[1], f"alias '{pending[0]}' has no commands"))
+
+
+FORMATS: dict[str, AliasFormat] = {
+    alias_format.name: alias_format
+    for alias_format in (DoskeyFormat(), BashFormat(), PowerShellFormat(), JsonFormat(), YamlFormat())
+}
+
+
+def format_for_path(path: str) -> AliasFormat | None:
+    """Guess the format of a file from its extension or name, or None if it isn't a known format."""
+    name = os.path.basename(path).lower()
+    for alias_format in FORMATS.values():
+        if any(name.endswith(extension) for extension in alias_format.extensions):
+            return alias_format
+    return None
+
+
+def _bash_argument(code: str) -> str:
+    return '"$@"' if code == "*" else f'"${code}"'
+
+
+def _powershell_argument(code: str) -> str:
+    return "@args" if code == "*" else f"$args[{int(code) - 1}]"
+
+
+def _split_commands(lines: list[str]) -> list[str]:
+    """Split shell code into commands at the semicolons and line breaks that are not quoted."""
+    commands = []
+    for line in lines:
+        quote = ""
+        start = 0
+        for position, char in enumerate(line):
+            if quote:
+                if char == quote:
+                    quote = ""
+            elif char in "'\"":
+                quote = char
+            elif char == ";":
+                commands.append(line[start:position])
+                start = position + 1
+        commands.append(line[start:])
+    return [command.strip() for command in commands if command.strip()] or [""]
+
+
+def _commands_of(value: object) -> list[str] | None:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and value and all(isinstance(command, str) for command in value):
+        return value
+    return None
+
+
+def _yaml_scalar(text: str) -> str:
+    if text.startswith('"'):
+        value, end = json.JSONDecoder().raw_decode(text)
+        if text[end:].strip() and not text[end:].strip().startswith("#"):
+            raise ValueError(f"unexpected text after a string: {text}")
+        return value
+    if text.startswith("'"):
+        match = re.match(r"'((?:[^']|'')*)'", text)
+        if match is None:
+            raise ValueError(f"unterminated string: {text}")
+        return match.group(1).replace("''", "'")
+    # A plain scalar ends at a comment.
+    return re.split(r"\s+#", text, maxsplit=1)[0].strip()
+
+
+def _yaml_flow_sequence(text: str) -> list[str]:
+    if not text.rstrip().endswith("]"):
+        raise ValueError(f"unterminated sequence: {text}")
+    items = []
+    for item in re.findall(r"""\s*("(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^,\]]+)\s*[,\]]""", text[1:]):
+        items.append(_yaml_scalar(item.strip()))
+    return items or [""]
+
+
+class _JsonStream:
+    """Reads the values of a JSON file one at a time, holding only the unread part of the current chunk."""
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.line_number = 1
+        self._decoder = json.JSONDecoder()
+        self._eof = False
+
+    def peek(self) -> str:
+        """Get the next character that is not whitespace, without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                if self.buffer[self.position] == "\n":
+                    self.line_number += 1
+                self.position += 1
+            if self.position < len(self.buffer) or not self._read():
+                return self.buffer[self.position : self.position + 1]
+
+    def expect(self, characters: str) -> str:
+        """Consume the next character, which must be one of some characters."""
+        char = self.peek()
+        if not char or char not in characters:
+            expected = " or ".join(repr(character) for character in characters)
+            raise ValueError(f"expected {expected}, found {char or 'the end'!r}")
+        self.position += 1
+        return char
+
+    def value(self) -> object:
+        """Consume the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                # The value may continue in the next chunk. Any other error is raised straight away, rather than
+                # reading the rest of a malformed file into memory.
+                if self._is_cut_short(error) and self._read():
+                    continue
+                raise
+            # A number may also continue in the next chunk.
+            if end == len(self.buffer) and not self._eof and self._read():
+                continue
+            self.line_number += self.buffer.count("\n", self.position, end)
+            self.position = end
+            return value
+
+    def _is_cut_short(self, error: json.JSONDecodeError) -> bool:
+        """Check whether a value failed to decode because the buffer ends in the middle of it."""
+        if error.msg.startswith("Unterminated string"):
+            # The string runs to the end of the buffer.
+            return True
+        return error.pos > len(self.buffer) - JSON_TOKEN_LENGTH
+
+    def _read(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self.file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
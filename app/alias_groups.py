@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import re
+from typing import NamedTuple
+
+from app.atomic_write import atomic_write
+
+# This module must never import PyQt5, the command line interface uses it.
+
+CORE_GROUP = ""
+"""The group of every alias not in a named group. Its aliases are kept where they always were, in the alias file or the
+macro file, and are always loaded."""
+CORE_GROUP_LABEL = "Core"
+GROUP_NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+"""Group names are file names and are typed after `aliasaurus load`, so they are kept to characters safe in both."""
+GROUP_EXTENSION = ".doskey"
+GROUP_MANIFEST_NAME = "groups.json"
+GROUP_MANIFEST_VERSION = 1
+
+GROUPS_DATA = "%APPDATA%\\aliasaurus\\groups"
+"""The directory of the group macro files, as written to `alias.cmd`."""
+LOAD_MACRO_NAME = "aliasaurus"
+LOAD_MACRO = (
+    f'if /i "$1"=="load" (doskey /macrofile="{GROUPS_DATA}\\$2{GROUP_EXTENSION}") else ({LOAD_MACRO_NAME}.exe $*)'
+)
+"""The body of the macro that `alias.cmd` defines once there are groups, so `aliasaurus load <group>` loads a group
+that is not loaded at startup into the current shell. Anything else is passed on to the command line interface."""
+
+
+class AliasGroup(NamedTuple):
+    """A named group of aliases, kept in its own macro file."""
+
+    name: str
+    autoload: bool = False
+    """Load the group into every cmd.exe at startup. Otherwise it is loaded on demand with `aliasaurus load <name>`."""
+
+
+def group_label(name: str) -> str:
+    """Get the name of a group to show to the user."""
+    return CORE_GROUP_LABEL if name == CORE_GROUP else name
+
+
+def group_loader(name: str) -> str:
+    """Get the path of the macro file of a group as written to `alias.cmd`, e.g. to load it at startup."""
+    return f"{GROUPS_DATA}\\{name}{GROUP_EXTENSION}"
+
+
+def is_load_macro(name: str, body: str) -> bool:
+    """Check whether a definition in `alias.cmd` is the macro that loads groups, rather than an alias."""
+    return name.lower() == LOAD_MACRO_NAME and body == LOAD_MACRO
+
+
+def check_group_name(name: str, groups: list[AliasGroup]):
+    """Check that a new group can be called a name.
+
+    Raises:
+        ValueError: If the name is invalid or taken. File names are not case sensitive on Windows, so neither are group
+            names.
+    """
+    if GROUP_NAME_PATTERN.fullmatch(name) is None:
+        raise ValueError("Group names can only contain letters, digits, '-' and '_'.")
+    taken = [CORE_GROUP_LABEL, *(group.name for group in groups)]
+    if name.lower() in (other.lower() for other in taken):
+        raise ValueError(f"There is already a group called '{name}'.")
+
+
+def load_groups(directory: str) -> list[AliasGroup]:
+    """Read the groups, in order, from the manifest in the groups directory. The core group is not listed.
+
+    A missing manifest means there are no groups. An unreadable one is logged and ignored, the group macro files are
+    left as they are.
+    """
+    path = os.path.join(directory, GROUP_MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as file:
+            return parse_groups(file.read())
+    except (OSError, ValueError, TypeError, KeyError, AttributeError) as error:
+        logging.warning(f"The group manifest is invalid, ignoring it: {error}")
+        return []
+
+
+def parse_groups(text: str) -> list[AliasGroup]:
+    """Parse a group manifest.
+
+    Raises:
+        ValueError: If the manifest is not valid JSON or has an invalid group name.
+    """
+    groups: list[AliasGroup] = []
+    for entry in json.loads(text)["groups"]:
+        name = entry["name"]
+        check_group_name(name, groups)
+        groups.append(AliasGroup(name, bool(entry.get("autoload", False))))
+    return groups
+
+
+def save_groups(directory: str, groups: list[AliasGroup]):
+    """Atomically write the groups, in order, to the manifest in the groups directory."""
+    entries = [{"name": group.name, "autoload": group.autoload} for group in groups]
+    manifest = {"version": GROUP_MANIFEST_VERSION, "groups": entries}
+    atomic_write(os.path.join(directory, GROUP_MANIFEST_NAME), json.dumps(manifest, indent=2))
@@ -0,0 +1,368 @@
+import os
+from collections.abc import Callable, Collection, Iterable, Iterator
+from contextlib import ExitStack
+from typing import BinaryIO, NamedTuple
+
+from app.alias_groups import is_load_macro
+
+DOSKEY_PREFIX = "doskey "
+MACROFILE_PREFIX = "doskey /macrofile="
+BATCH_SPECIAL_CHARACTERS = "^|&<>"
+"""The characters cmd.exe interprets outside quotes while running a batch file, unless escaped with a caret."""
+
+
+class StaleIndexError(Exception):
+    """An alias file changed since it was indexed, so an alias is no longer where the index says it is."""
+
+
+class IndexEntry(NamedTuple):
+    """The location of a single alias definition."""
+
+    path: str
+    offset: int
+    length: int
+    line_number: int
+    macrofile: bool
+
+
+class ParseIssue(NamedTuple):
+    """A problem found while indexing an alias file."""
+
+    path: str
+    line_number: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line_number}: {self.message}"
+
+
+def decode_commands(commands: str) -> list[str]:
+    """Split the body of a DOSKEY macro into its `$T` separated commands."""
+    return [cmd.strip() for cmd in commands.split("$T")]
+
+
+def encode_commands(commands: list[str]) -> str:
+    """Join commands into the body of a DOSKEY macro."""
+    return " $T ".join(commands)
+
+
+def unescape_batch(body: str) -> tuple[str, bool]:
+    """Get the macro cmd.exe defines from the body of a `DOSKEY name=...` line in a batch file, as the body of the same
+    macro in a macro file.
+
+    cmd.exe turns `%%` into `%` and removes the carets that escape characters outside quotes. `%VARIABLES%` and batch
+    arguments are expanded when the batch file runs, which can't be done here, so they are left to be expanded when the
+    macro runs.
+
+    Returns:
+        tuple[str, bool]: The body for a macro file, and whether it has a `%` that was expanded by the batch file.
+    """
+    expanded = "%" in body.replace("%%", "")
+    text = body.replace("%%", "%")
+    result = []
+    quoted = False
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if char == "^" and not quoted:
+            # Passes the next character on as it is. A caret at the end continues the line, so is dropped.
+            position += 1
+            char = text[position : position + 1]
+        elif char == '"':
+            quoted = not quoted
+        result.append(char)
+        position += 1
+    return "".join(result), expanded
+
+
+def escape_batch(body: str) -> str:
+    """Escape the body of a macro from a macro file for a `DOSKEY name=...` line in a batch file, so cmd.exe defines
+    the same macro."""
+    result = []
+    quoted = False
+    for char in body:
+        if char == '"':
+            quoted = not quoted
+        elif char in BATCH_SPECIAL_CHARACTERS and not quoted:
+            result.append("^")
+        result.append(char)
+    return "".join(result).replace("%", "%%")
+
+
+def parse_definition(line: str, macrofile: bool) -> tuple[str, str] | None:
+    """Parse a single macro definition line.
+
+    Args:
+        line (str): The line, with or without its line ending.
+        macrofile (bool): Whether the line is from a macro file (`name=...`) rather than `alias.cmd`
+            (`DOSKEY name=...`).
+
+    Returns:
+        tuple[str, str] | None: The alias name and its undecoded commands, or None if the line is malformed.
+    """
+    body = line if macrofile else line[len(DOSKEY_PREFIX) :]
+    name, separator, commands = body.rstrip("\r\n").partition("=")
+    if not separator or not name.strip():
+        return None
+    return name, commands
+
+
+def is_valid_name(name: str) -> bool:
+    """Check that an alias name can be used as a DOSKEY macro name: not empty, without whitespace or '='."""
+    return bool(name) and not any(char.isspace() or char == "=" for char in name)
+
+
+def is_valid_command(command: str) -> bool:
+    """Check that a command fits on the single line of a DOSKEY macro definition, without any kind of line break."""
+    return not command or command.splitlines() == [command]
+
+
+def is_definition(line: str, macrofile: bool) -> bool:
+    """Check whether a line defines a macro. The definition may still be malformed."""
+    if macrofile:
+        # Blank lines are ignored and lines like [cmd.exe] select the executable the macros apply to.
+        return bool(line.strip()) and not line.startswith("[")
+    lowered = line.lower()
+    return lowered.startswith(DOSKEY_PREFIX) and not lowered.startswith(MACROFILE_PREFIX)
+
+
+def parse_loader(line: str) -> str | None:
+    """Parse a `DOSKEY /MACROFILE=...` line.
+
+    Returns:
+        str | None: The unexpanded path of the macro file, or None if the line does not load a macro file.
+    """
+    if not line.lower().startswith(MACROFILE_PREFIX):
+        return None
+    return line[len(MACROFILE_PREFIX) :].strip().strip('"')
+
+
+class _ScannedFile(NamedTuple):
+    """What indexing a single file found, so a later index can reuse it while the file is unchanged."""
+
+    names: list[str]
+    """The aliases defined in the file, in order."""
+    loaders: list[tuple[int, str]]
+    """The expanded paths of the macro files the file loads, with how many aliases it defines before loading each."""
+    issues: list[ParseIssue]
+
+
+class AliasIndex:
+    """An index of alias names to the location of their definition in the alias files.
+
+    The alias files are streamed once to build the index and no commands are decoded. A single alias can then be decoded
+    on demand with `get`, without materialising the rest of the file.
+    """
+
+    def __init__(
+        self,
+        alias_cmd_path: str,
+        expand: Callable[[str], str] = os.path.expandvars,
+        macrofiles: Iterable[str] = (),
+        previous: "AliasIndex | None" = None,
+        changed: Collection[str] = (),
+    ):
+        """
+        Args:
+            alias_cmd_path (str): The alias file loaded by cmd.exe.
+            expand (Callable[[str], str]): Expands the `%VARIABLES%` in the path of a macro file it loads.
+            macrofiles (Iterable[str]): Macro files to index after the alias file, unless it already loads them, e.g.
+                the alias groups that are loaded on demand.
+            previous (AliasIndex | None): An earlier index of the same files. The files it indexed are not read again,
+                except those in `changed`.
+            changed (Collection[str]): The files that changed since `previous` was built.
+        """
+        self.alias_cmd_path = alias_cmd_path
+        self.expand = expand
+        self.macrofiles = list(macrofiles)
+        self.entries: dict[str, IndexEntry] = {}
+        self.issues: list[ParseIssue] = []
+        self._scanned: set[str] = set()
+        self._files: dict[str, _ScannedFile] = {}
+        # Files that define an alias that is defined again later. Their entries can't be replayed from this index.
+        self._shadowed: set[str] = set()
+        self._previous = previous
+        self._changed = {os.path.normcase(os.path.abspath(path)) for path in changed}
+        self._scan(alias_cmd_path, macrofile=False)
+        for path in self.macrofiles:
+            self._scan(path, macrofile=True)
+        self._previous = None
+
+    def rebuild(self) -> "AliasIndex":
+        """Index the same files again, e.g. after reading from this index raised `StaleIndexError`."""
+        return AliasIndex(self.alias_cmd_path, self.expand, self.macrofiles)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def names(self) -> list[str]:
+        """Get the alias names in file order."""
+        return list(self.entries)
+
+    def names_in(self, path: str) -> list[str]:
+        """Get the names of the aliases defined in a single file, in file order.
+
+        Args:
+            path (str): The path of an indexed file.
+
+        Returns:
+            list[str]: The names, or an empty list if the file was not indexed.
+        """
+        scanned = self._files.get(os.path.normcase(os.path.abspath(path)))
+        return list(scanned.names) if scanned else []
+
+    def get(self, name: str) -> list[str]:
+        """Decode a single alias from the file.
+
+        Args:
+            name (str): The name of the alias.
+
+        Returns:
+            list[str]: The commands of the alias.
+
+        Raises:
+            StaleIndexError: If the file changed since it was indexed.
+        """
+        return self.read([name])[name]
+
+    def read_all(self) -> dict[str, list[str]]:
+        """Decode every alias in the index, opening each file once.
+
+        Returns:
+            dict[str, list[str]]: A dictionary of aliases and their commands, in file order.
+        """
+        return self.read(self.entries)
+
+    def read(self, names: Iterable[str]) -> dict[str, list[str]]:
+        """Decode many aliases, opening each file once.
+
+        Args:
+            names (Iterable[str]): The names of the aliases to decode.
+
+        Returns:
+            dict[str, list[str]]: A dictionary of aliases and their commands.
+        """
+        return {name: decode_commands(body) for name, body in self.read_bodies(names).items()}
+
+    def read_bodies(self, names: Iterable[str]) -> dict[str, str]:
+        """Read the undecoded bodies of many aliases, opening each file once.
+
+        Args:
+            names (Iterable[str]): The names of the aliases to read.
+
+        Returns:
+            dict[str, str]: A dictionary of aliases and their undecoded commands.
+
+        Raises:
+            StaleIndexError: If a file changed since it was indexed.
+        """
+        bodies = {}
+        with ExitStack() as stack:
+            files = {}
+            for name in names:
+                entry = self.entries[name]
+                if entry.path not in files:
+                    files[entry.path] = stack.enter_context(open(entry.path, "rb"))
+                bodies[name] = _read_body(files[entry.path], name, entry)
+        return bodies
+
+    def _scan(self, path: str, macrofile: bool):
+        key = os.path.normcase(os.path.abspath(path))
+        if key in self._scanned:
+            return
+        self._scanned.add(key)
+        previous = self._previous
+        if (
+            previous is not None
+            and key in previous._files
+            and key not in self._changed
+            and key not in previous._shadowed
+        ):
+            self._replay(key, previous._files[key], previous.entries)
+            return
+        scanned = _ScannedFile([], [], [])
+        self._files[key] = scanned
+        if not os.path.exists(path):
+            self._add_issue(scanned, ParseIssue(path, 0, "file not found"))
+            return
+        with open(path, "rb") as file:
+            offset = 0
+            for line_number, raw_line in enumerate(file, start=1):
+                length = len(raw_line)
+                line = raw_line.decode("utf-8", errors="replace")
+                if is_definition(line, macrofile):
+                    self._add(scanned, line, IndexEntry(path, offset, length, line_number, macrofile))
+                elif not macrofile and (macrofile_path := parse_loader(line)) is not None:
+                    expanded = self.expand(macrofile_path)
+                    scanned.loaders.append((len(scanned.names), expanded))
+                    self._scan(expanded, macrofile=True)
+                offset += length
+
+    def _replay(self, key: str, scanned: _ScannedFile, entries: dict[str, IndexEntry]):
+        """Add the entries of an unchanged file from an earlier index, and index the macro files it loads in order."""
+        self._files[key] = scanned
+        self.issues.extend(scanned.issues)
+        loaders = iter(scanned.loaders)
+        loader = next(loaders, None)
+        for count, name in enumerate(scanned.names):
+            while loader is not None and loader[0] == count:
+                self._scan(loader[1], macrofile=True)
+                loader = next(loaders, None)
+            self._add_entry(name, entries[name])
+        while loader is not None:
+            self._scan(loader[1], macrofile=True)
+            loader = next(loaders, None)
+
+    def _add_issue(self, scanned: _ScannedFile, issue: ParseIssue):
+        scanned.issues.append(issue)
+        self.issues.append(issue)
+
+    def _add(self, scanned: _ScannedFile, line: str, entry: IndexEntry):
+        definition = parse_definition(line, entry.macrofile)
+        if definition is None:
+            self._add_issue(
+                scanned, ParseIssue(entry.path, entry.line_number, f"malformed definition: {line.strip()}")
+            )
+            return
+        name = definition[0]
+        if not entry.macrofile and is_load_macro(*definition):
+            # Written by the app to load groups on demand, not an alias.
+            return
+        scanned.names.append(name)
+        self._add_entry(name, entry)
+
+    def _add_entry(self, name: str, entry: IndexEntry):
+        if name in self.entries:
+            # Like DOSKEY, the last definition wins.
+            previous = self.entries[name]
+            self._shadowed.add(os.path.normcase(os.path.abspath(previous.path)))
+            self.issues.append(
+                ParseIssue(
+                    entry.path,
+                    entry.line_number,
+                    f"duplicate alias '{name}' (first defined at {previous.path}:{previous.line_number})",
+                )
+            )
+        self.entries[name] = entry
+
+
+def _read_body(file: BinaryIO, name: str, entry: IndexEntry) -> str:
+    """Read the undecoded body of an alias from its indexed line.
+
+    Raises:
+        StaleIndexError: If the line is not the whole definition of the alias any more.
+    """
+    file.seek(entry.offset)
+    line = file.read(entry.length).decode("utf-8", errors="replace")
+    definition = parse_definition(line, entry.macrofile)
+    # A line that moved or changed can still hold a definition, of another alias, cut short or run into the next line.
+    whole_line = line.find("\n") in (-1, len(line) - 1) and (line.endswith("\n") or not file.read(1))
+    if definition is None or definition[0] != name or not whole_line:
+        raise StaleIndexError(f"{entry.path} changed since it was indexed, '{name}' is not on line {entry.line_number}")
+    return definition[1]
@@ -0,0 +1,144 @@
+import itertools
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from app.macro_lint import ERROR, Diagnostic, LintCache, worst_severity
+
+LINT_BATCH_SIZE = 2000
+
+
+class LintSummary(NamedTuple):
+    """The outcome of linting every alias."""
+
+    aliases: int
+    errors: int
+    """The number of aliases with errors."""
+    warnings: int
+    """The number of aliases with warnings but no errors."""
+
+
+class _LintRun:
+    """Counts the problems found by `lint_all` as its batches finish."""
+
+    __slots__ = ("aliases", "errors", "remaining", "warnings")
+
+    def __init__(self, aliases: int):
+        self.aliases = aliases
+        self.remaining = 0
+        self.errors = 0
+        self.warnings = 0
+
+    def summary(self) -> LintSummary:
+        return LintSummary(self.aliases, self.errors, self.warnings)
+
+
+class AliasLinter(QObject):
+    """Lints aliases on worker threads, caching the results so unchanged aliases are never checked twice.
+
+    Aliases being edited are linted on their own thread, so they never wait behind a bulk lint of every alias.
+    """
+
+    aliases_linted = pyqtSignal(dict)
+    """Emitted with the diagnostics of each alias in a batch, by name."""
+    edit_linted = pyqtSignal(object, tuple)
+    """Emitted with the tag passed to `lint_edit` and the diagnostics of the edited alias."""
+    all_linted = pyqtSignal(object)
+    """Emitted with a LintSummary once `lint_all` has finished."""
+    _batch_finished = pyqtSignal(object)
+    _edit_finished = pyqtSignal(object)
+
+    def __init__(self, inline: bool, parent: QObject | None = None):
+        """
+        Args:
+            inline (bool): Whether the aliases are written in the inline format, see `macro_lint.lint`.
+        """
+        super().__init__(parent)
+        self.inline = inline
+        self._cache = LintCache()
+        self._bulk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alias-lint")
+        self._edit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alias-lint-edit")
+        self._shut_down = False
+        self._batch_finished.connect(self._on_batch_finished)
+        self._edit_finished.connect(self._on_edit_finished)
+
+    def lint_aliases(self, aliases: Mapping[str, list[str]]):
+        """Lint aliases in the background, emitting `aliases_linted` for each batch.
+
+        Args:
+            aliases (Mapping[str, list[str]]): The aliases to lint. Their commands must not be modified afterwards.
+        """
+        self._submit(aliases, None)
+
+    def lint_all(self, aliases: Mapping[str, list[str]]):
+        """Lint every alias in the background, emitting `aliases_linted` for each batch and then `all_linted`.
+
+        Args:
+            aliases (Mapping[str, list[str]]): All the aliases. Their commands must not be modified afterwards.
+        """
+        self._submit(aliases, _LintRun(len(aliases)))
+
+    def lint_edit(self, tag: object, name: str, commands: list[str]):
+        """Lint an alias being edited in the background, then emit `edit_linted`.
+
+        Args:
+            tag (object): Identifies the edit, so results for outdated edits can be ignored.
+            name (str): The edited name.
+            commands (list[str]): The edited commands.
+        """
+        if self._shut_down:
+            return
+        future = self._edit_executor.submit(self._cache.lint, name, commands, self.inline)
+        future.add_done_callback(lambda future: self._edit_finished.emit((tag, future)))
+
+    def set_inline(self, inline: bool):
+        """Change the file format the aliases are linted for. Lint them again afterwards."""
+        self.inline = inline
+
+    def shutdown(self):
+        """Stop linting, dropping anything that has not started. Later requests are ignored."""
+        self._shut_down = True
+        self._bulk_executor.shutdown(wait=False, cancel_futures=True)
+        self._edit_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, aliases: Mapping[str, list[str]], run: _LintRun | None):
+        if self._shut_down:
+            return
+        items = iter(list(aliases.items()))
+        batches = list(iter(lambda: dict(itertools.islice(items, LINT_BATCH_SIZE)), {}))
+        if run is not None:
+            run.remaining = len(batches)
+            if not batches:
+                self.all_linted.emit(run.summary())
+        for batch in batches:
+            future = self._bulk_executor.submit(self._lint_batch, batch, self.inline)
+            future.add_done_callback(lambda future: self._batch_finished.emit((future, run)))
+
+    def _lint_batch(self, batch: dict[str, list[str]], inline: bool) -> dict[str, tuple[Diagnostic, ...]]:
+        # Runs on the worker thread.
+        return {name: self._cache.lint(name, commands, inline) for name, commands in batch.items()}
+
+    def _on_batch_finished(self, result: tuple[Future, _LintRun | None]):
+        future, run = result
+        if future.cancelled():
+            return
+        diagnostics = future.result()
+        self.aliases_linted.emit(diagnostics)
+        if run is not None:
+            for alias_diagnostics in diagnostics.values():
+                severity = worst_severity(alias_diagnostics)
+                if severity == ERROR:
+                    run.errors += 1
+                elif severity is not None:
+                    run.warnings += 1
+            run.remaining -= 1
+            if run.remaining == 0:
+                self.all_linted.emit(run.summary())
+
+    def _on_edit_finished(self, result: tuple[object, Future]):
+        tag, future = result
+        if not future.cancelled():
+            self.edit_linted.emit(tag, future.result())
+
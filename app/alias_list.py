@@ -1,41 +1,159 @@
-from PyQt5.QtCore import Qt, pyqtSignal
+from collections.abc import Iterable, Mapping
+
+from PyQt5.QtCore import QItemSelection, QItemSelectionModel, QModelIndex, QPoint, Qt, pyqtSignal
 from PyQt5.QtGui import QContextMenuEvent, QFont, QKeyEvent
-from PyQt5.QtWidgets import QListView, QListWidget, QMenu
+from PyQt5.QtWidgets import QListView, QMenu
+
+from app.alias_groups import CORE_GROUP, AliasGroup
+from app.alias_index import AliasIndex
+from app.alias_list_model import AliasListModel
+from app.alias_store import AliasStore
+from app.macro_lint import Diagnostic
+from app.timings import TIMINGS
+
 
+class AliasList(QListView):
+    """A list of aliases that can be rearranged. Several aliases can be selected at once.
 
-class AliasList(QListWidget):
-    """A list of aliases that can be rearranged."""
+    Once there are named groups, the aliases are listed under a header per group that collapses the group when clicked.
+    Aliases can be dragged between groups. Rows are store rows, which skip the headers.
+    """
 
     alias_selected = pyqtSignal(str)
-    order_changed = pyqtSignal()
+    """Emitted with the name of the selected alias, or an empty string if none or several are selected."""
+    selection_size_changed = pyqtSignal(int)
+    aliases_moved = pyqtSignal(list)
+    """Emitted when aliases are dragged to a new position, with the name, old row, new row, old group and new group of
+    each."""
+    collapsed_changed = pyqtSignal(list)
+    """Emitted with the collapsed groups when a group is collapsed or expanded."""
 
-    def __init__(self, menu: QMenu, parent=None):
+    def __init__(self, menu: QMenu, store: AliasStore, parent=None):
+        """
+        Args:
+            menu (QMenu): The context menu.
+            store (AliasStore): The aliases to list. Changes to their names and order are made through the list.
+        """
         super().__init__(parent)
         self.menu = menu
+        self.alias_model = AliasListModel(store, self)
+        self.setModel(self.alias_model)
         self.setAcceptDrops(True)
         self.setDragEnabled(True)
         self.setDragDropMode(QListView.DragDropMode.InternalMove)
+        self.setDefaultDropAction(Qt.DropAction.MoveAction)
         self.setDropIndicatorShown(True)
+        self.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
         self.setAlternatingRowColors(True)
-        self.itemSelectionChanged.connect(self._on_item_selected)
+        # Every row is one line of the same font, so the view never has to measure each item.
+        self.setUniformItemSizes(True)
+        selection_model = self.selectionModel()
+        assert selection_model is not None
+        selection_model.selectionChanged.connect(self._on_item_selected)
+        self.clicked.connect(self._on_clicked)
         self.setFont(QFont("Consolas"))
 
-    def populate(self, names: list[str]):
-        """Populate the list with aliases.
+    def populate(self, index: AliasIndex, groups: Mapping[str, str] | None = None):
+        """Populate the list with the aliases in an alias file.
 
         Args:
-            names (list[str]): A list of alias names.
+            index (AliasIndex): An index of the alias file.
+            groups (Mapping[str, str] | None): The group of each alias in a named group.
         """
-        self.addItems(names)
+        with TIMINGS.span("populate list", aliases=len(index)):
+            self.alias_model.populate(index, groups)
+
+    def set_groups(self, groups: list[AliasGroup], collapsed: Iterable[str] = ()):
+        """Change the named groups. Adding, removing or reordering groups clears the selection.
+
+        Args:
+            groups (list[AliasGroup]): The named groups in order. Aliases of groups left out are moved to the core
+                group.
+            collapsed (Iterable[str]): The groups to collapse.
+        """
+        if self.alias_model.set_groups(groups, collapsed):
+            self._on_item_selected(QItemSelection(), QItemSelection())
+
+    def set_collapsed(self, group: str, collapsed: bool):
+        """Collapse or expand a group."""
+        if collapsed != self.alias_model.is_collapsed(group):
+            self.alias_model.set_collapsed(group, collapsed)
+            self.collapsed_changed.emit(self.alias_model.collapsed_groups())
+
+    def collapsed_groups(self) -> list[str]:
+        return self.alias_model.collapsed_groups()
 
-    def add(self, name: str):
-        """Add a new alias to the list.
+    def current_group(self) -> str:
+        """Get the group of the current alias or header, or the core group if there is none."""
+        index = self.currentIndex()
+        return self.alias_model.group_at(index.row()) if index.isValid() else CORE_GROUP
+
+    def add(self, name: str, commands: list[str], group: str = CORE_GROUP):
+        """Add a new alias to the end of a group and select it.
 
         Args:
             name (str): The name of the alias to add.
+            commands (list[str]): The commands of the alias.
+            group (str): The group to add it to.
+        """
+        self.alias_model.append(name, commands, group)
+        self.select(name)
+
+    def insert_after(self, previous_name: str | None, name: str, commands: list[str], group: str = CORE_GROUP):
+        """Insert a new alias after another one without selecting it.
+
+        Args:
+            previous_name (str | None): The alias to insert after, or None to insert at the top. If it is in another
+                group, the alias is inserted at the top of its group.
+            name (str): The name of the alias to insert.
+            commands (list[str]): The commands of the alias.
+            group (str): The group to insert it into.
+        """
+        row = self.alias_model.store.group_range(group)[0]
+        if previous_name is not None and self.alias_model.store.group(previous_name) == group:
+            row = self.alias_model.row(previous_name) + 1
+        self.alias_model.insert(row, name, commands, group)
+
+    def insert(self, row: int, name: str, commands: list[str], group: str = CORE_GROUP):
+        """Insert a new alias at a row without selecting it.
+
+        Args:
+            row (int): The row to insert the alias at. Rows outside the group insert it at its start or end.
+            name (str): The name of the alias to insert.
+            commands (list[str]): The commands of the alias.
+            group (str): The group to insert it into.
+        """
+        self.alias_model.insert(row, name, commands, group)
+
+    def move(self, name: str, row: int, group: str | None = None):
+        """Move an alias to a row.
+
+        Args:
+            name (str): The name of the alias to move.
+            row (int): The row to move it to. Rows outside the group move it to its start or end.
+            group (str | None): The group to move it to. Defaults to its own group.
+        """
+        self.alias_model.move(name, row, group)
+
+    def row(self, name: str) -> int:
+        """Get the row of an alias."""
+        return self.alias_model.row(name)
+
+    def set_names(
+        self, names: list[str], added: Mapping[str, list[str]] | None = None, groups: Mapping[str, str] | None = None
+    ):
+        """Replace the aliases in the list in one update, e.g. after a bulk change. Aliases left out are removed.
+        Reordering and renaming keep the selection.
+
+        Args:
+            names (list[str]): A list of alias names in order.
+            added (Mapping[str, list[str]] | None): The commands of the names that are not in the list yet.
+            groups (Mapping[str, str] | None): The group of each alias that is added or changes group.
         """
-        self.insertItem(self.count(), name)
-        self.setCurrentRow(self.count() - 1)
+        selected = self.selected_names()
+        if self.alias_model.set_names(names, added, groups):
+            self.select_names([name for name in selected if name in self.alias_model.store])
+        self._on_item_selected(QItemSelection(), QItemSelection())
 
     def remove(self, name: str):
         """Remove an alias from the list.
@@ -43,9 +161,7 @@ class AliasList(QListWidget):
         Args:
             name (str): The name of the alias to remove.
         """
-        items = self.findItems(name, Qt.MatchFlag.MatchExactly)
-        assert len(items) == 1
-        self.takeItem(self.row(items[0]))
+        self.alias_model.remove(name)
 
     def update(self, old_name: str, new_name: str):
         """Update the name of an alias in the list.
@@ -54,9 +170,80 @@ class AliasList(QListWidget):
             old_name (str): The current name of the alias.
             new_name (str): The new name of the alias.
         """
-        items = self.findItems(old_name, Qt.MatchFlag.MatchExactly)
-        assert len(items) == 1
-        items[0].setText(new_name)
+        self.alias_model.rename(old_name, new_name)
+
+    def select(self, name: str):
+        """Select an alias and scroll to it.
+
+        Args:
+            name (str): The name of the alias to select.
+        """
+        index = self._index_of(name)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
+
+    def scroll_to_top(self, name: str):
+        """Scroll an alias to the top of the list, e.g. to restore where the list was scrolled to."""
+        self.scrollTo(self._index_of(name), QListView.ScrollHint.PositionAtTop)
+
+    def top_name(self) -> str | None:
+        """Get the first alias in view, or None if there is none."""
+        index = self.indexAt(QPoint(0, 0))
+        if not index.isValid():
+            return None
+        # The top row may be a group header.
+        for view_row in range(index.row(), min(index.row() + 2, self.alias_model.rowCount())):
+            name = self.alias_model.name_at(view_row)
+            if name is not None:
+                return name
+        return None
+
+    def select_names(self, names: list[str]):
+        """Select several aliases, making the first one current. Collapsed groups they are in are expanded."""
+        indexes = sorted((self._index_of(name) for name in names), key=QModelIndex.row)
+        selection = QItemSelection()
+        for index in indexes:
+            selection.select(index, index)
+        selection_model = self.selectionModel()
+        assert selection_model is not None
+        if indexes:
+            selection_model.setCurrentIndex(indexes[0], QItemSelectionModel.SelectionFlag.NoUpdate)
+        selection_model.select(selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+    def selected_names(self) -> list[str]:
+        """Get the names of the selected aliases, in list order."""
+        selection_model = self.selectionModel()
+        assert selection_model is not None
+        view_rows = sorted(index.row() for index in selection_model.selectedRows())
+        return [name for view_row in view_rows if (name := self.alias_model.name_at(view_row)) is not None]
+
+    def selection_size(self) -> int:
+        """Get the number of selected aliases, without listing them."""
+        selection_model = self.selectionModel()
+        assert selection_model is not None
+        return sum(selection_range.height() for selection_range in selection_model.selection())
+
+    def diagnostics(self, name: str) -> tuple[Diagnostic, ...]:
+        """Get the lint problems found in an alias."""
+        return self.alias_model.diagnostics(name)
+
+    def set_diagnostics(self, diagnostics: dict[str, tuple[Diagnostic, ...]]):
+        """Update the lint problems of some aliases, which are shown as badges.
+
+        Args:
+            diagnostics (dict[str, tuple[Diagnostic, ...]]): The problems of each alias, by name.
+        """
+        self.alias_model.set_diagnostics(diagnostics)
+
+    def next_with_diagnostics(self) -> str | None:
+        """Get the next alias with lint problems after the current one, or None if there are none."""
+        index = self.currentIndex()
+        row = self.alias_model.store_row(index.row()) if index.isValid() else None
+        return self.alias_model.next_with_diagnostics(-1 if row is None else row)
+
+    def clear_diagnostics(self):
+        """Remove every lint badge."""
+        self.alias_model.clear_diagnostics()
 
     def get_all_in_order(self) -> list[str]:
         """Get all the aliases in the list in order.
@@ -64,23 +251,44 @@ class AliasList(QListWidget):
         Returns:
             list[str]: A list of alias names.
         """
-        items = [self.item(i) for i in range(self.count())]
-        return [item.text() for item in items if item is not None]
+        return self.alias_model.names()
 
-    def _on_item_selected(self):
-        item = self.currentItem()
-        selected = item.text() if item is not None else ""
+    def _on_item_selected(self, _selected: QItemSelection, _deselected: QItemSelection):
+        index = self.currentIndex()
+        selection_model = self.selectionModel()
+        assert selection_model is not None
+        size = self.selection_size()
+        selected = ""
+        if size == 1 and selection_model.isSelected(index):
+            selected = self.alias_model.name_at(index.row()) or ""
         self.alias_selected.emit(selected)
+        self.selection_size_changed.emit(size)
+
+    def _on_clicked(self, index: QModelIndex):
+        if self.alias_model.is_header(index.row()):
+            group = self.alias_model.group_at(index.row())
+            self.set_collapsed(group, not self.alias_model.is_collapsed(group))
+
+    def _index_of(self, name: str) -> QModelIndex:
+        """Get the index of an alias, expanding its group and fetching rows up to it if needed."""
+        row = self.alias_model.row(name)
+        self.set_collapsed(self.alias_model.store.group(name), False)
+        return self.alias_model.alias_index(row)
 
     def contextMenuEvent(self, event: QContextMenuEvent):
         self.menu.exec_(event.globalPos())
 
     def dropEvent(self, event):
+        store = self.alias_model.store
+        dragged = [(name, store.row(name), store.group(name)) for name in self.selected_names()]
         super().dropEvent(event)
-        self.order_changed.emit()
+        moves = [(name, old_row, store.row(name), old_group, store.group(name)) for name, old_row, old_group in dragged]
+        if any(old_row != new_row or old_group != new_group for _, old_row, new_row, old_group, new_group in moves):
+            self.aliases_moved.emit(moves)
 
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() == Qt.Key.Key_Escape:
-            self.setCurrentItem(None)
+            self.clearSelection()
+            self.setCurrentIndex(QModelIndex())
         else:
             super().keyPressEvent(event)
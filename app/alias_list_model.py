@@ -0,0 +1,549 @@
+from collections.abc import Iterable, Mapping
+from typing import Any, NamedTuple
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QFont, QIcon
+from PyQt5.QtWidgets import QApplication, QStyle
+
+from app.alias_groups import CORE_GROUP, AliasGroup, group_label, group_loader
+from app.alias_index import AliasIndex
+from app.alias_store import AliasStore
+from app.macro_lint import ERROR, Diagnostic, worst_severity
+
+FETCH_BATCH_SIZE = 1000
+
+
+class Section(NamedTuple):
+    """Where the aliases of a group are in the list."""
+
+    group: str
+    header: int
+    """The row of the group's header, or of its first alias if there are no headers."""
+    start: int
+    """The store row of the group's first alias."""
+    end: int
+    shown: int
+    """The number of the group's aliases in the list: none if it is collapsed, otherwise those fetched so far."""
+
+
+class AliasListModel(QAbstractListModel):
+    """The aliases of an alias store, in order. The store is changed through the model, so the view follows along.
+
+    Rows are exposed to the view in batches as it scrolls, so populating a very large list is instant. Aliases with lint
+    problems are shown with an error or warning badge.
+
+    Once there are named groups, each group starts with a header row that can be clicked to collapse it. The aliases of
+    a collapsed group have no rows. Rows of the model are only store rows while there are no groups, so the methods that
+    take or return a row say which they mean.
+    """
+
+    def __init__(self, store: AliasStore, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._fetched = 0
+        """The number of store rows exposed to the view, from the top."""
+        self._diagnostics: dict[str, tuple[Diagnostic, ...]] = {}
+        self._badges: dict[str, QIcon] = {}
+        self._collapsed: set[str] = set()
+        self._autoload: set[str] = set()
+        self._header_font = QFont()
+        self._header_font.setBold(True)
+        self._layout: tuple[tuple[int, int], list[Section]] | None = None
+        """The sections of the rows fetched so far, by the layout version of the store and the rows fetched. The view
+        asks for the row count very often, e.g. many times per row while scrolling to a row."""
+
+    def rowCount(self, parent: QModelIndex | None = None) -> int:
+        if parent is not None and parent.isValid():
+            return 0
+        return self._row_count(self._sections())
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        section, row = self._locate(index.row())
+        if row is None:
+            return self._header_data(section, role)
+        name = self.store.name(row)
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return name
+        if role == Qt.ItemDataRole.DecorationRole:
+            severity = worst_severity(self._diagnostics.get(name, ()))
+            return None if severity is None else self._badge(severity)
+        if role == Qt.ItemDataRole.ToolTipRole and self._diagnostics.get(name):
+            return "\n".join(diagnostic.describe() for diagnostic in self._diagnostics[name])
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            # Only allow dropping between items, not onto them.
+            return Qt.ItemFlag.ItemIsDropEnabled
+        if self.is_header(index.row()):
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled
+
+    def supportedDropActions(self) -> Qt.DropActions:
+        return Qt.DropAction.MoveAction
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self._fetched < len(self.store)
+
+    def fetchMore(self, parent: QModelIndex):
+        if parent.isValid():
+            return
+        self._fetch(min(self._fetched + FETCH_BATCH_SIZE, len(self.store)))
+
+    def moveRows(
+        self,
+        sourceParent: QModelIndex,
+        sourceRow: int,
+        count: int,
+        destinationParent: QModelIndex,
+        destinationChild: int,
+    ) -> bool:
+        if not self.has_groups():
+            last_row = sourceRow + count - 1
+            if not self.beginMoveRows(sourceParent, sourceRow, last_row, destinationParent, destinationChild):
+                return False
+            insert_at = destinationChild - count if destinationChild > sourceRow else destinationChild
+            self.store.move_rows(sourceRow, count, insert_at)
+            self.endMoveRows()
+            return True
+        # The view moves the dragged aliases one at a time. Dropping between two groups adds the alias to the end of the
+        # group above, and dropping next to a collapsed group is refused as it is unclear which group is meant.
+        source = self.store_row(sourceRow)
+        target = self._drop_target(destinationChild)
+        if count != 1 or source is None or target is None:
+            return False
+        group, insert_before = target
+        return self._move(source, insert_before - 1 if insert_before > source else insert_before, group)
+
+    def has_groups(self) -> bool:
+        """Check whether there are named groups, and so group headers in the list."""
+        return len(self.store.groups) > 1
+
+    def set_groups(self, groups: list[AliasGroup], collapsed: Iterable[str] = ()) -> bool:
+        """Change the named groups.
+
+        Args:
+            groups (list[AliasGroup]): The named groups in order. Aliases of groups left out are moved to the core
+                group.
+            collapsed (Iterable[str]): The groups to collapse.
+
+        Returns:
+            bool: True if the list was rebuilt, losing the selection.
+        """
+        names = [group.name for group in groups]
+        self._autoload = {group.name for group in groups if group.autoload}
+        if names == self.store.groups[1:] and set(collapsed) == self._collapsed:
+            # Only whether they are loaded at startup changed, which is shown in the header tooltips.
+            self._update_headers()
+            return False
+        self.beginResetModel()
+        self.store.set_groups(names)
+        self._collapsed = set(collapsed) & set(self.store.groups)
+        self._layout = None
+        self.endResetModel()
+        return True
+
+    def collapsed_groups(self) -> list[str]:
+        """Get the collapsed groups, in order."""
+        return [group for group in self.store.groups if group in self._collapsed]
+
+    def set_collapsed(self, group: str, collapsed: bool):
+        """Collapse or expand a group, removing or adding the rows of its aliases."""
+        if collapsed == (group in self._collapsed):
+            return
+        section = next((section for section in self._sections() if section.group == group), None)
+        if section is None:
+            # Not fetched yet, so it has no rows either way.
+            self._collapsed ^= {group}
+            self._layout = None
+            return
+        first = section.header + 1
+        if collapsed:
+            if section.shown:
+                self.beginRemoveRows(QModelIndex(), first, first + section.shown - 1)
+            self._collapsed.add(group)
+            self._layout = None
+            if section.shown:
+                self.endRemoveRows()
+        else:
+            shown = min(section.end, self._fetched) - section.start
+            if shown:
+                self.beginInsertRows(QModelIndex(), first, first + shown - 1)
+            self._collapsed.discard(group)
+            self._layout = None
+            if shown:
+                self.endInsertRows()
+        header = self.index(section.header)
+        self.dataChanged.emit(header, header)
+
+    def is_collapsed(self, group: str) -> bool:
+        return group in self._collapsed
+
+    def populate(self, index: AliasIndex, groups: Mapping[str, str] | None = None):
+        """Replace the aliases with the ones in an alias file.
+
+        Args:
+            index (AliasIndex): An index of the alias file. The commands are decoded when they are first read.
+            groups (Mapping[str, str] | None): The group of each alias in a named group.
+        """
+        self.beginResetModel()
+        self.store.reset(index, groups)
+        self._fetched = min(FETCH_BATCH_SIZE, len(self.store))
+        self.endResetModel()
+
+    def set_names(
+        self, names: list[str], added: Mapping[str, list[str]] | None = None, groups: Mapping[str, str] | None = None
+    ) -> bool:
+        """Replace the aliases in one update, e.g. after a bulk change. Aliases left out are removed. If they were only
+        reordered or renamed, the selection is kept.
+
+        Args:
+            names (list[str]): All the alias names in order.
+            added (Mapping[str, list[str]] | None): The commands of the names that are not in the list yet.
+            groups (Mapping[str, str] | None): The group of each alias that is added or changes group.
+
+        Returns:
+            bool: True if the list was rebuilt, losing the selection.
+        """
+        if added or len(names) != len(self.store) or (groups and self.has_groups()):
+            # The number of rows changes, if only because the aliases of a collapsed group have none.
+            self.beginResetModel()
+            self.store.set_order(names, added, groups)
+            self._fetched = min(max(self._fetched, FETCH_BATCH_SIZE), len(self.store))
+            self.endResetModel()
+            return True
+        # The records follow their aliases through renames, so the selected rows (which are held as persistent indexes)
+        # can too. Fetch far enough that they can follow their aliases.
+        persistent = self.persistentIndexList()
+        followed: list[tuple[str, int]] = []
+        for index in persistent:
+            section, row = self._locate(index.row())
+            followed.append((section.group, -1) if row is None else (self.store.name(row), row))
+        wanted = {name for name, row in followed if row >= 0}
+        last_row = max((row for row, name in enumerate(names) if name in wanted), default=-1)
+        self._fetch(max(self._fetched, last_row + 1))
+        self.layoutAboutToBeChanged.emit()
+        records = [self.store.record_at(row) if row >= 0 else None for _, row in followed]
+        self.store.set_order(names)
+        new_indexes = []
+        for (group, _), record in zip(followed, records, strict=True):
+            new_indexes.append(self.header_index(group) if record is None else self.alias_index(record.row))
+        self.changePersistentIndexList(persistent, new_indexes)
+        self.layoutChanged.emit()
+        return False
+
+    def append(self, name: str, commands: list[str], group: str = CORE_GROUP) -> int:
+        """Append a new alias to the end of a group.
+
+        Returns:
+            int: The store row of the new alias.
+        """
+        end = self.store.group_range(group)[1]
+        self._fetch(max(self._fetched, end))
+        return self.insert(end, name, commands, group)
+
+    def insert(self, row: int, name: str, commands: list[str], group: str = CORE_GROUP) -> int:
+        """Insert a new alias before a store row. Rows outside the group are moved to its start or end.
+
+        Returns:
+            int: The store row of the new alias.
+        """
+        start, end = self.store.group_range(group)
+        row = max(start, min(row, end))
+        if row > self._fetched:
+            self.store.insert(row, name, commands, group)
+            self._update_headers()
+            return row
+        view_row = None if group in self._collapsed else self._insert_row(row, group)
+        if view_row is not None:
+            self.beginInsertRows(QModelIndex(), view_row, view_row)
+        self.store.insert(row, name, commands, group)
+        self._fetched += 1
+        if view_row is not None:
+            self.endInsertRows()
+        self._update_headers()
+        return row
+
+    def remove(self, name: str):
+        """Remove an alias from the list."""
+        row = self.store.row(name)
+        self._diagnostics.pop(name, None)
+        if self.has_groups():
+            # Otherwise the header of a group below might move up into the fetched rows.
+            self._fetch(max(self._fetched, row + 1))
+        if row >= self._fetched:
+            self.store.remove(name)
+            return
+        view_row = self.view_row(row)
+        if view_row is not None:
+            self.beginRemoveRows(QModelIndex(), view_row, view_row)
+        self.store.remove(name)
+        self._fetched -= 1
+        if view_row is not None:
+            self.endRemoveRows()
+        self._update_headers()
+
+    def rename(self, old_name: str, new_name: str):
+        """Rename an alias, keeping its position."""
+        self.store.rename(old_name, new_name)
+        # Kept until the renamed alias is linted again.
+        if old_name in self._diagnostics:
+            self._diagnostics[new_name] = self._diagnostics.pop(old_name)
+        view_row = self.view_row(self.store.row(new_name))
+        if view_row is not None:
+            index = self.index(view_row)
+            self.dataChanged.emit(index, index)
+
+    def move(self, name: str, row: int, group: str | None = None):
+        """Move an alias to a store row, fetching rows up to it if needed.
+
+        Args:
+            name (str): The alias to move.
+            row (int): The store row it ends up at. Rows outside the group are moved to its start or end.
+            group (str | None): The group to move it to. Defaults to its own group.
+        """
+        self._move(self.store.row(name), row, self.store.group(name) if group is None else group)
+
+    def row(self, name: str) -> int:
+        """Get the store row of an alias, fetching rows up to it if needed."""
+        row = self.store.row(name)
+        self._fetch(max(self._fetched, row + 1))
+        return row
+
+    def view_row(self, row: int) -> int | None:
+        """Get the row in the list of the alias at a store row, or None if it has no row (yet)."""
+        header_rows = self._header_rows()
+        for section in self._sections():
+            if section.start <= row < section.end:
+                offset = row - section.start
+                return section.header + header_rows + offset if offset < section.shown else None
+        return None
+
+    def store_row(self, view_row: int) -> int | None:
+        """Get the store row of the alias at a row in the list, or None if it is a group header."""
+        return self._locate(view_row)[1]
+
+    def alias_index(self, row: int) -> QModelIndex:
+        """Get the index of the alias at a store row, or an invalid index if its group is collapsed."""
+        view_row = self.view_row(row)
+        return QModelIndex() if view_row is None else self.index(view_row)
+
+    def header_index(self, group: str) -> QModelIndex:
+        """Get the index of the header of a group, or an invalid index if it has none."""
+        if not self.has_groups():
+            return QModelIndex()
+        section = next((section for section in self._sections() if section.group == group), None)
+        return QModelIndex() if section is None else self.index(section.header)
+
+    def is_header(self, view_row: int) -> bool:
+        return self.has_groups() and self.store_row(view_row) is None
+
+    def name_at(self, view_row: int) -> str | None:
+        """Get the name of the alias at a row in the list, or None if it is a group header."""
+        row = self.store_row(view_row)
+        return None if row is None else self.store.name(row)
+
+    def group_at(self, view_row: int) -> str:
+        """Get the group of the alias or header at a row in the list."""
+        return self._locate(view_row)[0].group
+
+    def count(self) -> int:
+        """Get the number of aliases, including rows not fetched yet."""
+        return len(self.store)
+
+    def diagnostics(self, name: str) -> tuple[Diagnostic, ...]:
+        """Get the lint problems found in an alias."""
+        return self._diagnostics.get(name, ())
+
+    def set_diagnostics(self, diagnostics: dict[str, tuple[Diagnostic, ...]]):
+        """Update the lint problems of some aliases, and their badges."""
+        rows = []
+        for name, alias_diagnostics in diagnostics.items():
+            if alias_diagnostics:
+                self._diagnostics[name] = alias_diagnostics
+            elif self._diagnostics.pop(name, None) is None:
+                continue
+            if name in self.store and (row := self.store.row(name)) < self._fetched:
+                rows.append(row)
+        view_rows = [view_row for row in rows if (view_row := self.view_row(row)) is not None]
+        if view_rows:
+            roles = [Qt.ItemDataRole.DecorationRole, Qt.ItemDataRole.ToolTipRole]
+            self.dataChanged.emit(self.index(min(view_rows)), self.index(max(view_rows)), roles)
+
+    def next_with_diagnostics(self, row: int) -> str | None:
+        """Get the first alias with lint problems after a store row, wrapping around to the start of the list."""
+        rows = sorted(self.store.row(name) for name in self._diagnostics if name in self.store)
+        later = [other for other in rows if other > row]
+        if later or rows:
+            return self.store.name((later or rows)[0])
+        return None
+
+    def clear_diagnostics(self):
+        """Forget every lint problem, e.g. before the aliases are linted again."""
+        self._diagnostics.clear()
+        row_count = self.rowCount()
+        if row_count:
+            self.dataChanged.emit(self.index(0), self.index(row_count - 1), [Qt.ItemDataRole.DecorationRole])
+
+    def names(self) -> list[str]:
+        """Get a copy of all the alias names in order."""
+        return self.store.names()
+
+    def fetch_all(self):
+        """Expose every remaining row to the view."""
+        self._fetch(len(self.store))
+
+    def _fetch(self, fetched: int):
+        """Expose the store rows up to a row to the view. Rows are only ever added after the last one."""
+        if fetched <= self._fetched:
+            return
+        old_count = self.rowCount()
+        new_count = self._row_count(self._sections(fetched))
+        if new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+        self._fetched = fetched
+        if new_count > old_count:
+            self.endInsertRows()
+
+    def _move(self, source: int, row: int, group: str) -> bool:
+        """Move the alias at a store row to another store row in a group, with the fewest changes to the rows."""
+        old_group = self.store.record_at(source).group
+        sizes = {other: self.store.group_size(other) for other in self.store.groups}
+        sizes[old_group] -= 1
+        sizes[group] += 1
+        start = 0
+        for other in self.store.groups[: self.store.groups.index(group)]:
+            start += sizes[other]
+        row = max(start, min(row, start + sizes[group] - 1))
+        if (row, group) == (source, old_group):
+            return True
+        if self.has_groups():
+            # So no group header moves into or out of the fetched rows.
+            self._fetch(max(self._fetched, self.store.group_range(old_group)[1], start + sizes[group]))
+        else:
+            self._fetch(max(self._fetched, source + 1, row + 1))
+        old_view_row = self.view_row(source)
+        new_view_row = None
+        header_rows = self._header_rows()
+        for section in self._sections(sizes=sizes):
+            if section.group == group and row - section.start < section.shown:
+                new_view_row = section.header + header_rows + row - section.start
+        parent = QModelIndex()
+        if old_view_row is not None and new_view_row is not None and old_view_row != new_view_row:
+            # The destination is the row to insert before, counted before the alias is removed.
+            destination = new_view_row + 1 if new_view_row > old_view_row else new_view_row
+            if not self.beginMoveRows(parent, old_view_row, old_view_row, parent, destination):
+                return False
+            self.store.move_rows(source, 1, row, group)
+            self.endMoveRows()
+        elif old_view_row is not None and new_view_row is None:
+            self.beginRemoveRows(parent, old_view_row, old_view_row)
+            self.store.move_rows(source, 1, row, group)
+            self.endRemoveRows()
+        elif old_view_row is None and new_view_row is not None:
+            self.beginInsertRows(parent, new_view_row, new_view_row)
+            self.store.move_rows(source, 1, row, group)
+            self.endInsertRows()
+        else:
+            self.store.move_rows(source, 1, row, group)
+        if group != old_group:
+            self._update_headers()
+        return True
+
+    def _drop_target(self, view_row: int) -> tuple[str, int] | None:
+        """Get the group and store row to insert a dropped alias before, from the row it was dropped before."""
+        sections = self._sections()
+        if view_row >= self._row_count(sections):
+            last = sections[-1]
+            return None if last.group in self._collapsed else (last.group, last.start + last.shown)
+        for position, section in enumerate(sections):
+            if view_row == section.header:
+                if position == 0:
+                    return section.group, section.start
+                above = sections[position - 1]
+                return None if above.group in self._collapsed else (above.group, above.end)
+            if view_row <= section.header + section.shown:
+                return section.group, section.start + view_row - section.header - 1
+        return None
+
+    def _header_rows(self) -> int:
+        return 1 if self.has_groups() else 0
+
+    def _sections(self, fetched: int | None = None, sizes: Mapping[str, int] | None = None) -> list[Section]:
+        """Get where each group is in the list, with the rows fetched so far or a different number of them.
+
+        The header of a group is only in the list once the rows before it are, so rows are always added at the end.
+        """
+        if fetched is None and sizes is None:
+            key = (self.store.layout_version, self._fetched)
+            if self._layout is None or self._layout[0] != key:
+                self._layout = key, self._sections(self._fetched)
+            return self._layout[1]
+        fetched = self._fetched if fetched is None else fetched
+        header_rows = self._header_rows()
+        sections = []
+        view_row = start = 0
+        for group in self.store.groups:
+            if start > fetched:
+                break
+            size = self.store.group_size(group) if sizes is None else sizes[group]
+            shown = 0 if group in self._collapsed else min(start + size, fetched) - start
+            sections.append(Section(group, view_row, start, start + size, shown))
+            view_row += header_rows + shown
+            start += size
+        return sections
+
+    def _row_count(self, sections: list[Section]) -> int:
+        last = sections[-1]
+        return last.header + self._header_rows() + last.shown
+
+    def _locate(self, view_row: int) -> tuple[Section, int | None]:
+        """Get the section of a row in the list, and the store row of its alias or None if it is a group header."""
+        header_rows = self._header_rows()
+        sections = self._sections()
+        for section in sections:
+            if view_row < section.header + header_rows + section.shown:
+                offset = view_row - section.header - header_rows
+                return section, None if offset < 0 else section.start + offset
+        return sections[-1], None
+
+    def _insert_row(self, row: int, group: str) -> int | None:
+        """Get the row in the list an alias inserted before a store row in an expanded group ends up at."""
+        for section in self._sections():
+            if section.group == group:
+                return section.header + self._header_rows() + row - section.start
+        return None
+
+    def _header_data(self, section: Section, role: int) -> Any:
+        group = section.group
+        if role == Qt.ItemDataRole.DisplayRole:
+            arrow = "\u25b8" if group in self._collapsed else "\u25be"
+            return f"{arrow} {group_label(group)} ({section.end - section.start})"
+        if role == Qt.ItemDataRole.FontRole:
+            return self._header_font
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if group == CORE_GROUP:
+                return "Loaded into every Command Prompt."
+            if group in self._autoload:
+                return f"Loaded into every Command Prompt from {group_loader(group)}."
+            return f"Loaded on demand, by typing: aliasaurus load {group}"
+        return None
+
+    def _update_headers(self):
+        """Update the alias counts in the group headers."""
+        if self.has_groups():
+            for section in self._sections():
+                header = self.index(section.header)
+                self.dataChanged.emit(header, header, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole])
+
+    def _badge(self, severity: str) -> QIcon:
+        if severity not in self._badges:
+            style = QApplication.style()
+            assert style is not None
+            pixmap = QStyle.StandardPixmap.SP_MessageBoxCritical
+            if severity != ERROR:
+                pixmap = QStyle.StandardPixmap.SP_MessageBoxWarning
+            self._badges[severity] = style.standardIcon(pixmap)
+        return self._badges[severity]
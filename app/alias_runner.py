@@ -0,0 +1,263 @@
+import codecs
+import os
+import time
+
+from PyQt5.QtCore import QObject, QProcess, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QTextCharFormat, QTextCursor
+from PyQt5.QtWidgets import (
+    QDockWidget,
+    QHBoxLayout,
+    QLabel,
+    QPlainTextEdit,
+    QPushButton,
+    QTabWidget,
+    QVBoxLayout,
+    QWidget,
+)
+
+from app.macro_expand import expand_macro
+from app.platform_backend import PlatformBackend, ShellCommand
+
+OUTPUT_FLUSH_MS = 50
+"""How often output is added to the pane, so a chatty command can't flood the GUI thread with small updates."""
+MAX_OUTPUT_LINES = 10_000
+"""The lines of output kept per run. Older lines are dropped so a long run can't use up memory."""
+MAX_RUN_TABS = 20
+"""The runs kept in the pane. The oldest finished runs are closed to make room for new ones."""
+ERROR_COLOR = QColor(200, 40, 40)
+
+
+class AliasRun(QObject):
+    """Runs the expansion of an alias in a background process and streams its output."""
+
+    output = pyqtSignal(str, bool)
+    """Some output, and whether it was written to stderr. Output is batched, at most every `OUTPUT_FLUSH_MS`."""
+    finished = pyqtSignal(str)
+    """The run is over, with a description of how it ended."""
+
+    def __init__(self, command: ShellCommand, timeout_s: float, parent: QObject | None = None):
+        """
+        Args:
+            command (ShellCommand): How to run the commands.
+            timeout_s (float): How long to wait before killing the process, or 0 to wait forever.
+        """
+        super().__init__(parent)
+        self.command = command
+        self.timeout_s = timeout_s
+        self.running = False
+        self._started = 0.0
+        self._reason = ""
+        self._decoders = {
+            False: codecs.getincrementaldecoder(command.encoding)(errors="replace"),
+            True: codecs.getincrementaldecoder(command.encoding)(errors="replace"),
+        }
+        self._pending: list[tuple[str, bool]] = []
+
+        self.process = QProcess(self)
+        self.process.setProgram(command.program)
+        self.process.setArguments(command.arguments)
+        if command.native_arguments:
+            # Only available, and only needed, on Windows.
+            self.process.setNativeArguments(command.native_arguments)
+        self.process.setWorkingDirectory(os.path.expanduser("~"))
+        self.process.readyReadStandardOutput.connect(lambda: self._read(stderr=False))
+        self.process.readyReadStandardError.connect(lambda: self._read(stderr=True))
+        self.process.finished.connect(self._on_finished)
+        self.process.errorOccurred.connect(self._on_error)
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(OUTPUT_FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush)
+        self._timeout_timer = QTimer(self)
+        self._timeout_timer.setSingleShot(True)
+        self._timeout_timer.timeout.connect(self._on_timeout)
+
+    def start(self):
+        """Start the process. Returns straight away, the output and the end of the run are signalled."""
+        self.running = True
+        self._started = time.perf_counter()
+        self.process.start()
+        # Commands that ask for input get none rather than waiting forever.
+        self.process.closeWriteChannel()
+        if self.timeout_s > 0:
+            self._timeout_timer.start(int(self.timeout_s * 1000))
+
+    def cancel(self):
+        """Kill the process, if it is still running."""
+        if self.running:
+            self._stop("Cancelled")
+
+    def _stop(self, reason: str):
+        self._reason = reason
+        self.process.kill()
+
+    def _read(self, stderr: bool):
+        data = bytes(self.process.readAllStandardError() if stderr else self.process.readAllStandardOutput())
+        text = self._decoders[stderr].decode(data)
+        if text:
+            self._pending.append((text, stderr))
+            if not self._flush_timer.isActive():
+                self._flush_timer.start()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        # Join consecutive output of the same stream, so each is added to the pane in one go.
+        text, stderr = "", False
+        for chunk, chunk_stderr in pending:
+            if text and chunk_stderr != stderr:
+                self.output.emit(text, stderr)
+                text = ""
+            text += chunk
+            stderr = chunk_stderr
+        if text:
+            self.output.emit(text, stderr)
+
+    def _on_timeout(self):
+        if self.running:
+            self._stop("Timed out")
+
+    def _on_finished(self, exit_code: int, exit_status: QProcess.ExitStatus):
+        if not self.running:
+            return
+        for stderr, decoder in self._decoders.items():
+            if text := decoder.decode(b"", final=True):
+                self._pending.append((text, stderr))
+        elapsed = time.perf_counter() - self._started
+        if self._reason:
+            description = self._reason
+        elif exit_status == QProcess.ExitStatus.CrashExit:
+            description = "Crashed"
+        else:
+            description = f"Exited with code {exit_code}"
+        self._end(f"{description} after {elapsed:.2f} s")
+
+    def _on_error(self, error: QProcess.ProcessError):
+        # Other errors are followed by the finished signal.
+        if error == QProcess.ProcessError.FailedToStart and self.running:
+            self._end(f"Failed to start {self.command.program}: {self.process.errorString()}")
+
+    def _end(self, description: str):
+        self.running = False
+        self._timeout_timer.stop()
+        self._flush_timer.stop()
+        self._flush()
+        self.finished.emit(description)
+
+
+class RunView(QWidget):
+    """The output of one run, with a button to cancel it."""
+
+    def __init__(self, run: AliasRun, commands: list[str], parent: QWidget | None = None):
+        """
+        Args:
+            run (AliasRun): The run to show.
+            commands (list[str]): The commands being run, shown above the output.
+        """
+        super().__init__(parent)
+        self.run = run
+        self.status = QLabel("Running...")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(run.cancel)
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        self.output.setFont(QFont("Consolas"))
+        self.output.setMaximumBlockCount(MAX_OUTPUT_LINES)
+        self.output.setPlainText("\n".join(f"> {command}" for command in commands) + "\n")
+        self._error_format = QTextCharFormat()
+        self._error_format.setForeground(ERROR_COLOR)
+        run.output.connect(self._on_output)
+        run.finished.connect(self._on_finished)
+
+        header = QHBoxLayout()
+        header.addWidget(self.status, 1)
+        header.addWidget(self.cancel_button)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(header)
+        layout.addWidget(self.output)
+        self.setLayout(layout)
+
+    def _on_output(self, text: str, stderr: bool):
+        scrollbar = self.output.verticalScrollBar()
+        following = scrollbar.value() == scrollbar.maximum()
+        cursor = QTextCursor(self.output.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text, self._error_format if stderr else QTextCharFormat())
+        if following:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _on_finished(self, description: str):
+        self.status.setText(description)
+        self.cancel_button.setEnabled(False)
+
+
+class RunPane(QDockWidget):
+    """A dock pane that runs aliases without blocking the GUI, one tab per run. Several runs can go at once."""
+
+    def __init__(self, backend: PlatformBackend, parent: QWidget | None = None):
+        """
+        Args:
+            backend (PlatformBackend): Runs the commands in the shell of the platform.
+        """
+        super().__init__("Output", parent)
+        self.setObjectName("run_pane")
+        self.backend = backend
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self._close_tab)
+        self.setWidget(self.tabs)
+
+    def run(self, name: str, commands: list[str], arguments: str, timeout_s: float) -> AliasRun:
+        """Run an alias as if it was typed in cmd.exe, and show its output in a new tab.
+
+        Args:
+            name (str): The name of the alias.
+            commands (list[str]): The commands of the alias.
+            arguments (str): What is typed after the alias name.
+            timeout_s (float): How long to wait before killing the process, or 0 to wait forever.
+
+        Returns:
+            AliasRun: The run, which has already started.
+        """
+        expanded = expand_macro(commands, arguments)
+        run = AliasRun(self.backend.shell_command(expanded), timeout_s, self)
+        view = RunView(run, expanded)
+        title = f"{name} {arguments}".strip()
+        self._make_room()
+        index = self.tabs.addTab(view, f"{title} (running)")
+        run.finished.connect(lambda: self._set_tab_title(view, title))
+        self.tabs.setCurrentIndex(index)
+        self.show()
+        self.raise_()
+        run.start()
+        return run
+
+    def runs(self) -> list[AliasRun]:
+        return [view.run for view in self._views()]
+
+    def cancel_all(self):
+        for run in self.runs():
+            run.cancel()
+
+    def _views(self) -> list[RunView]:
+        return [view for index in range(self.tabs.count()) if isinstance(view := self.tabs.widget(index), RunView)]
+
+    def _set_tab_title(self, view: RunView, title: str):
+        index = self.tabs.indexOf(view)
+        if index != -1:
+            self.tabs.setTabText(index, title)
+
+    def _make_room(self):
+        finished = [view for view in self._views() if not view.run.running]
+        for view in finished[: max(0, self.tabs.count() - MAX_RUN_TABS + 1)]:
+            self._close_tab(self.tabs.indexOf(view))
+
+    def _close_tab(self, index: int):
+        view = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        if isinstance(view, RunView):
+            view.run.cancel()
+            view.run.deleteLater()
+            view.deleteLater()
@@ -0,0 +1,178 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+DEFAULT_LIMIT = 200
+MIN_SIMILARITY = 0.5
+"""The fraction of the query's trigrams a name must contain to be a fuzzy match."""
+COMMAND_MATCH_SCORE = 0.75
+"""The score of an alias whose commands match the query. Exact and substring name matches rank above it."""
+MIN_COMMAND_TERM_LENGTH = 2
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _trigrams(text: str) -> set[str]:
+    if len(text) < 3:
+        return {text}
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _compact(items: list, is_live: Callable[[Any], bool]) -> list:
+    # Mostly sorted already, so sorting in place is close to linear.
+    items.sort()
+    return [item for i, item in enumerate(items) if is_live(item) and (i == 0 or item != items[i - 1])]
+
+
+class AliasSearchIndex:
+    """An incrementally updated search index over alias names and commands.
+
+    Names are indexed by trigram, so they can be matched fuzzily, and by prefix. Commands are split into words which are
+    indexed by prefix. The index is built once and then kept up to date alias by alias, never rebuilt from scratch.
+    """
+
+    def __init__(self):
+        self._names: dict[str, str] = {}
+        self._name_trigrams: dict[str, set[str]] = {}
+        self._sorted_names: list[tuple[str, str]] = []
+        self._sorted_names_dirty = False
+        self._alias_tokens: dict[str, set[str]] = {}
+        self._tokens: dict[str, set[str]] = {}
+        self._sorted_tokens: list[str] = []
+        self._sorted_tokens_dirty = False
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, commands: list[str] | None = None):
+        """Add an alias to the index.
+
+        Args:
+            name (str): The name of the alias.
+            commands (list[str] | None): The commands of the alias, or None to only index the name for now.
+        """
+        lowered = name.lower()
+        self._names[name] = lowered
+        for trigram in _trigrams(lowered):
+            self._name_trigrams.setdefault(trigram, set()).add(name)
+        self._sorted_names.append((lowered, name))
+        self._sorted_names_dirty = True
+        if commands is not None:
+            self.set_commands(name, commands)
+
+    def add_names(self, names: Iterable[str]):
+        """Add many aliases to the index by name only."""
+        for name in names:
+            self.add(name)
+
+    def remove(self, name: str):
+        """Remove an alias from the index."""
+        lowered = self._names.pop(name)
+        for trigram in _trigrams(lowered):
+            self._discard(self._name_trigrams, trigram, name)
+        # The sorted list keeps a stale entry which is skipped on lookup and dropped on the next sort.
+        self._sorted_names_dirty = True
+        self.set_commands(name, [])
+        self._alias_tokens.pop(name, None)
+
+    def set_commands(self, name: str, commands: list[str]):
+        """Index (or re-index) the commands of an alias."""
+        tokens = {token for command in commands for token in TOKEN_PATTERN.findall(command.lower())}
+        old_tokens = self._alias_tokens.get(name, set())
+        for token in old_tokens - tokens:
+            self._discard(self._tokens, token, name)
+        for token in tokens - old_tokens:
+            names = self._tokens.get(token)
+            if names is None:
+                names = self._tokens[token] = set()
+                self._sorted_tokens.append(token)
+                self._sorted_tokens_dirty = True
+            names.add(name)
+        self._alias_tokens[name] = tokens
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[str]:
+        """Find the aliases that best match a query.
+
+        Args:
+            query (str): The text to search for in the alias names and commands.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list[str]: The matching alias names, best match first.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        scores: dict[str, float] = {}
+        if len(query) >= 3:
+            query_trigrams = _trigrams(query)
+            hits: Counter[str] = Counter()
+            for trigram in query_trigrams:
+                hits.update(self._name_trigrams.get(trigram, ()))
+            for name, count in hits.items():
+                similarity = count / len(query_trigrams)
+                if similarity >= MIN_SIMILARITY:
+                    scores[name] = self._name_score(self._names[name], query, similarity)
+        else:
+            for name in self._names_with_prefix(query):
+                scores[name] = self._name_score(self._names[name], query, 0.0)
+        for name in self._command_matches(query.split()):
+            scores[name] = max(scores.get(name, 0.0), COMMAND_MATCH_SCORE)
+        return heapq.nlargest(limit, scores, key=scores.__getitem__)
+
+    def _name_score(self, lowered: str, query: str, similarity: float) -> float:
+        if lowered == query:
+            return 4.0
+        if lowered.startswith(query):
+            return 3.0 + len(query) / len(lowered)
+        if query in lowered:
+            return 2.0 + len(query) / len(lowered)
+        return similarity
+
+    def _command_matches(self, terms: list[str]) -> set[str]:
+        matches: set[str] | None = None
+        for term in terms:
+            if len(term) < MIN_COMMAND_TERM_LENGTH:
+                continue
+            names: set[str] = set()
+            for token in self._tokens_with_prefix(term):
+                names |= self._tokens[token]
+            matches = names if matches is None else matches & names
+            if not matches:
+                break
+        return matches or set()
+
+    def _names_with_prefix(self, prefix: str) -> Iterator[str]:
+        if self._sorted_names_dirty:
+            self._sorted_names = _compact(self._sorted_names, lambda item: self._names.get(item[1]) == item[0])
+            self._sorted_names_dirty = False
+        for lowered, name in islice(self._sorted_names, bisect_left(self._sorted_names, (prefix,)), None):
+            if not lowered.startswith(prefix):
+                break
+            yield name
+
+    def _tokens_with_prefix(self, prefix: str) -> Iterator[str]:
+        if self._sorted_tokens_dirty:
+            self._sorted_tokens = _compact(self._sorted_tokens, lambda token: token in self._tokens)
+            self._sorted_tokens_dirty = False
+        for token in islice(self._sorted_tokens, bisect_left(self._sorted_tokens, prefix), None):
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def _discard(self, postings: dict[str, set[str]], key: str, name: str):
+        names = postings.get(key)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del postings[key]
+            if postings is self._tokens:
+                self._sorted_tokens_dirty = True
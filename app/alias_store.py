@@ -0,0 +1,354 @@
+import logging
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+
+from app.alias_groups import CORE_GROUP
+from app.alias_index import AliasIndex, StaleIndexError, decode_commands
+
+COMMAND_SEPARATOR = "\n"
+"""Joins the commands of an alias, as in the editor. Commands are single lines, so it never appears in one."""
+
+
+def join_commands(commands: list[str]) -> str:
+    """Join the commands of an alias into one string, one command per line."""
+    return COMMAND_SEPARATOR.join(commands)
+
+
+class AliasRecord:
+    """A single alias. The commands are held as one string rather than a list of strings, with the offset each command
+    ends at worked out the first time a single command is read."""
+
+    __slots__ = ("_ends", "group", "name", "row", "text")
+
+    def __init__(self, name: str, row: int, text: str | None = None, group: str = CORE_GROUP):
+        """
+        Args:
+            name (str): The name of the alias, interned.
+            row (int): The position of the alias in the list.
+            text (str | None): The commands, one per line, or None if they have not been decoded yet.
+            group (str): The group of the alias.
+        """
+        self.name = name
+        self.row = row
+        self.text = text
+        self.group = group
+        self._ends: array | None = None
+
+    def set_text(self, text: str):
+        self.text = text
+        self._ends = None
+
+    def commands(self) -> list[str]:
+        assert self.text is not None
+        return self.text.split(COMMAND_SEPARATOR)
+
+    def command_count(self) -> int:
+        return len(self._offsets()) + 1
+
+    def command(self, index: int) -> str:
+        """Get a single command without splitting the others."""
+        assert self.text is not None
+        ends = self._offsets()
+        if not 0 <= index <= len(ends):
+            raise IndexError(index)
+        start = 0 if index == 0 else ends[index - 1] + 1
+        end = ends[index] if index < len(ends) else len(self.text)
+        return self.text[start:end]
+
+    def _offsets(self) -> array:
+        # Most aliases are only ever read whole, so the offsets are not kept until they are needed.
+        if self._ends is None:
+            assert self.text is not None
+            ends = array("I")
+            position = self.text.find(COMMAND_SEPARATOR)
+            while position != -1:
+                ends.append(position)
+                position = self.text.find(COMMAND_SEPARATOR, position + 1)
+            self._ends = ends
+        return self._ends
+
+
+class AliasSnapshot(Mapping[str, list[str]]):
+    """A copy of the aliases in order that shares their text with the store, e.g. for writing on a worker thread."""
+
+    def __init__(self, texts: dict[str, str], groups: dict[str, str] | None = None):
+        """
+        Args:
+            texts (dict[str, str]): The commands of each alias, one per line, in order.
+            groups (dict[str, str] | None): The group of each alias in a named group.
+        """
+        self._texts = texts
+        self.groups = {} if groups is None else groups
+
+    def __getitem__(self, name: str) -> list[str]:
+        return self._texts[name].split(COMMAND_SEPARATOR)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._texts)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def texts(self) -> Mapping[str, str]:
+        """Get the commands of each alias, one per line, in order, without splitting them."""
+        return self._texts
+
+
+class AliasStore(Mapping[str, list[str]]):
+    """The aliases in list order, one compact copy of each shared by every part of the app.
+
+    Names are interned, and looked up and renamed in constant time. Each record knows its row, so the list never has to
+    search for an alias. Aliases loaded from an index are decoded the first time they are read.
+
+    Every alias is in a group, by default the core group. The aliases of each group are kept together, in the order of
+    the groups, so the rows of a group are found from the group sizes alone.
+
+    Reading an alias returns a new list of its commands, so the store can only be changed through its methods.
+    """
+
+    def __init__(self, aliases: Mapping[str, list[str]] | None = None):
+        """
+        Args:
+            aliases (Mapping[str, list[str]] | None): The aliases to start with, in order.
+        """
+        self._records: dict[str, AliasRecord] = {}
+        self._order: list[AliasRecord] = []
+        self._index: AliasIndex | None = None
+        self.groups = [CORE_GROUP]
+        """The groups in order, starting with the core group."""
+        self._sizes = {CORE_GROUP: 0}
+        self.layout_version = 0
+        """Changed whenever aliases are added, removed or moved, so views can tell when what they cached is stale."""
+        if aliases is not None:
+            for name, commands in aliases.items():
+                self.insert(len(self._order), name, commands)
+
+    def reset(self, index: AliasIndex, groups: Mapping[str, str] | None = None):
+        """Replace the aliases with the ones in an index, in file order within each group. Their commands are decoded
+        when first read.
+
+        Args:
+            index (AliasIndex): An index of the alias file.
+            groups (Mapping[str, str] | None): The group of each alias in a named group, the others are in the core
+                group.
+        """
+        self._index = index
+        self.layout_version += 1
+        self._order = [AliasRecord(sys.intern(name), row) for row, name in enumerate(index.entries)]
+        self._records = {record.name: record for record in self._order}
+        if groups:
+            self._assign_groups(groups)
+            self._sort_by_group()
+        else:
+            self._sizes = dict.fromkeys(self.groups, 0)
+            self._sizes[CORE_GROUP] = len(self._order)
+
+    def set_groups(self, groups: list[str]):
+        """Change the named groups, e.g. to add one or change their order.
+
+        Args:
+            groups (list[str]): The named groups in order, after the core group. The aliases of groups left out are
+                moved to the core group.
+        """
+        self.groups = [CORE_GROUP, *(group for group in groups if group != CORE_GROUP)]
+        self.layout_version += 1
+        self._sort_by_group()
+
+    def set_index(self, index: AliasIndex):
+        """Switch to a new index of the alias file, e.g. after the file was changed by another program. Aliases that
+        have not been decoded yet will be decoded from the new index."""
+        self._index = index
+
+    def load(self, names: Iterable[str]):
+        """Decode many aliases at once, which is faster than reading them one by one."""
+        unloaded = [name for name in names if name in self._records and self._records[name].text is None]
+        if not unloaded:
+            return
+        assert self._index is not None
+        try:
+            bodies = self._index.read_bodies(unloaded)
+        except StaleIndexError as error:
+            # Changed by another program before the watcher noticed. It reports the changes once it does.
+            logging.warning(f"{error}, indexing the alias files again.")
+            self._index = self._index.rebuild()
+            bodies = self._index.read_bodies(name for name in unloaded if name in self._index)
+        for name in unloaded:
+            # An alias that was removed from the file is kept empty until the removal is merged.
+            self._records[name].set_text(join_commands(decode_commands(bodies.get(name, ""))))
+
+    def text(self, name: str) -> str:
+        """Get the commands of an alias, one per line. The string is shared, not copied."""
+        record = self._records[name]
+        if record.text is None:
+            self.load([name])
+        assert record.text is not None
+        return record.text
+
+    def record_at(self, row: int) -> AliasRecord:
+        """Get the record of the alias at a row. It follows the alias through renames and moves."""
+        return self._order[row]
+
+    def __getitem__(self, name: str) -> list[str]:
+        return self.text(name).split(COMMAND_SEPARATOR)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        return (record.name for record in self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def row(self, name: str) -> int:
+        """Get the row of an alias, in constant time."""
+        return self._records[name].row
+
+    def name(self, row: int) -> str:
+        return self._order[row].name
+
+    def names(self) -> list[str]:
+        """Get a copy of the alias names in order."""
+        return [record.name for record in self._order]
+
+    def group(self, name: str) -> str:
+        return self._records[name].group
+
+    def group_size(self, group: str) -> int:
+        return self._sizes[group]
+
+    def group_range(self, group: str) -> tuple[int, int]:
+        """Get the rows of a group, from its first row up to the row after its last.
+
+        Raises:
+            KeyError: If there is no such group.
+        """
+        start = 0
+        for other in self.groups:
+            if other == group:
+                return start, start + self._sizes[group]
+            start += self._sizes[other]
+        raise KeyError(group)
+
+    def set_commands(self, name: str, commands: list[str]):
+        """Replace the commands of an alias."""
+        self._records[name].set_text(join_commands(commands))
+
+    def insert(self, row: int, name: str, commands: list[str], group: str = CORE_GROUP):
+        """Insert a new alias before a row, which must be in its group or just after it."""
+        assert name not in self._records
+        self.layout_version += 1
+        record = AliasRecord(sys.intern(name), row, join_commands(commands), group)
+        self._order.insert(row, record)
+        self._records[record.name] = record
+        self._sizes[group] += 1
+        self._reindex(row + 1, len(self._order))
+
+    def remove(self, name: str):
+        record = self._records.pop(name)
+        self.layout_version += 1
+        del self._order[record.row]
+        self._sizes[record.group] -= 1
+        self._reindex(record.row, len(self._order))
+
+    def rename(self, old_name: str, new_name: str):
+        """Rename an alias, keeping its position and commands."""
+        assert new_name not in self._records
+        record = self._records.pop(old_name)
+        record.name = sys.intern(new_name)
+        self._records[record.name] = record
+
+    def move_rows(self, row: int, count: int, insert_at: int, group: str | None = None):
+        """Move consecutive aliases.
+
+        Args:
+            row (int): The first row to move.
+            count (int): The number of rows to move.
+            insert_at (int): The row the first moved alias ends up at.
+            group (str | None): The group to move the aliases to, which they must end up in or just after. Defaults to
+                the group they are in, which they must all be.
+        """
+        self.layout_version += 1
+        moved = self._order[row : row + count]
+        del self._order[row : row + count]
+        self._order[insert_at:insert_at] = moved
+        if group is not None:
+            for record in moved:
+                self._sizes[record.group] -= 1
+                self._sizes[group] += 1
+                record.group = group
+        self._reindex(min(row, insert_at), max(row, insert_at) + count)
+
+    def set_order(
+        self, names: list[str], added: Mapping[str, list[str]] | None = None, groups: Mapping[str, str] | None = None
+    ):
+        """Replace the order of the aliases in one go, e.g. after a bulk change. Aliases left out are removed.
+
+        If the aliases of a group are no longer together, e.g. because an undone change no longer fits the groups, they
+        are moved back together in the order of the groups.
+
+        Args:
+            names (list[str]): All the alias names in their new order.
+            added (Mapping[str, list[str]] | None): The commands of the names that are not in the store yet.
+            groups (Mapping[str, str] | None): The group of each alias that is added or changes group.
+        """
+        records = self._records
+        for record in self._order:
+            # Marks the records of removed aliases.
+            record.row = -1
+        order = []
+        for row, name in enumerate(names):
+            record = records.get(name)
+            if record is None:
+                assert added is not None and name in added
+                record = AliasRecord(sys.intern(name), row, join_commands(added[name]))
+            else:
+                record.row = row
+            order.append(record)
+        self._order = order
+        self._records = {record.name: record for record in order}
+        self.layout_version += 1
+        if groups:
+            self._assign_groups(groups)
+        self._sort_by_group()
+
+    def snapshot(self) -> AliasSnapshot:
+        """Get a copy of the aliases in order, decoding any that have not been read yet."""
+        self.load(record.name for record in self._order if record.text is None)
+        texts = {record.name: record.text for record in self._order if record.text is not None}
+        groups = {record.name: record.group for record in self._order if record.group != CORE_GROUP}
+        return AliasSnapshot(texts, groups)
+
+    def _assign_groups(self, groups: Mapping[str, str]):
+        # Aliases of groups that don't exist (any more) are put in the core group.
+        known = set(self.groups)
+        for name, group in groups.items():
+            record = self._records.get(name)
+            if record is not None:
+                record.group = sys.intern(group) if group in known else CORE_GROUP
+
+    def _sort_by_group(self):
+        """Count the aliases in each group and move the aliases of each group together, if they are not already."""
+        positions = {group: position for position, group in enumerate(self.groups)}
+        sizes = dict.fromkeys(self.groups, 0)
+        in_order = True
+        previous = 0
+        for record in self._order:
+            position = positions.get(record.group)
+            if position is None:
+                record.group = CORE_GROUP
+                position = 0
+            sizes[record.group] += 1
+            in_order = in_order and position >= previous
+            previous = position
+        self._sizes = sizes
+        if not in_order:
+            # Stable, so each group keeps its order.
+            self._order.sort(key=lambda record: positions[record.group])
+            self._reindex(0, len(self._order))
+
+    def _reindex(self, start: int, end: int):
+        order = self._order
+        for row in range(start, end):
+            order[row].row = row
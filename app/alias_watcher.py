@@ -0,0 +1,198 @@
+import os
+from collections.abc import Callable
+from typing import NamedTuple
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from app.alias_index import AliasIndex, decode_commands, encode_commands
+from app.alias_store import COMMAND_SEPARATOR, AliasSnapshot
+
+DEBOUNCE_MS = 200
+POLL_INTERVAL_MS = 2000
+"""File system notifications can be missed (e.g. on network drives), so the files are also polled."""
+
+
+class ExternalChanges(NamedTuple):
+    """The aliases changed in the alias file by another program."""
+
+    index: AliasIndex
+    """A fresh index of the alias files."""
+    added: dict[str, list[str]]
+    changed: dict[str, list[str]]
+    removed: list[str]
+
+
+class AliasWatcher(QObject):
+    """Watches the alias file, its macro file and the group macro files for changes made by other programs.
+
+    Changes are detected with file system notifications, backed up by polling the modification time and size. Only
+    the files whose modification time or size changed are indexed again, and only the aliases defined in them are read
+    and compared with a hash of the commands last seen.
+    """
+
+    changed_externally = pyqtSignal(object)
+    reindexed = pyqtSignal(object)
+    """Emitted with a fresh `AliasIndex` whenever a file changed, before `changed_externally`. Lines may have moved even
+    if no alias changed, so the old index can no longer be read from."""
+
+    def __init__(
+        self,
+        alias_cmd_path: str,
+        extra_paths: list[str],
+        is_busy: Callable[[], bool],
+        expand: Callable[[str], str] = os.path.expandvars,
+        macrofiles: Callable[[], list[str]] = list,
+        parent=None,
+    ):
+        """
+        Args:
+            alias_cmd_path (str): The alias file loaded by cmd.exe.
+            extra_paths (list[str]): Other files to watch, such as the macro file.
+            is_busy (Callable[[], bool]): Whether this app is writing the files, in which case checks are postponed.
+            expand (Callable[[str], str]): Expands the `%VARIABLES%` in the path of the macro file.
+            macrofiles (Callable[[], list[str]]): Gets the group macro files, which are read along with the alias file
+                even if it doesn't load them.
+        """
+        super().__init__(parent)
+        self.alias_cmd_path = alias_cmd_path
+        self.expand = expand
+        self.is_busy = is_busy
+        self.macrofiles = macrofiles
+        self._paths = [alias_cmd_path, *extra_paths]
+        self._stamps: dict[str, tuple[int, int] | None] = {}
+        self._index: AliasIndex | None = None
+        # The files this app wrote since they were last indexed, so the offsets of the index are out of date.
+        self._unindexed: set[str] = set()
+        # Every known alias is in exactly one of these: the commands this app wrote, shared with the store, or the hash
+        # of the undecoded commands read from the files.
+        self._texts: dict[str, str] = {}
+        self._digests: dict[str, int] = {}
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(lambda _path: self._debounce_timer.start())
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(DEBOUNCE_MS)
+        self._debounce_timer.timeout.connect(self.check)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self.check)
+
+    def start(self, index: AliasIndex | None = None):
+        """Take the current contents of the files as known and start watching them.
+
+        Args:
+            index (AliasIndex | None): A fresh index of the files, if the caller already has one.
+        """
+        self.acknowledge(index)
+        self._poll_timer.start()
+
+    def stop(self):
+        """Stop watching the files."""
+        self._poll_timer.stop()
+        self._debounce_timer.stop()
+        if self._watcher.files():
+            self._watcher.removePaths(self._watcher.files())
+
+    def acknowledge(self, index: AliasIndex | None = None):
+        """Take the current contents of the files as known, e.g. after they were replaced by a backup. Every alias is
+        read once.
+
+        Args:
+            index (AliasIndex | None): A fresh index of the files, if the caller already has one.
+        """
+        if index is None:
+            index = AliasIndex(self.alias_cmd_path, self.expand, self.macrofiles())
+        self._texts = {}
+        self._digests = {name: hash(body) for name, body in index.read_bodies(index.entries).items()}
+        self._index = index
+        self._unindexed.clear()
+        self._watch(index)
+
+    def acknowledge_written(self, aliases: AliasSnapshot):
+        """Take the aliases this app just wrote as the contents of the files, without reading them back.
+
+        Args:
+            aliases (AliasSnapshot): The aliases that were written.
+        """
+        self._texts = dict(aliases.texts())
+        self._digests = {}
+        for path in self.macrofiles():
+            if path not in self._paths:
+                self._paths.append(path)
+        stamps = self._stat_all()
+        self._unindexed.update(path for path, stamp in stamps.items() if stamp != self._stamps.get(path))
+        self._stamps = stamps
+        self._rewatch()
+
+    def check(self):
+        """Check the files for changes, emitting `changed_externally` if any alias changed."""
+        if self._index is None:
+            # Not started yet.
+            return
+        stamps = self._stat_all()
+        if self._stamps == stamps:
+            return
+        if self.is_busy():
+            self._debounce_timer.start()
+            return
+        changed_paths = [path for path, stamp in stamps.items() if stamp != self._stamps.get(path)]
+        # Aliases can only have changed if they were or are defined in the files that changed.
+        names = dict.fromkeys(name for path in changed_paths for name in self._index.names_in(path))
+        index = AliasIndex(
+            self.alias_cmd_path,
+            self.expand,
+            self.macrofiles(),
+            previous=self._index,
+            changed=[*changed_paths, *self._unindexed],
+        )
+        self._index = index
+        self._unindexed.clear()
+        self._watch(index)
+        self.reindexed.emit(index)
+        names.update(dict.fromkeys(name for path in changed_paths for name in index.names_in(path)))
+        added, changed = {}, {}
+        for name, body in index.read_bodies(name for name in names if name in index).items():
+            text = self._texts.pop(name, None)
+            known = self._digests.get(name)
+            self._digests[name] = hash(body)
+            if text is not None:
+                # The line may not be in the form this app writes, e.g. if it was formatted by hand and not changed
+                # since, so the commands are compared.
+                commands = decode_commands(body)
+                if commands != decode_commands(encode_commands(text.split(COMMAND_SEPARATOR))):
+                    changed[name] = commands
+            elif known is None:
+                added[name] = decode_commands(body)
+            elif known != self._digests[name]:
+                changed[name] = decode_commands(body)
+        removed = [name for name in [*self._texts, *self._digests] if name not in index]
+        for name in removed:
+            self._texts.pop(name, None)
+            self._digests.pop(name, None)
+        if added or changed or removed:
+            self.changed_externally.emit(ExternalChanges(index, added, changed, removed))
+
+    def _watch(self, index: AliasIndex):
+        for path in {*(entry.path for entry in index.entries.values()), *self.macrofiles()}:
+            if path not in self._paths:
+                self._paths.append(path)
+        self._stamps = self._stat_all()
+        self._rewatch()
+
+    def _rewatch(self):
+        # Files replaced atomically are dropped from the watcher, so add them again.
+        watched = set(self._watcher.files())
+        missing = [path for path in self._paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _stat_all(self) -> dict[str, tuple[int, int] | None]:
+        stamps = {}
+        for path in self._paths:
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamps[path] = None
+        return stamps
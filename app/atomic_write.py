@@ -0,0 +1,64 @@
+import contextlib
+import os
+import stat
+import tempfile
+import time
+
+REPLACE_ATTEMPTS = 5
+REPLACE_RETRY_DELAY_S = 0.05
+
+
+def _read_umask() -> int:
+    # The umask can only be read by setting it, so it is read once, before any writes happen on other threads.
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+"""The permissions of a new file, as `open` would create it. Temporary files are created readable by the owner only."""
+
+
+def atomic_write(path: str, data: str | bytes):
+    """Write a file atomically. The data is written to a temporary file in the same directory which then replaces the
+    original, so readers see either the old or the new file and never a partially written one.
+
+    The file keeps the permissions it had, or gets the default permissions if it is new.
+
+    Args:
+        path (str): The path of the file to write.
+        data (str | bytes): The contents of the file. Strings are written as UTF-8 with line endings left untouched.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data.encode("utf-8") if isinstance(data, str) else data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, _mode(path))
+        _replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def _mode(path: str) -> int:
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+
+def _replace(source: str, destination: str):
+    # On Windows the replace fails while another process (e.g. a starting cmd.exe) has the destination open.
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(source, destination)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY_S)
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QDialog,
+    QDialogButtonBox,
+    QHeaderView,
+    QLabel,
+    QPlainTextEdit,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from app.backup_store import BackupStore, Snapshot
+
+MAX_LISTED_CHANGES = 50
+
+
+class BackupDialog(QDialog):
+    """Lists the backups and shows what restoring the selected one would change."""
+
+    def __init__(self, backups: BackupStore, has_unsaved_changes: bool, parent=None):
+        """
+        Args:
+            backups (BackupStore): The backups to choose from.
+            has_unsaved_changes (bool): Whether restoring would discard unsaved edits, which the user is warned about.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Restore Backup")
+        self.setWindowFlag(Qt.WindowType.WindowContextHelpButtonHint, False)
+        self.resize(640, 480)
+        self.backups = backups
+        self.selected_snapshot: Snapshot | None = None
+        self._snapshots = list(reversed(backups.snapshots()))
+
+        self.table = QTableWidget(len(self._snapshots), 3)
+        self.table.setHorizontalHeaderLabels(["Created", "Aliases", "Label"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        for row, snapshot in enumerate(self._snapshots):
+            created = datetime.fromtimestamp(snapshot.time).strftime("%Y-%m-%d %H:%M:%S")
+            self.table.setItem(row, 0, QTableWidgetItem(created))
+            self.table.setItem(row, 1, QTableWidgetItem(str(snapshot.alias_count)))
+            self.table.setItem(row, 2, QTableWidgetItem(snapshot.label))
+        self.table.resizeColumnsToContents()
+        self.table.itemSelectionChanged.connect(self._on_selection_changed)
+
+        self.changes = QPlainTextEdit()
+        self.changes.setReadOnly(True)
+        self.changes.setFont(QFont("Consolas"))
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Cancel)
+        self.restore_button = self.buttons.addButton("Restore", QDialogButtonBox.ButtonRole.AcceptRole)
+        self.restore_button.setEnabled(False)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        if not self._snapshots:
+            layout.addWidget(QLabel("There are no backups yet. Use File -> Create Backup to create one."))
+        layout.addWidget(self.table)
+        layout.addWidget(QLabel("Restoring the selected backup will:"))
+        layout.addWidget(self.changes)
+        if has_unsaved_changes:
+            layout.addWidget(QLabel("Your unsaved changes will be discarded."))
+        layout.addWidget(QLabel("The current aliases are backed up before restoring, so the restore can be undone."))
+        layout.addWidget(self.buttons)
+        self.setLayout(layout)
+
+        if self._snapshots:
+            self.table.selectRow(0)
+
+    def _on_selection_changed(self):
+        rows = self.table.selectionModel().selectedRows()
+        self.selected_snapshot = self._snapshots[rows[0].row()] if rows else None
+        self.restore_button.setEnabled(self.selected_snapshot is not None)
+        if self.selected_snapshot is None:
+            self.changes.clear()
+            return
+        diff = self.backups.diff(None, self.selected_snapshot)
+        if diff.is_empty():
+            self.changes.setPlainText("Change nothing, the backup matches the current aliases.")
+            return
+        lines = []
+        for heading, names in (("Add", diff.added), ("Remove", diff.removed), ("Change", diff.changed)):
+            if names:
+                lines.append(f"{heading} {len(names)} alias(es):")
+                lines.extend(f"    {name}" for name in names[:MAX_LISTED_CHANGES])
+                if len(names) > MAX_LISTED_CHANGES:
+                    lines.append(f"    ... and {len(names) - MAX_LISTED_CHANGES} more")
+        self.changes.setPlainText("\n".join(lines))
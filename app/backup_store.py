@@ -0,0 +1,315 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from app.alias_groups import GROUP_EXTENSION, GROUP_MANIFEST_NAME, is_load_macro, parse_groups
+from app.alias_index import decode_commands, is_definition, parse_definition, parse_loader
+from app.atomic_write import atomic_write
+
+MANIFEST_VERSION = 1
+DEFAULT_KEEP_LAST = 20
+DEFAULT_KEEP_DAYS = 30
+MAX_CACHED_DECODES = 8
+GROUPS_PREFIX = "groups/"
+"""Prefixes the names of the files backed up from the groups directory."""
+CORRUPT_MANIFEST_SUFFIX = ".corrupt"
+
+
+class Snapshot(NamedTuple):
+    """A backup of the alias files at a point in time."""
+
+    id: str
+    time: float
+    """When the backup was taken, in seconds since the epoch."""
+    label: str
+    alias_count: int
+    files: dict[str, str]
+    """The name of each backed up file to the hash of its contents."""
+
+    def describe(self) -> str:
+        """Get a one line description of the backup."""
+        timestamp = datetime.fromtimestamp(self.time).strftime("%Y-%m-%d %H:%M:%S")
+        label = f" - {self.label}" if self.label else ""
+        return f"{self.id}  {timestamp}  {self.alias_count} aliases{label}"
+
+
+class RetentionPolicy(NamedTuple):
+    """Which backups to keep when old ones are pruned."""
+
+    keep_last: int = DEFAULT_KEEP_LAST
+    """The number of most recent backups that are always kept."""
+    keep_days: int = DEFAULT_KEEP_DAYS
+    """The number of days for which the last backup of each day is kept."""
+
+
+class BackupDiff(NamedTuple):
+    """The aliases that differ between two backups."""
+
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+class BackupStore:
+    """A content-addressed store of backups of the alias files.
+
+    The contents of each file are compressed and stored once under their hash, so backups of unchanged files take no
+    extra space. A small manifest lists the backups and the hash of each file in them.
+    """
+
+    def __init__(self, directory: str, paths: list[str], groups_directory: str | None = None):
+        """
+        Args:
+            directory (str): The directory to store the backups in.
+            paths (list[str]): The files to back up. Files are identified by name, so the names must be unique.
+            groups_directory (str | None): A directory of alias group macro files and their manifest, which are all
+                backed up too. Their aliases count as backed up even if the first file does not load them.
+        """
+        self.directory = directory
+        self.paths = {os.path.basename(path): path for path in paths}
+        self.groups_directory = groups_directory
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._decoded: dict[tuple[str, ...], dict[str, list[str]]] = {}
+
+    def snapshots(self) -> list[Snapshot]:
+        """Get the backups, oldest first.
+
+        A corrupt manifest is moved aside, so it can be repaired by hand, and the backups start afresh. The backed up
+        files are kept.
+        """
+        if not os.path.exists(self._manifest_path):
+            return []
+        try:
+            with open(self._manifest_path, encoding="utf-8") as file:
+                manifest = json.load(file)
+            return [
+                Snapshot(entry["id"], entry["time"], entry.get("label", ""), entry.get("aliases", 0), entry["files"])
+                for entry in manifest.get("snapshots", [])
+            ]
+        except (ValueError, TypeError, KeyError, AttributeError) as error:
+            corrupt_path = f"{self._manifest_path}.{datetime.now():%Y%m%d%H%M%S}{CORRUPT_MANIFEST_SUFFIX}"
+            logging.warning(f"Backup manifest is corrupt, moved it to {corrupt_path}: {error}")
+            os.replace(self._manifest_path, corrupt_path)
+            return []
+
+    def get(self, snapshot_id: str) -> Snapshot:
+        """Get a backup by its ID, or a unique prefix of it."""
+        matches = [snapshot for snapshot in self.snapshots() if snapshot.id.startswith(snapshot_id)]
+        if len(matches) != 1:
+            raise KeyError(f"{'no' if not matches else 'more than one'} backup matches '{snapshot_id}'")
+        return matches[0]
+
+    def create(self, label: str = "", retention: RetentionPolicy | None = None) -> tuple[Snapshot, bool]:
+        """Back up the files, unless they are unchanged since the last backup.
+
+        Args:
+            label (str): A description of the backup.
+            retention (RetentionPolicy | None): Prune old backups with this policy. Defaults to the default policy.
+
+        Returns:
+            tuple[Snapshot, bool]: The backup, and whether it was created (False if the last backup was reused).
+        """
+        contents = self._read_current()
+        files = {name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}
+        snapshots = self.snapshots()
+        if snapshots and snapshots[-1].files == files:
+            logging.info(f"Alias files unchanged since backup {snapshots[-1].id}, not backing up again.")
+            return snapshots[-1], False
+
+        for name, data in contents.items():
+            object_path = self._object_path(files[name])
+            if not os.path.exists(object_path):
+                atomic_write(object_path, zlib.compress(data))
+        now = time.time()
+        digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+        snapshot_id = f"{datetime.fromtimestamp(now).strftime('%Y%m%d%H%M%S')}-{digest[:6]}"
+        snapshot = Snapshot(snapshot_id, now, label, len(self._decode(files, contents)), files)
+        snapshots.append(snapshot)
+        self._prune(snapshots, retention or RetentionPolicy(), snapshot)
+        logging.info(f"Created backup {snapshot.id}.")
+        return snapshot, True
+
+    def read(self, snapshot: Snapshot) -> dict[str, bytes]:
+        """Get the contents of each file in a backup."""
+        contents = {}
+        for name, file_hash in snapshot.files.items():
+            with open(self._object_path(file_hash), "rb") as file:
+                contents[name] = zlib.decompress(file.read())
+        return contents
+
+    def aliases(self, snapshot: Snapshot | None) -> dict[str, list[str]]:
+        """Decode the aliases in a backup.
+
+        Args:
+            snapshot (Snapshot | None): The backup, or None for the current files.
+
+        Returns:
+            dict[str, list[str]]: A dictionary of aliases and their commands.
+        """
+        if snapshot is None:
+            contents = self._read_current()
+            return self._decode({name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}, contents)
+        return self._decode(snapshot.files)
+
+    def diff(self, old: Snapshot | None, new: Snapshot | None) -> BackupDiff:
+        """Compare the aliases in two backups.
+
+        Args:
+            old (Snapshot | None): The older backup, or None for the current files.
+            new (Snapshot | None): The newer backup, or None for the current files.
+
+        Returns:
+            BackupDiff: The aliases added, removed and changed going from `old` to `new`.
+        """
+        if old is not None and new is not None and old.files == new.files:
+            return BackupDiff([], [], [])
+        old_aliases = self.aliases(old)
+        new_aliases = self.aliases(new)
+        added = [name for name in new_aliases if name not in old_aliases]
+        removed = [name for name in old_aliases if name not in new_aliases]
+        changed = [name for name, commands in new_aliases.items() if old_aliases.get(name, commands) != commands]
+        return BackupDiff(added, removed, changed)
+
+    def restore(self, snapshot: Snapshot, retention: RetentionPolicy | None = None) -> Snapshot:
+        """Restore the files in a backup. The current files are backed up first, so the restore can be undone.
+
+        Each file is replaced atomically. Files that were not in the backup are left as they are. The macro files are
+        restored before the files that load them, so if a file can't be written, no file loads a macro file from another
+        backup.
+
+        Args:
+            snapshot (Snapshot): The backup to restore.
+            retention (RetentionPolicy | None): The policy used to prune old backups.
+
+        Returns:
+            Snapshot: The backup of the files from before the restore.
+
+        Raises:
+            OSError: If a file could not be written. The message lists the files that were restored.
+        """
+        contents = self.read(snapshot)
+        previous, _ = self.create(f"before restoring {snapshot.id}", retention)
+        restored = []
+        for name in sorted(contents, key=self._restore_order):
+            try:
+                atomic_write(self._path(name), contents[name])
+            except OSError as error:
+                raise OSError(
+                    f"{error}\nRestored {', '.join(restored) or 'no files'} before the error. Restore backup "
+                    f"{previous.id} to undo it."
+                ) from error
+            restored.append(name)
+        logging.info(f"Restored backup {snapshot.id}: {', '.join(restored)}.")
+        return previous
+
+    def _restore_order(self, name: str) -> int:
+        # The groups, their manifest, the macro file and finally the file cmd.exe runs, which loads the others.
+        if name.startswith(GROUPS_PREFIX):
+            return 1 if name == GROUPS_PREFIX + GROUP_MANIFEST_NAME else 0
+        return 3 if name == next(iter(self.paths)) else 2
+
+    def _path(self, name: str) -> str:
+        if name.startswith(GROUPS_PREFIX) and self.groups_directory is not None:
+            return os.path.join(self.groups_directory, name.removeprefix(GROUPS_PREFIX))
+        return self.paths[name]
+
+    def _read_current(self) -> dict[str, bytes]:
+        paths = dict(self.paths)
+        if self.groups_directory is not None and os.path.isdir(self.groups_directory):
+            for file_name in sorted(os.listdir(self.groups_directory)):
+                if file_name.endswith(GROUP_EXTENSION) or file_name == GROUP_MANIFEST_NAME:
+                    paths[GROUPS_PREFIX + file_name] = os.path.join(self.groups_directory, file_name)
+        contents = {}
+        for name, path in paths.items():
+            with contextlib.suppress(FileNotFoundError), open(path, "rb") as file:
+                contents[name] = file.read()
+        return contents
+
+    def _decode(self, files: dict[str, str], contents: dict[str, bytes] | None = None) -> dict[str, list[str]]:
+        key = tuple(sorted(files.items()))
+        aliases = self._decoded.get(key)
+        if aliases is not None:
+            return aliases
+        if contents is None:
+            contents = self.read(Snapshot("", 0, "", 0, files))
+        # The first file is the one loaded by cmd.exe, the others are only used if it loads them.
+        names = list(self.paths)
+        aliases = {}
+        self._decode_file(contents, names[0], False, aliases)
+        manifest = contents.get(GROUPS_PREFIX + GROUP_MANIFEST_NAME)
+        if manifest is not None:
+            # Every group is in the manifest, whether or not the first file loads it at startup.
+            with contextlib.suppress(ValueError, TypeError, KeyError, AttributeError):
+                for group in parse_groups(manifest.decode("utf-8", errors="replace")):
+                    self._decode_file(contents, f"{GROUPS_PREFIX}{group.name}{GROUP_EXTENSION}", True, aliases)
+        if len(self._decoded) >= MAX_CACHED_DECODES:
+            self._decoded.pop(next(iter(self._decoded)))
+        self._decoded[key] = aliases
+        return aliases
+
+    def _decode_file(self, contents: dict[str, bytes], name: str, macrofile: bool, aliases: dict[str, list[str]]):
+        if name not in contents:
+            return
+        for line in contents[name].decode("utf-8", errors="replace").splitlines():
+            if is_definition(line, macrofile):
+                definition = parse_definition(line, macrofile)
+                if definition is not None and (macrofile or not is_load_macro(*definition)):
+                    aliases[definition[0]] = decode_commands(definition[1])
+            elif not macrofile and (macrofile_path := parse_loader(line)) is not None:
+                # Loader paths contain environment variables, so match the backed up macro file by name.
+                macrofile_name = macrofile_path.replace("\\", "/").rsplit("/", 1)[-1]
+                self._decode_file(contents, macrofile_name, True, aliases)
+
+    def _prune(self, snapshots: list[Snapshot], retention: RetentionPolicy, created: Snapshot):
+        newest_first = sorted(snapshots, key=lambda snapshot: snapshot.time, reverse=True)
+        # The backup just created is always kept, even if the clock went back.
+        keep = {created.id, *(snapshot.id for snapshot in newest_first[: retention.keep_last])}
+        cutoff = datetime.now().date() - timedelta(days=retention.keep_days)
+        seen_days = set()
+        for snapshot in newest_first:
+            day = datetime.fromtimestamp(snapshot.time).date()
+            if day > cutoff and day not in seen_days:
+                seen_days.add(day)
+                keep.add(snapshot.id)
+        kept = [snapshot for snapshot in snapshots if snapshot.id in keep]
+        self._write_manifest(kept)
+        if len(kept) < len(snapshots):
+            logging.info(f"Pruned {len(snapshots) - len(kept)} old backup(s).")
+            self._collect_garbage(kept)
+
+    def _collect_garbage(self, snapshots: list[Snapshot]):
+        if any(name.endswith(CORRUPT_MANIFEST_SUFFIX) for name in os.listdir(self.directory)):
+            # The files of the backups in a corrupt manifest that was moved aside are kept until it is removed.
+            return
+        referenced = {file_hash for snapshot in snapshots for file_hash in snapshot.files.values()}
+        objects_directory = os.path.join(self.directory, "objects")
+        for name in os.listdir(objects_directory):
+            if name.removesuffix(".z") not in referenced:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(objects_directory, name))
+
+    def _write_manifest(self, snapshots: list[Snapshot]):
+        entries = [
+            {
+                "id": snapshot.id,
+                "time": snapshot.time,
+                "label": snapshot.label,
+                "aliases": snapshot.alias_count,
+                "files": snapshot.files,
+            }
+            for snapshot in snapshots
+        ]
+        manifest = {"version": MANIFEST_VERSION, "snapshots": entries}
+        atomic_write(self._manifest_path, json.dumps(manifest, separators=(",", ":")))
+
+    def _object_path(self, file_hash: str) -> str:
+        return os.path.join(self.directory, "objects", f"{file_hash}.z")
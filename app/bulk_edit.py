@@ -0,0 +1,104 @@
+import re
+from collections.abc import Callable, Mapping
+
+from app.alias_index import is_valid_command, is_valid_name
+from app.edit_journal import DELETE, EDIT, MOVE, RENAME, Operation
+
+
+def compile_pattern(find: str, regex: bool) -> re.Pattern:
+    """Compile the text to find. Plain text is matched literally.
+
+    Raises:
+        re.error: If the regular expression is invalid.
+    """
+    return re.compile(find if regex else re.escape(find))
+
+
+def _substitute(pattern: re.Pattern, replacement: str, regex: bool, text: str) -> str:
+    # Plain replacements are inserted literally, regular expression ones can refer to groups, e.g. \1.
+    return pattern.sub(replacement if regex else lambda _match: replacement, text)
+
+
+def delete_operations(
+    order: list[str], names: list[str], aliases: Mapping[str, list[str]], group_of: Callable[[str], str]
+) -> list[Operation]:
+    """Get the operations that delete aliases. They are ordered from the bottom of the list up, so undoing them
+    re-inserts each alias at its original row, in its group."""
+    selected = set(names)
+    rows = [(row, name) for row, name in enumerate(order) if name in selected]
+    return [
+        Operation(DELETE, name, position=row, commands=aliases[name], group=group_of(name))
+        for row, name in reversed(rows)
+    ]
+
+
+def move_operations(
+    order: list[str], names: list[str], position: int, group: str, group_of: Callable[[str], str]
+) -> list[Operation]:
+    """Get the operations that move aliases together to a position in a group, keeping their order.
+
+    Args:
+        order (list[str]): All the alias names in order.
+        names (list[str]): The aliases to move.
+        position (int): The row of the first moved alias, among the aliases that are not moved. Clamped to the list.
+            It must be in the group, or just after it.
+        group (str): The group to move the aliases to.
+        group_of (Callable[[str], str]): Gets the group an alias is in now.
+    """
+    selected = set(names)
+    rows = {name: row for row, name in enumerate(order) if name in selected}
+    moved = [name for name in order if name in selected]
+    start = max(0, min(position, len(order) - len(moved)))
+    operations = [
+        Operation(MOVE, name, position=start + offset, previous=rows[name], group=group, previous_group=group_of(name))
+        for offset, name in enumerate(moved)
+    ]
+    if all((op.position, op.group) == (op.previous, op.previous_group) for op in operations):
+        return []
+    return operations
+
+
+def replace_operations(
+    aliases: Mapping[str, list[str]], names: list[str], find: str, replacement: str, regex: bool
+) -> list[Operation]:
+    """Get the operations that find and replace text in the commands of aliases.
+
+    Raises:
+        re.error: If the regular expression or the replacement is invalid.
+        ValueError: If a new command would contain a line break.
+    """
+    pattern = compile_pattern(find, regex)
+    operations = []
+    for name in names:
+        commands = aliases[name]
+        new_commands = [_substitute(pattern, replacement, regex, command) for command in commands]
+        if not all(is_valid_command(command) for command in new_commands):
+            raise ValueError(f"A command of '{name}' would contain a line break, put each command on its own line")
+        if new_commands != commands:
+            operations.append(Operation(EDIT, name, commands=new_commands, previous=commands))
+    return operations
+
+
+def rename_operations(
+    existing: Mapping[str, object], names: list[str], find: str, replacement: str, regex: bool
+) -> list[Operation]:
+    """Get the operations that rename aliases by replacing part of their names.
+
+    Raises:
+        re.error: If the regular expression or the replacement is invalid.
+        ValueError: If a new name is invalid or already taken.
+    """
+    pattern = compile_pattern(find, regex)
+    operations = []
+    new_names = set()
+    for name in names:
+        new_name = _substitute(pattern, replacement, regex, name)
+        if new_name == name:
+            continue
+        if not is_valid_name(new_name):
+            raise ValueError(f"'{name}' would be renamed to '{new_name}', which is not a valid alias name")
+        if new_name in existing or new_name in new_names:
+            raise ValueError(f"'{name}' would be renamed to '{new_name}', which already exists")
+        new_names.add(new_name)
+        operations.append(Operation(RENAME, name, new_name=new_name))
+    return operations
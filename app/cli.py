@@ -0,0 +1,390 @@
+import argparse
+import collections
+import itertools
+import json
+import sys
+from collections.abc import Callable
+from typing import Any, NamedTuple, TextIO
+
+from app.alias_exchange import (
+    CONFLICT_OVERWRITE,
+    CONFLICT_POLICIES,
+    CONFLICT_SKIP,
+    export_aliases,
+    iter_index,
+    plan_import,
+    read_aliases,
+)
+from app.alias_file import FILE_FORMATS, AliasFile
+from app.alias_formats import FORMAT_JSON, FORMATS, AliasFormat, format_for_path
+from app.alias_index import decode_commands, is_valid_command, is_valid_name
+from app.backup_store import RetentionPolicy, Snapshot
+from app.platform_backend import default_backend
+from app.settings import DEFAULT_FILE_FORMAT, Settings
+from app.timings import TIMINGS
+
+
+# This module must never import PyQt5 (directly or through other modules) so the command line interface starts quickly.
+
+
+class CliError(Exception):
+    """An error caused by the command line arguments or the state of the aliases."""
+
+
+class CommandResult(NamedTuple):
+    """The outcome of a command."""
+
+    data: Any
+    """Machine-readable output, printed as JSON with --json."""
+    lines: list[str]
+    """Human-readable output."""
+
+
+class Session:
+    """The aliases being worked on by a command. The alias file is only decoded if a command needs every alias, and only
+    written (once) at the end if a command changed something."""
+
+    def __init__(self, alias_file: AliasFile, retention: RetentionPolicy | None = None):
+        self.alias_file = alias_file
+        self.retention = retention
+        self.changed = False
+        self._aliases: dict[str, list[str]] | None = None
+
+    @property
+    def aliases(self) -> dict[str, list[str]]:
+        if self._aliases is None:
+            self._aliases = self.alias_file.decode()
+        return self._aliases
+
+    def add(self, name: str, commands: list[str], replace: bool = False):
+        validate_name(name)
+        validate_commands(commands)
+        if name in self.aliases and not replace:
+            raise CliError(f"alias '{name}' already exists (use --replace to overwrite it)")
+        self.aliases[name] = commands
+        self.changed = True
+
+    def remove(self, name: str):
+        self._require(name)
+        del self.aliases[name]
+        self.changed = True
+
+    def rename(self, old_name: str, new_name: str):
+        self._require(old_name)
+        validate_name(new_name)
+        if new_name in self.aliases:
+            raise CliError(f"alias '{new_name}' already exists")
+        # Rebuild the dictionary so the renamed alias keeps its position.
+        self._aliases = {(new_name if name == old_name else name): cmds for name, cmds in self.aliases.items()}
+        self.changed = True
+
+    def move(self, name: str, position: int):
+        self._require(name)
+        names = [other for other in self.aliases if other != name]
+        if position < 0:
+            position += len(names) + 1
+        names.insert(max(0, min(position, len(names))), name)
+        self._aliases = {other: self.aliases[other] for other in names}
+        self.changed = True
+
+    def save(self):
+        if self.changed:
+            self.alias_file.encode(self.aliases)
+
+    def _require(self, name: str):
+        if name not in self.aliases:
+            raise CliError(f"alias '{name}' does not exist")
+
+
+def validate_name(name: str):
+    """Check that an alias name can be used as a DOSKEY macro name."""
+    if not is_valid_name(name):
+        raise CliError(f"invalid alias name '{name}': names cannot be empty or contain whitespace or '='")
+
+
+def validate_commands(commands: object):
+    """Check that the commands of an alias are a non-empty list of strings that each fit on one line."""
+    if not (isinstance(commands, list) and commands and all(isinstance(command, str) for command in commands)):
+        raise CliError(f"invalid commands {json.dumps(commands)}: expected a non-empty list of strings")
+    if not all(is_valid_command(command) for command in commands):
+        raise CliError(f"invalid commands {json.dumps(commands)}: commands cannot contain line breaks")
+
+
+def parse_definition(definition: str) -> tuple[str, list[str]]:
+    """Parse a `name=command $T command` definition given on the command line."""
+    name, separator, commands = definition.partition("=")
+    if not separator:
+        raise CliError(f"invalid definition '{definition}': expected NAME=COMMANDS")
+    return name, decode_commands(commands)
+
+
+def _list(session: Session, _args: argparse.Namespace) -> CommandResult:
+    names = session.alias_file.index().names()
+    return CommandResult(names, names)
+
+
+def _get(session: Session, args: argparse.Namespace) -> CommandResult:
+    index = session.alias_file.index()
+    data = {}
+    for name in args.names:
+        if name not in index:
+            raise CliError(f"alias '{name}' does not exist")
+        data[name] = index.get(name)
+    lines = [line for name in args.names for line in data[name]]
+    return CommandResult(data, lines)
+
+
+def _add(session: Session, args: argparse.Namespace) -> CommandResult:
+    added = []
+    for definition in args.definitions:
+        name, commands = parse_definition(definition)
+        session.add(name, commands, replace=args.replace)
+        added.append(name)
+    return CommandResult({"added": added}, [f"Added {name}" for name in added])
+
+
+def _rm(session: Session, args: argparse.Namespace) -> CommandResult:
+    for name in args.names:
+        session.remove(name)
+    return CommandResult({"removed": args.names}, [f"Removed {name}" for name in args.names])
+
+
+def _rename(session: Session, args: argparse.Namespace) -> CommandResult:
+    session.rename(args.old_name, args.new_name)
+    return CommandResult({"renamed": {args.old_name: args.new_name}}, [f"Renamed {args.old_name} to {args.new_name}"])
+
+
+def _mv(session: Session, args: argparse.Namespace) -> CommandResult:
+    session.move(args.name, args.position)
+    position = list(session.aliases).index(args.name)
+    return CommandResult({"moved": {args.name: position}}, [f"Moved {args.name} to position {position}"])
+
+
+def _import(session: Session, args: argparse.Namespace) -> CommandResult:
+    alias_format = _format(args.format, args.file)
+    with _open_input(args.file) as file:
+        imported, issues = read_aliases(file, args.file, alias_format)
+    policy = CONFLICT_OVERWRITE if args.replace else args.on_conflict
+    plan = plan_import(imported, session.aliases, policy, issues)
+    for name, commands in itertools.chain(plan.added.items(), plan.overwritten.items()):
+        session.aliases[name] = commands
+    session.changed = bool(plan.added or plan.overwritten)
+    report = plan.report
+    data = {**report._asdict(), "issues": [str(issue) for issue in report.issues]}
+    return CommandResult(data, report.describe())
+
+
+def _export(session: Session, args: argparse.Namespace) -> CommandResult:
+    alias_format = _format(args.format, args.file)
+    # Stream the aliases from the alias file rather than decoding them all at once.
+    aliases = iter_index(session.alias_file.index())
+    if args.file == "-":
+        alias_format.write(aliases, sys.stdout)
+        # Written as it is exported, so there is nothing left to print.
+        return CommandResult(None, [])
+    try:
+        count = export_aliases(aliases, args.file, alias_format)
+    except OSError as error:
+        raise CliError(str(error)) from error
+    return CommandResult({"exported": count, "file": args.file}, [f"Exported {count} alias(es) to {args.file}"])
+
+
+def _format(name: str | None, path: str) -> AliasFormat:
+    """Get the format given on the command line, or guess it from the file extension. stdin and stdout are JSON."""
+    if name is not None:
+        return FORMATS[name]
+    if path == "-":
+        return FORMATS[FORMAT_JSON]
+    alias_format = format_for_path(path)
+    if alias_format is None:
+        raise CliError(f"can't tell the format of {path} from its extension, choose one with --format")
+    return alias_format
+
+
+def _batch(session: Session, args: argparse.Namespace) -> CommandResult:
+    applied = 0
+    with _open_input(args.file) as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                operation = json.loads(line)
+                _apply(session, operation)
+            except (json.JSONDecodeError, KeyError, TypeError) as error:
+                raise CliError(f"{args.file}:{line_number}: invalid operation: {error}") from error
+            except CliError as error:
+                raise CliError(f"{args.file}:{line_number}: {error}") from error
+            applied += 1
+    return CommandResult({"applied": applied}, [f"Applied {applied} operation(s)"])
+
+
+def _apply(session: Session, operation: dict):
+    op = operation["op"]
+    if op == "add":
+        commands = operation["commands"]
+        commands = [commands] if isinstance(commands, str) else commands
+        session.add(operation["name"], commands, replace=bool(operation.get("replace")))
+    elif op == "rm":
+        session.remove(operation["name"])
+    elif op == "rename":
+        session.rename(operation["name"], operation["new_name"])
+    elif op == "mv":
+        session.move(operation["name"], operation["position"])
+    else:
+        raise CliError(f"unknown operation '{op}'")
+
+
+def _groups(session: Session, _args: argparse.Namespace) -> CommandResult:
+    alias_file = session.alias_file
+    memberships = alias_file.memberships(alias_file.index())
+    counts = collections.Counter(memberships.values())
+    data = []
+    lines = []
+    for group in alias_file.groups:
+        path = alias_file.group_path(group.name)
+        data.append({"name": group.name, "autoload": group.autoload, "aliases": counts[group.name], "file": path})
+        loaded = "loaded at startup" if group.autoload else "loaded on demand"
+        lines.append(f"{group.name}: {counts[group.name]} aliases, {loaded}")
+    return CommandResult(data, lines)
+
+
+def _backup(session: Session, args: argparse.Namespace) -> CommandResult:
+    snapshot, created = session.alias_file.backup(args.label, session.retention)
+    line = f"Created backup {snapshot.id}" if created else f"No changes since backup {snapshot.id}"
+    return CommandResult({"backup": snapshot.id, "created": created}, [line])
+
+
+def _backups(session: Session, _args: argparse.Namespace) -> CommandResult:
+    snapshots = session.alias_file.backups.snapshots()
+    data = [snapshot._asdict() for snapshot in snapshots]
+    return CommandResult(data, [snapshot.describe() for snapshot in snapshots])
+
+
+def _restore(session: Session, args: argparse.Namespace) -> CommandResult:
+    snapshot = _snapshot(session, args.backup)
+    if snapshot is None:
+        raise CliError("choose a backup to restore")
+    try:
+        previous = session.alias_file.restore(snapshot, session.retention)
+    except OSError as error:
+        raise CliError(f"the backup could not be restored: {error}") from error
+    lines = [f"Restored backup {snapshot.id}, the aliases from before were backed up as {previous.id}"]
+    return CommandResult({"restored": snapshot.id, "previous": previous.id}, lines)
+
+
+def _diff(session: Session, args: argparse.Namespace) -> CommandResult:
+    diff = session.alias_file.backups.diff(_snapshot(session, args.old), _snapshot(session, args.new))
+    lines = [f"+ {name}" for name in diff.added]
+    lines += [f"- {name}" for name in diff.removed]
+    lines += [f"~ {name}" for name in diff.changed]
+    return CommandResult(diff._asdict(), lines)
+
+
+def _snapshot(session: Session, backup_id: str) -> Snapshot | None:
+    if backup_id == "current":
+        return None
+    try:
+        return session.alias_file.backups.get(backup_id)
+    except KeyError as error:
+        raise CliError(error.args[0]) from error
+
+
+def _open_input(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    try:
+        return open(path, encoding="utf-8-sig", errors="replace")
+    except OSError as error:
+        raise CliError(str(error)) from error
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="aliasaurus", description="Manage Windows (DOSKEY) aliases.")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON output")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name: str, handler: Callable[[Session, argparse.Namespace], CommandResult], description: str):
+        subparser = subparsers.add_parser(name, help=description)
+        subparser.set_defaults(handler=handler)
+        return subparser
+
+    add_command("list", _list, "list the alias names in order")
+    get_parser = add_command("get", _get, "print the commands of aliases")
+    get_parser.add_argument("names", nargs="+", metavar="NAME")
+    add_parser = add_command("add", _add, "add aliases, e.g. add ll=dir gs=git status")
+    add_parser.add_argument("definitions", nargs="+", metavar="NAME=COMMANDS", help="commands are separated by $T")
+    add_parser.add_argument("--replace", action="store_true", help="overwrite aliases that already exist")
+    rm_parser = add_command("rm", _rm, "remove aliases")
+    rm_parser.add_argument("names", nargs="+", metavar="NAME")
+    rename_parser = add_command("rename", _rename, "rename an alias")
+    rename_parser.add_argument("old_name")
+    rename_parser.add_argument("new_name")
+    mv_parser = add_command("mv", _mv, "move an alias to a position in the list")
+    mv_parser.add_argument("name")
+    mv_parser.add_argument("position", type=int, help="zero-based, negative positions count from the end")
+    format_help = "the format of the file, guessed from its extension by default (JSON for stdin and stdout)"
+    import_parser = add_command("import", _import, "import aliases from a file in any supported format")
+    import_parser.add_argument("file", help="the file, or - for stdin")
+    import_parser.add_argument("--format", choices=list(FORMATS), help=format_help)
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=CONFLICT_POLICIES,
+        default=CONFLICT_SKIP,
+        help="what to do with an alias whose name is taken by a different alias (default: skip)",
+    )
+    import_parser.add_argument("--replace", action="store_true", help="the same as --on-conflict overwrite")
+    export_parser = add_command("export", _export, "export the aliases to a file in any supported format")
+    export_parser.add_argument("file", nargs="?", default="-", help="the file, or - for stdout (default)")
+    export_parser.add_argument("--format", choices=list(FORMATS), help=format_help)
+    batch_parser = add_command("batch", _batch, "apply many operations with a single write of the alias file")
+    batch_parser.add_argument(
+        "file",
+        help='a file (or - for stdin) with one JSON operation per line, e.g. {"op": "add", "name": "ll", "commands": '
+        '["dir"]}. Operations are add, rm, rename (with new_name) and mv (with position)',
+    )
+    add_command("groups", _groups, "list the alias groups, which are loaded in cmd.exe with: aliasaurus load GROUP")
+    backup_parser = add_command("backup", _backup, "back up the aliases, unless unchanged since the last backup")
+    backup_parser.add_argument("--label", default="", help="a description of the backup")
+    add_command("backups", _backups, "list the backups, oldest first")
+    restore_parser = add_command("restore", _restore, "restore a backup, backing up the current aliases first")
+    restore_parser.add_argument("backup", help="the ID of the backup, or a unique prefix of it")
+    diff_parser = add_command("diff", _diff, "list the aliases added (+), removed (-) and changed (~) between backups")
+    diff_parser.add_argument("old", help="the ID of the older backup, or current for the current aliases")
+    diff_parser.add_argument("new", nargs="?", default="current", help="the ID of the newer backup (default: current)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the command line interface.
+
+    Args:
+        argv (list[str] | None): The arguments, excluding the program name. Defaults to sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+    args = build_parser().parse_args(argv)
+    backend = default_backend()
+    settings = Settings(path=backend.paths().settings)
+    settings.load()
+    if settings.record_timings:
+        # The trace is only recorded by the GUI, it would be started afresh by every command.
+        TIMINGS.start_recording(backend.paths().timing_log)
+    file_format = settings.file_format if settings.file_format in FILE_FORMATS else DEFAULT_FILE_FORMAT
+    alias_file = AliasFile(file_format, backend=backend, shell_exports=settings.shell_exports)
+    session = Session(alias_file, settings.backup_retention())
+    try:
+        result = args.handler(session, args)
+        session.save()
+    except CliError as error:
+        if args.json:
+            print(json.dumps({"error": str(error)}), file=sys.stderr)
+        else:
+            print(f"aliasaurus: error: {error}", file=sys.stderr)
+        return 1
+    if args.json and result.data is not None:
+        print(json.dumps(result.data))
+    else:
+        for line in result.lines:
+            print(line)
+    return 0
@@ -0,0 +1,106 @@
+from collections.abc import Callable
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QApplication,
+    QCheckBox,
+    QDialog,
+    QDialogButtonBox,
+    QHeaderView,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from app.timings import Timings
+
+REFRESH_INTERVAL_MS = 1000
+TIMING_COLUMNS = ["Operation", "Count", "p50 (ms)", "p99 (ms)", "Max (ms)", "Last (ms)"]
+
+
+class DiagnosticsDialog(QDialog):
+    """Shows the recent timings of the app's hot paths and statistics about the alias file, to attach to reports of
+    slowness."""
+
+    def __init__(
+        self,
+        timings: Timings,
+        statistics: Callable[[], list[tuple[str, str]]],
+        recording_description: str,
+        parent=None,
+    ):
+        """
+        Args:
+            timings (Timings): The timings to show.
+            statistics (Callable[[], list[tuple[str, str]]]): Gets the statistics to show, as names and values. Called
+                again on every refresh.
+            recording_description (str): Where the timings are recorded to, for the checkbox that turns it on.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.setWindowFlag(Qt.WindowType.WindowContextHelpButtonHint, False)
+        self.resize(640, 560)
+        self.timings = timings
+        self.statistics = statistics
+
+        self.timing_table = QTableWidget(0, len(TIMING_COLUMNS))
+        self.timing_table.setHorizontalHeaderLabels(TIMING_COLUMNS)
+        self.statistics_table = QTableWidget(0, 2)
+        self.statistics_table.setHorizontalHeaderLabels(["Statistic", "Value"])
+        for table in (self.timing_table, self.statistics_table):
+            table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+            table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+            table.verticalHeader().setVisible(False)
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+
+        self.record_check = QCheckBox(f"Record timings to {recording_description}")
+        self.record_check.setChecked(timings.is_recording())
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        copy_button = self.buttons.addButton("Copy Report", QDialogButtonBox.ButtonRole.ActionRole)
+        copy_button.clicked.connect(lambda: QApplication.clipboard().setText(self.report()))
+        self.buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("Timings of the most recent runs of each operation:"))
+        layout.addWidget(self.timing_table, 2)
+        layout.addWidget(self.statistics_table, 1)
+        layout.addWidget(self.record_check)
+        layout.addWidget(self.buttons)
+        self.setLayout(layout)
+
+        self.refresh()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(REFRESH_INTERVAL_MS)
+
+    def refresh(self):
+        summaries = self.timings.summary()
+        self.timing_table.setRowCount(len(summaries))
+        for row, summary in enumerate(summaries):
+            values = [summary.name, str(summary.count)]
+            values += [f"{ms:.1f}" for ms in (summary.p50_ms, summary.p99_ms, summary.max_ms, summary.last_ms)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.timing_table.setItem(row, column, item)
+        statistics = self.statistics()
+        self.statistics_table.setRowCount(len(statistics))
+        for row, (name, value) in enumerate(statistics):
+            self.statistics_table.setItem(row, 0, QTableWidgetItem(name))
+            self.statistics_table.setItem(row, 1, QTableWidgetItem(value))
+
+    def report(self) -> str:
+        """Get the timings and statistics as plain text."""
+        lines = [f"{'Operation':<28} {'Count':>7} {'p50 ms':>9} {'p99 ms':>9} {'Max ms':>9} {'Last ms':>9}"]
+        for summary in self.timings.summary():
+            lines.append(
+                f"{summary.name:<28} {summary.count:>7} {summary.p50_ms:>9.1f} {summary.p99_ms:>9.1f} "
+                f"{summary.max_ms:>9.1f} {summary.last_ms:>9.1f}"
+            )
+        lines.append("")
+        lines += [f"{name}: {value}" for name, value in self.statistics()]
+        return "\n".join(lines)
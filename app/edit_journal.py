@@ -0,0 +1,405 @@
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+
+from app.alias_groups import group_label
+from app.atomic_write import atomic_write
+
+ADD = "add"
+DELETE = "delete"
+RENAME = "rename"
+EDIT = "edit"
+MOVE = "move"
+
+MAX_UNDO_STEPS = 200
+COMPACT_THRESHOLD = 2 * MAX_UNDO_STEPS
+"""The number of journal entries above which the journal is rewritten with only the undo history that is kept."""
+
+
+class Operation(NamedTuple):
+    """A single change to the aliases. Each operation records enough to be inverted, so it can be undone."""
+
+    kind: str
+    name: str
+    position: int = -1
+    """ADD and DELETE: the row of the alias. MOVE: the row it moved to."""
+    commands: list[str] | None = None
+    """ADD and DELETE: the commands of the alias. EDIT: the new commands."""
+    previous: list[str] | int | None = None
+    """EDIT: the old commands. MOVE: the row it moved from."""
+    new_name: str = ""
+    """RENAME: the new name."""
+    group: str = ""
+    """ADD and DELETE: the group of the alias, empty for the core group. MOVE: the group it moved to."""
+    previous_group: str = ""
+    """MOVE: the group it moved from."""
+
+    def describe(self) -> str:
+        if self.kind == RENAME:
+            return f"rename '{self.name}' to '{self.new_name}'"
+        if self.kind == MOVE and self.group != self.previous_group:
+            return f"move '{self.name}' to {group_label(self.group)}"
+        return f"{self.kind} '{self.name}'"
+
+
+def invert(operation: Operation) -> Operation:
+    """Get the operation that undoes an operation."""
+    if operation.kind == ADD:
+        return operation._replace(kind=DELETE)
+    if operation.kind == DELETE:
+        return operation._replace(kind=ADD)
+    if operation.kind == RENAME:
+        return operation._replace(name=operation.new_name, new_name=operation.name)
+    if operation.kind == EDIT:
+        assert not isinstance(operation.previous, int)
+        return operation._replace(commands=operation.previous, previous=operation.commands)
+    if operation.kind == MOVE:
+        assert isinstance(operation.previous, int)
+        return operation._replace(
+            position=operation.previous,
+            previous=operation.position,
+            group=operation.previous_group,
+            previous_group=operation.group,
+        )
+    raise ValueError(f"unknown operation '{operation.kind}'")
+
+
+def invert_step(step: list[Operation]) -> list[Operation]:
+    """Get the operations that undo a step of several operations."""
+    return [invert(operation) for operation in reversed(step)]
+
+
+def group_operations(step: list[Operation]) -> list[list[Operation]]:
+    """Split a step into runs of consecutive operations of the same kind, which can be applied together."""
+    groups: list[list[Operation]] = []
+    for operation in step:
+        if groups and groups[-1][0].kind == operation.kind:
+            groups[-1].append(operation)
+        else:
+            groups.append([operation])
+    return groups
+
+
+def apply_to_order(names: list[str], group: list[Operation]) -> list[str] | None:
+    """Apply a group of operations of the same kind to the order of the aliases in one pass.
+
+    Consecutive ADD operations are applied in turn, so they must be in ascending order of position. Consecutive MOVE
+    operations are applied together: each alias ends up at its position, and the other aliases keep their order.
+
+    Args:
+        names (list[str]): The alias names in order.
+        group (list[Operation]): Operations of the same kind, e.g. from `group_operations`.
+
+    Returns:
+        list[str] | None: The new order, or None if the operations no longer apply (e.g. an alias does not exist).
+    """
+    kind = group[0].kind
+    affected = [operation.name for operation in group]
+    present = set(names)
+    if kind == ADD:
+        if any(name in present for name in affected) or len(set(affected)) != len(affected):
+            return None
+        return _place(names, {operation.position: operation.name for operation in group}, len(names) + len(group))
+    if not all(name in present for name in affected):
+        return None
+    if kind == DELETE:
+        removed = set(affected)
+        return [name for name in names if name not in removed]
+    if kind == RENAME:
+        renames = {operation.name: operation.new_name for operation in group}
+        remaining = present - renames.keys()
+        if any(new_name in remaining for new_name in renames.values()):
+            return None
+        return [renames.get(name, name) for name in names]
+    if kind == MOVE:
+        moved = set(affected)
+        return _place([name for name in names if name not in moved], {op.position: op.name for op in group}, len(names))
+    return names
+
+
+def _place(others: list[str], placed: dict[int, str], length: int) -> list[str] | None:
+    # Put each placed name at its position and fill the other rows with the other names in order.
+    if len(placed) + len(others) != length or any(not 0 <= position < length for position in placed):
+        return None
+    remaining = iter(others)
+    return [placed[row] if row in placed else next(remaining) for row in range(length)]
+
+
+def describe_step(step: list[Operation]) -> str:
+    """Describe a step, e.g. for the status bar."""
+    more = f" and {len(step) - 1} more" if len(step) > 1 else ""
+    return f"{step[0].describe()}{more}"
+
+
+def _encode_step(step: list[Operation]) -> list[dict]:
+    # Fields left at their defaults are omitted, so a move is only a few bytes.
+    defaults = Operation._field_defaults
+    return [
+        {field: value for field, value in operation._asdict().items() if defaults.get(field, ...) != value}
+        for operation in step
+    ]
+
+
+def _decode_step(records: list[dict]) -> list[Operation]:
+    return [Operation(**record) for record in records]
+
+
+def _encode_entry(entry: dict) -> str:
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+class _Compaction(NamedTuple):
+    """A rewrite of the journal with only the undo history that is kept, queued in order with the appends."""
+
+    undo: list[list[Operation]]
+    redo: list[list[Operation]]
+    stamps: list[list[int] | None] | None
+
+    def entries(self) -> list[dict]:
+        entries = [{"do": _encode_step(step)} for step in self.undo]
+        entries += [{"do": _encode_step(step)} for step in reversed(self.redo)]
+        entries += [{"undo": 1}] * len(self.redo)
+        entries.append({"checkpoint": self.stamps, "at": len(entries)})
+        return entries
+
+
+class EditJournal:
+    """An append-only journal of the changes made to the aliases, kept next to the alias file.
+
+    Each change is appended as one small JSON line as soon as it is made, so the undo history survives restarts and no
+    change is lost if the app exits before the alias file is written. The lines are written on a worker thread, so
+    making a change never waits for the disk, and each burst of them is synced to disk once. Checkpoints record how much
+    of the journal has been written to the alias file. Changes after the last checkpoint are replayed at startup.
+
+    Entries are JSON objects with one of these keys:
+        do: a list of operations, making up one undo step.
+        undo, redo: undo or redo the last step.
+        checkpoint: the modification time and size of the alias files once the first `at` entries were written.
+        reset: the entries before it were compacted into the ones after it, which are numbered from zero again.
+    """
+
+    def __init__(self, path: str, alias_paths: Callable[[], list[str]], max_steps: int = MAX_UNDO_STEPS):
+        """
+        Args:
+            path (str): The journal file.
+            alias_paths (Callable[[], list[str]]): Gets the files the aliases are saved in, including the macro files of
+                the groups and their manifest, used to detect changes made while the app was closed.
+            max_steps (int): The number of steps that can be undone.
+        """
+        self.path = path
+        self.alias_paths = alias_paths
+        self.max_steps = max_steps
+        self._undo: list[list[Operation]] = []
+        self._redo: list[list[Operation]] = []
+        self._entries = 0
+        self._checkpoint_at = 0
+        self._checkpoint_stamps: list[list[int] | None] | None = None
+        self._lock = threading.Lock()
+        """Held for every change to the undo history and the entry count."""
+        self._queue: list[str | _Compaction] = []
+        """The lines and compactions waiting for the writer thread, in order."""
+        self._queue_lock = threading.Lock()
+        self._write_scheduled = False
+        self._last_write: Future | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-write")
+
+    def load(self) -> list[list[Operation]]:
+        """Read the journal, restoring the undo history.
+
+        Returns:
+            list[list[Operation]]: The operations made after the last checkpoint, which are not in the alias file yet
+                and must be applied in order. Empty if the alias file was changed since, in which case they are dropped.
+        """
+        self.flush()
+        pending: list[tuple[int, list[Operation]]] = []
+        with self._lock:
+            self._reset()
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as file:
+                    for line_number, line in enumerate(file, start=1):
+                        try:
+                            self._load_entry(json.loads(line), pending)
+                        except (json.JSONDecodeError, TypeError, KeyError, IndexError, ValueError) as error:
+                            # Most likely the last line was cut short when the app was killed.
+                            logging.warning(f"Journal entry {line_number} is invalid, ignoring the rest: {error}")
+                            break
+        steps = [step for entry, step in pending if entry >= self._checkpoint_at]
+        if steps and self._checkpoint_stamps != self._stamps():
+            logging.warning(f"The alias file changed since the journal was written, dropping {len(steps)} change(s).")
+            steps = []
+        if not steps and self._checkpoint_stamps != self._stamps():
+            self.checkpoint(self._entries)
+        return steps
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def position(self) -> int:
+        """Get the number of entries in the journal, to pass to `checkpoint` once the changes so far are written."""
+        return self._entries
+
+    def record(self, step: list[Operation]):
+        """Record a change as one undo step. Anything that was undone can no longer be redone."""
+        with self._lock:
+            self._undo.append(step)
+            del self._undo[: -self.max_steps]
+            self._redo.clear()
+            self._append({"do": _encode_step(step)})
+
+    def undo(self) -> list[Operation]:
+        """Undo the last step.
+
+        Returns:
+            list[Operation]: The operations to apply to undo it.
+        """
+        with self._lock:
+            step = self._undo.pop()
+            self._redo.append(step)
+            self._append({"undo": 1})
+        return invert_step(step)
+
+    def redo(self) -> list[Operation]:
+        """Redo the last undone step.
+
+        Returns:
+            list[Operation]: The operations to apply to redo it.
+        """
+        with self._lock:
+            step = self._redo.pop()
+            self._undo.append(step)
+            self._append({"redo": 1})
+        return step
+
+    def peek_undo(self) -> list[Operation]:
+        return self._undo[-1]
+
+    def peek_redo(self) -> list[Operation]:
+        return self._redo[-1]
+
+    def checkpoint(self, position: int):
+        """Record that the entries up to a position have been written to the alias file, as it is now.
+
+        Once the journal is fully written to the alias file and has grown large, it is compacted in the background.
+        """
+        stamps = self._stamps()
+        with self._lock:
+            position = min(position, self._entries)
+            if (position, stamps) == (self._checkpoint_at, self._checkpoint_stamps):
+                return
+            self._checkpoint_at = position
+            self._checkpoint_stamps = stamps
+            if self._checkpoint_at == self._entries and self._entries > COMPACT_THRESHOLD:
+                # The entries are numbered as in the compacted journal from now on. The writer thread rewrites the
+                # journal from a copy of the history, before any entries appended after this.
+                compaction = _Compaction(list(self._undo), list(self._redo), stamps)
+                self._entries = self._checkpoint_at = len(compaction.undo) + 2 * len(compaction.redo)
+                self._enqueue(compaction)
+            else:
+                self._append({"checkpoint": self._checkpoint_stamps, "at": self._checkpoint_at}, counts=False)
+
+    def flush(self):
+        """Wait for every entry so far to be written to the journal, e.g. before exiting."""
+        with self._queue_lock:
+            last_write = self._last_write
+        if last_write is not None:
+            last_write.result()
+
+    def _reset(self):
+        self._undo, self._redo = [], []
+        self._entries = self._checkpoint_at = 0
+        self._checkpoint_stamps = None
+
+    def _load_entry(self, entry: dict, pending: list[tuple[int, list[Operation]]]):
+        if "reset" in entry:
+            self._reset()
+            pending.clear()
+            return
+        if "checkpoint" in entry:
+            self._checkpoint_at = entry["at"]
+            self._checkpoint_stamps = entry["checkpoint"]
+            return
+        if "do" in entry:
+            step = _decode_step(entry["do"])
+            self._undo.append(step)
+            del self._undo[: -self.max_steps]
+            self._redo.clear()
+        elif "undo" in entry:
+            undone = self._undo.pop()
+            self._redo.append(undone)
+            step = invert_step(undone)
+        elif "redo" in entry:
+            step = self._redo.pop()
+            self._undo.append(step)
+        else:
+            raise ValueError(f"unknown entry {entry}")
+        pending.append((self._entries, step))
+        self._entries += 1
+
+    def _append(self, entry: dict, counts: bool = True):
+        # Called with the lock held.
+        self._enqueue(_encode_entry(entry))
+        if counts:
+            self._entries += 1
+
+    def _enqueue(self, item: str | _Compaction):
+        with self._queue_lock:
+            self._queue.append(item)
+            if not self._write_scheduled:
+                self._write_scheduled = True
+                self._last_write = self._executor.submit(self._write)
+
+    def _write(self):
+        # Runs on the writer thread. Writes everything queued so far, with one sync to disk.
+        with self._queue_lock:
+            items, self._queue = self._queue, []
+            self._write_scheduled = False
+        lines: list[str] = []
+        try:
+            for item in items:
+                if isinstance(item, str):
+                    lines.append(item)
+                    continue
+                self._write_lines(lines)
+                lines = []
+                self._compact(item)
+            self._write_lines(lines)
+        except OSError as error:
+            logging.warning(f"Failed to write the journal: {error}")
+
+    def _write_lines(self, lines: list[str]):
+        if not lines:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _compact(self, compaction: _Compaction):
+        # Runs on the writer thread. Rewrites the journal with the steps that can still be undone or redone.
+        text = "".join(_encode_entry(entry) for entry in compaction.entries())
+        try:
+            atomic_write(self.path, text)
+        except OSError as error:
+            # Appended instead, so the entries that follow are still numbered as the app numbers them.
+            logging.warning(f"Failed to compact the journal, appending the compacted entries: {error}")
+            self._write_lines([_encode_entry({"reset": 1}), text])
+            return
+        logging.info(f"Compacted the journal to {len(compaction.undo) + 2 * len(compaction.redo)} entries.")
+
+    def _stamps(self) -> list[list[int] | None]:
+        stamps: list[list[int] | None] = []
+        for path in self.alias_paths():
+            try:
+                stat = os.stat(path)
+                stamps.append([stat.st_mtime_ns, stat.st_size])
+            except FileNotFoundError:
+                stamps.append(None)
+        return stamps
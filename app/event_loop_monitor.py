@@ -0,0 +1,59 @@
+import logging
+import time
+
+from PyQt5.QtCore import QObject, Qt, QTimer
+
+from app.timings import TIMINGS, Timings
+
+CHECK_INTERVAL_MS = 100
+STALL_THRESHOLD_MS = 200
+"""How late the event loop must be to count as a stall: long enough for a user to notice the app stop responding."""
+
+
+class EventLoopMonitor(QObject):
+    """Measures how long the Qt event loop takes to get round to a timer, i.e. how long the GUI was unresponsive.
+
+    A timer fires every `CHECK_INTERVAL_MS`. The time beyond the interval is the latency of the event loop, recorded in
+    the rolling timings. Stalls over the threshold are also logged and recorded, so they can be matched up with what the
+    app was doing.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = STALL_THRESHOLD_MS,
+        timings: Timings = TIMINGS,
+        parent: QObject | None = None,
+    ):
+        """
+        Args:
+            threshold_ms (float): How late the event loop must be to log a stall.
+            timings (Timings): Where to record the latency and the stalls.
+        """
+        super().__init__(parent)
+        self.threshold_ms = threshold_ms
+        self.timings = timings
+        self.stall_count = 0
+        self._last = 0.0
+        self._timer = QTimer(self)
+        # A coarse timer may fire up to 5% late, which would read as latency.
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(CHECK_INTERVAL_MS)
+        self._timer.timeout.connect(self._check)
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _check(self):
+        now = time.perf_counter()
+        latency_s = max(0.0, now - self._last - CHECK_INTERVAL_MS / 1000)
+        self._last = now
+        # Only the stalls are worth recording to the timing log, not every check.
+        self.timings.add("event loop latency", now - latency_s, latency_s, recorded=False)
+        if latency_s * 1000 >= self.threshold_ms:
+            self.stall_count += 1
+            self.timings.add("event loop stall", now - latency_s, latency_s)
+            logging.warning(f"The event loop stalled for {latency_s * 1000:.0f} ms.")
@@ -0,0 +1,67 @@
+import re
+from collections.abc import Callable
+
+# This module must never import PyQt5, the command line interface uses it.
+
+CODE_PATTERN = re.compile(r"\$(.)")
+ARGUMENT_CODES = "123456789*"
+LITERAL_CODES = {"G": ">", "L": "<", "B": "|", "$": "$"}
+"""The DOSKEY codes for characters cmd.exe would otherwise interpret while defining a macro."""
+
+
+def uses_arguments(command: str) -> bool:
+    """Check whether a command uses any of the `$1` to `$9` or `$*` arguments."""
+    return any(match.group(1) in ARGUMENT_CODES for match in CODE_PATTERN.finditer(command))
+
+
+def expand_codes(command: str, argument: Callable[[str], str], separator: str = "$T") -> str:
+    """Replace the DOSKEY codes in a command with what they stand for.
+
+    Args:
+        command (str): A single command of a macro.
+        argument (Callable[[str], str]): Gets the replacement of an argument code, from `1` to `9` or `*`.
+        separator (str): The replacement of a `$T` left in the command, e.g. a lower case `$t`.
+
+    Returns:
+        str: The command with the codes replaced. Unknown codes are left as they are, like DOSKEY does.
+    """
+
+    def replace(match: re.Match) -> str:
+        code = match.group(1)
+        if code.upper() in LITERAL_CODES:
+            return LITERAL_CODES[code.upper()]
+        if code.upper() == "T":
+            return separator
+        if code in ARGUMENT_CODES:
+            return argument(code)
+        return match.group(0)
+
+    return CODE_PATTERN.sub(replace, command)
+
+
+def expand_macro(commands: list[str], arguments: str = "") -> list[str]:
+    """Expand a macro into the commands cmd.exe runs when it is typed with some arguments, as DOSKEY does.
+
+    Like DOSKEY, the arguments are separated by whitespace only, quotes do not group them. `$1` to `$9` are replaced
+    with the arguments (or nothing if there are fewer), and `$*` with everything typed after the macro name.
+
+    Args:
+        commands (list[str]): The commands of the macro.
+        arguments (str): What is typed after the macro name.
+
+    Returns:
+        list[str]: The commands to run in turn.
+    """
+    values = arguments.split()
+
+    def argument(code: str) -> str:
+        if code == "*":
+            return arguments.strip()
+        position = int(code) - 1
+        return values[position] if position < len(values) else ""
+
+    expanded = []
+    for command in commands:
+        # Commands never contain line breaks, so one stands in for the $T separators left in a command.
+        expanded += [part.strip() for part in expand_codes(command, argument, separator="\n").split("\n")]
+    return expanded
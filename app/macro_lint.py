@@ -0,0 +1,180 @@
+import hashlib
+import re
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from app.alias_groups import LOAD_MACRO_NAME
+from app.alias_index import DOSKEY_PREFIX, encode_commands, is_valid_name
+
+ERROR = "error"
+WARNING = "warning"
+
+MAX_LINE_LENGTH = 8191
+"""The longest command line cmd.exe accepts. This limits each command, and the `DOSKEY name=...` line of an inline
+alias."""
+MAX_CACHED_RESULTS = 200_000
+
+ARGUMENTS = "123456789"
+CODES = set("GgLlBbTt$*") | set(ARGUMENTS)
+"""The characters that can follow a $ in a DOSKEY macro."""
+OPERATOR_CODES = {"|": "$B", ">": "$G", "<": "$L", "&": "$T"}
+"""The DOSKEY codes to write instead of the characters cmd.exe would interpret while defining the macro."""
+
+SPECIAL_PATTERN = re.compile(r"[|<>&$%]")
+TOKEN_PATTERN = re.compile(r"\"|\^.?|[|<>&]|\$(?:[1-9][0-9]?|.)?|%[0-9*]")
+NAME_SPECIAL_PATTERN = re.compile(r"[|<>&^\"%$]")
+
+
+class Diagnostic(NamedTuple):
+    """A problem found in an alias."""
+
+    severity: str
+    message: str
+    line: int
+    """The command the problem is in, i.e. the line in the editor, or -1 for the name."""
+    column: int = 0
+    length: int = 0
+
+    def describe(self) -> str:
+        where = "Name" if self.line < 0 else f"Line {self.line + 1}"
+        return f"{where}: {self.message}"
+
+
+def lint(name: str, commands: list[str], inline: bool) -> tuple[Diagnostic, ...]:
+    """Check an alias for DOSKEY macro syntax that will not do what it looks like.
+
+    Args:
+        name (str): The name of the alias.
+        commands (list[str]): The commands of the alias.
+        inline (bool): Whether the alias is written to `alias.cmd` as a `DOSKEY name=...` line, where cmd.exe interprets
+            characters like `|` while defining the macro. In a macro file they only break the alias once it is moved to
+            the inline format, so they are warnings.
+
+    Returns:
+        tuple[Diagnostic, ...]: The problems found, in order.
+    """
+    diagnostics: list[Diagnostic] = []
+    if not name:
+        diagnostics.append(Diagnostic(ERROR, "The alias has no name.", -1))
+    elif not is_valid_name(name):
+        diagnostics.append(Diagnostic(ERROR, "Names can't contain spaces or '='.", -1, 0, len(name)))
+    elif (match := NAME_SPECIAL_PATTERN.search(name)) is not None:
+        message = f"cmd.exe interprets '{match.group()}', so an alias with it in the name can't be run."
+        diagnostics.append(Diagnostic(WARNING, message, -1, match.start(), 1))
+    elif name.lower() == LOAD_MACRO_NAME:
+        message = f"Once there are alias groups, the '{LOAD_MACRO_NAME}' macro that loads them clashes with this alias."
+        diagnostics.append(Diagnostic(WARNING, message, -1, 0, len(name)))
+
+    operator_severity = ERROR if inline else WARNING
+    used_arguments: set[str] = set()
+    for line, command in enumerate(commands):
+        if not command.strip() and len(commands) > 1:
+            diagnostics.append(Diagnostic(WARNING, "This command is empty.", line))
+        if len(command) > MAX_LINE_LENGTH:
+            diagnostics.append(
+                Diagnostic(ERROR, f"This command is longer than cmd.exe's limit of {MAX_LINE_LENGTH} characters.", line)
+            )
+        if SPECIAL_PATTERN.search(command) is not None:
+            _lint_command(command, line, operator_severity, used_arguments, diagnostics)
+
+    if used_arguments:
+        highest = max(used_arguments)
+        skipped = [argument for argument in ARGUMENTS[: ARGUMENTS.index(highest)] if argument not in used_arguments]
+        if skipped:
+            diagnostics.append(
+                Diagnostic(WARNING, f"${highest} is used but ${skipped[0]} isn't, so that argument is ignored.", -1)
+            )
+    if inline:
+        length = len(DOSKEY_PREFIX) + len(name) + 1 + len(encode_commands(commands))
+        if length > MAX_LINE_LENGTH:
+            diagnostics.append(
+                Diagnostic(
+                    ERROR,
+                    f"The alias is {length} characters long, cmd.exe can't define aliases longer than "
+                    f"{MAX_LINE_LENGTH} characters. Use the macro file format instead.",
+                    -1,
+                )
+            )
+    return tuple(diagnostics)
+
+
+def _lint_command(
+    command: str, line: int, operator_severity: str, used_arguments: set[str], diagnostics: list[Diagnostic]
+):
+    quoted = False
+    for match in TOKEN_PATTERN.finditer(command):
+        token, column = match.group(), match.start()
+        if token == '"':
+            quoted = not quoted
+        elif token[0] == "^":
+            # Escaped with a caret, so cmd.exe passes the next character on as it is. Carets are literal in quotes.
+            if quoted and token == '^"':
+                quoted = False
+        elif token[0] == "$":
+            _lint_code(token, line, column, used_arguments, diagnostics)
+        elif token[0] == "%":
+            diagnostics.append(
+                Diagnostic(
+                    WARNING,
+                    f"{token} only works in batch files, aliases take their arguments as ${token[1]}.",
+                    line,
+                    column,
+                    len(token),
+                )
+            )
+        elif not quoted:
+            diagnostics.append(
+                Diagnostic(
+                    operator_severity,
+                    f"cmd.exe runs '{token}' while defining the alias, write {OPERATOR_CODES[token]} instead.",
+                    line,
+                    column,
+                    1,
+                )
+            )
+
+
+def _lint_code(token: str, line: int, column: int, used_arguments: set[str], diagnostics: list[Diagnostic]):
+    if len(token) == 1:
+        message = "A $ at the end of a command is dropped, write $$ for a literal $."
+    elif len(token) == 3:
+        used_arguments.add(token[1])
+        message = f"There are only $1 to $9, this is ${token[1]} followed by {token[2]}."
+    elif token[1] not in CODES:
+        message = f"${token[1]} is not a DOSKEY code, write $$ for a literal $."
+    elif token[1] in "Tt":
+        message = "$T separates commands, put each command on its own line instead."
+    else:
+        if token[1] in ARGUMENTS:
+            used_arguments.add(token[1])
+        return
+    diagnostics.append(Diagnostic(WARNING, message, line, column, len(token)))
+
+
+def worst_severity(diagnostics: Iterable[Diagnostic]) -> str | None:
+    """Get the most severe of some diagnostics, or None if there are none."""
+    severities = {diagnostic.severity for diagnostic in diagnostics}
+    if ERROR in severities:
+        return ERROR
+    return WARNING if severities else None
+
+
+class LintCache:
+    """Lint results keyed by a hash of the alias, so unchanged aliases are never checked twice."""
+
+    def __init__(self, max_results: int = MAX_CACHED_RESULTS):
+        self.max_results = max_results
+        self._results: dict[bytes, tuple[Diagnostic, ...]] = {}
+
+    def lint(self, name: str, commands: list[str], inline: bool) -> tuple[Diagnostic, ...]:
+        """Lint an alias, reusing the result from the last time it had the same name and commands."""
+        key = hashlib.blake2b(
+            "\n".join([str(int(inline)), name, *commands]).encode(errors="surrogatepass"), digest_size=16
+        ).digest()
+        diagnostics = self._results.get(key)
+        if diagnostics is None:
+            diagnostics = lint(name, commands, inline)
+            if len(self._results) >= self.max_results:
+                self._results.clear()
+            self._results[key] = diagnostics
+        return diagnostics
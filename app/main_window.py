@@ -1,13 +1,19 @@
+import itertools
 import logging
-import subprocess
+import os
+import platform
+import re
+from collections.abc import Callable
 
-import qdarktheme
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QCloseEvent
+from PyQt5.QtCore import QT_VERSION_STR, QByteArray, Qt, QTimer
+from PyQt5.QtGui import QCloseEvent, QKeySequence, QMoveEvent, QResizeEvent, QShowEvent
 from PyQt5.QtWidgets import (
     QAction,
     QActionGroup,
     QApplication,
+    QFileDialog,
+    QInputDialog,
+    QLabel,
     QMainWindow,
     QMenu,
     QMenuBar,
@@ -16,31 +22,155 @@ from PyQt5.QtWidgets import (
     QToolBar,
 )
 
-from app.about_dialog import AboutDialog
 from app.alias_edit import AliasEdit
-from app.alias_file import AliasFile
+from app.alias_exchange import (
+    CONFLICT_OVERWRITE,
+    CONFLICT_RENAME,
+    CONFLICT_SKIP,
+    export_aliases,
+    plan_import,
+    read_aliases,
+)
+from app.alias_filter import AliasFilter
+from app.alias_file import FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE, FILE_FORMATS, AliasFile
+from app.alias_formats import FORMAT_DOSKEY, FORMATS, AliasFormat, format_for_path
+from app.alias_groups import CORE_GROUP, AliasGroup, check_group_name, group_label
+from app.alias_index import AliasIndex
+from app.alias_linter import AliasLinter, LintSummary
 from app.alias_list import AliasList
+from app.alias_runner import RunPane
+from app.alias_search import AliasSearchIndex
+from app.alias_store import AliasSnapshot, AliasStore
+from app.alias_watcher import AliasWatcher, ExternalChanges
+from app.bulk_edit import delete_operations, move_operations, rename_operations, replace_operations
+from app.edit_journal import (
+    ADD,
+    DELETE,
+    EDIT,
+    MOVE,
+    RENAME,
+    EditJournal,
+    Operation,
+    apply_to_order,
+    describe_step,
+    group_operations,
+)
+from app.event_loop_monitor import EventLoopMonitor
 from app.icons import get_icon
-from app.settings import Settings
+from app.macro_expand import uses_arguments
+from app.macro_lint import Diagnostic
+from app.pattern_dialog import PatternDialog
+from app.platform_backend import PlatformBackend, default_backend
+from app.save_scheduler import SaveScheduler
+from app.settings import DEFAULT_FILE_FORMAT, SessionState, Settings
+from app.startup_profile import StartupProfile
+from app.theme_cache import ThemeCache
+from app.timings import TIMINGS
+
+SEARCH_INDEX_BATCH_SIZE = 2000
+REORDER_SAVE_DELAY_MS = 10_000
+"""The order of the aliases makes no difference to DOSKEY, so reorders are only journaled and written to the alias file
+after a longer delay (or on exit), together with any other changes."""
+LINT_DELAY_MS = 300
+"""How long to wait after the last key press before linting the alias being edited."""
+SETTINGS_SAVE_DELAY_MS = 1000
+"""How long to wait after the last change to the settings or the window (e.g. while resizing it) before saving them."""
+MAX_RESTORED_SELECTION = 1000
+"""The most selected aliases remembered for the next session. Larger selections only remember the current alias."""
+THEMES = ["light", "dark"]
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_profile: StartupProfile | None = None, backend: PlatformBackend | None = None):
+        """
+        Only the window shell is built here so it can be shown as soon as possible. The aliases are loaded and the theme
+        is applied once the window has been shown.
+
+        Args:
+            startup_profile (StartupProfile | None): Records the startup phase timings, if enabled.
+            backend (PlatformBackend | None): The registry, paths and file manager to use. Defaults to those of this
+                platform.
+        """
         super().__init__()
+        self.startup_profile = startup_profile
+        self._started = False
         self._set_title("Aliasaurus")
-        self.resize(600, 400)
         logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
         self.setWindowIcon(get_icon("logo_32x32.png"))
 
-        self.settings = Settings()
+        self.backend = default_backend() if backend is None else backend
+        self.paths = self.backend.paths()
+        # Changes to the settings and the session state are written together, shortly after the last one.
+        self._settings_timer = QTimer(self)
+        self._settings_timer.setSingleShot(True)
+        self._settings_timer.setInterval(SETTINGS_SAVE_DELAY_MS)
+        self._settings_timer.timeout.connect(self._save_settings)
+        self.settings = Settings(path=self.paths.settings, on_change=self._schedule_settings_save)
         self.settings.load()
+        self._session_restored = False
+        """Whether the selection of the last session has been restored, after which the current one is remembered."""
+        if not self.restoreGeometry(_decode_state(self.settings.session.window_geometry)):
+            self.resize(600, 400)
+        self.theme_cache = ThemeCache(self.paths.theme_cache)
+        if self.settings.record_timings:
+            self._record_timings(True)
+        # Started once the aliases are loaded, so the startup itself doesn't count as a stall.
+        self.event_loop_monitor = EventLoopMonitor(parent=self)
+
+        if self.settings.file_format not in FILE_FORMATS:
+            self.settings.set_file_format(DEFAULT_FILE_FORMAT)
+        self.alias_file = AliasFile(
+            self.settings.file_format,
+            defer_setup=True,
+            backend=self.backend,
+            shell_exports=self.settings.shell_exports,
+        )
+        # Shared with the list and the editor, so there is one copy of each alias.
+        self.aliases = AliasStore()
+
+        self.search_index = AliasSearchIndex()
+        self._unindexed_names = iter([])
+        self._search_index_timer = QTimer(self)
+        self._search_index_timer.timeout.connect(self._index_next_batch)
+
+        self.save_scheduler = SaveScheduler(self.alias_file, self._snapshot, parent=self)
+        self.save_status = QLabel()
+        self.save_scheduler.saving.connect(lambda: self.save_status.setText("Saving..."))
+        self.save_scheduler.saved.connect(lambda: self.save_status.setText("Saved"))
+        self.save_scheduler.failed.connect(self._on_save_failed)
+
+        # Started once the aliases are loaded. Checks are postponed while this app is writing the files.
+        self.alias_watcher = AliasWatcher(
+            self.paths.alias_cmd,
+            [self.paths.macrofile],
+            lambda: not self.save_scheduler.is_idle(),
+            self.backend.expand,
+            self.alias_file.group_paths,
+            parent=self,
+        )
+        self.alias_watcher.reindexed.connect(self.aliases.set_index)
+        self.alias_watcher.changed_externally.connect(self._on_external_changes)
+        # After every write, not only the last of a burst, or the next check would take this app's write for another
+        # program's.
+        self.save_scheduler.written.connect(self.alias_watcher.acknowledge_written)
 
-        self.alias_file = AliasFile()
-        self.aliases = self.alias_file.decode()
+        self.journal = EditJournal(self.paths.journal, self.alias_file.saved_paths)
+        self._journal_position = 0
+        self.save_scheduler.saved.connect(lambda: self.journal.checkpoint(self._journal_position))
 
         self.alias_edit = AliasEdit()
         self.alias_edit.unsaved_changes.connect(self._on_unsaved_changes)
 
+        self.linter = AliasLinter(self.alias_file.file_format == FILE_FORMAT_INLINE, parent=self)
+        self.linter.edit_linted.connect(self._on_edit_linted)
+        self.linter.all_linted.connect(self._on_all_linted)
+        self._lint_timer = QTimer(self)
+        self._lint_timer.setSingleShot(True)
+        self._lint_timer.setInterval(LINT_DELAY_MS)
+        self._lint_timer.timeout.connect(self._lint_edit)
+        self.alias_edit.document.contentsChanged.connect(self._lint_timer.start)
+        self.alias_edit.name_edit.textChanged.connect(self._lint_timer.start)
+
         self.save_action = QAction("&Save", self)
         self.save_action.triggered.connect(self._on_save)
         self.save_action.setShortcut("Ctrl+S")
@@ -49,6 +179,15 @@ class MainWindow(QMainWindow):
         self.revert_action.triggered.connect(self._on_revert)
         self.revert_action.setShortcut("Ctrl+Z")
         self.revert_action.setEnabled(False)
+        # Ctrl+Z reverts unsaved edits. Once there are none, it undoes the last saved change instead.
+        self.undo_action = QAction("&Undo", self)
+        self.undo_action.triggered.connect(self._on_undo)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.setEnabled(False)
+        self.redo_action = QAction("Re&do", self)
+        self.redo_action.triggered.connect(self._on_redo)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.setEnabled(False)
         self.delete_action = QAction("&Delete", self)
         self.delete_action.triggered.connect(self._on_delete)
         self.delete_action.setShortcut("Delete")
@@ -56,9 +195,56 @@ class MainWindow(QMainWindow):
         self.new_action = QAction("&New", self)
         self.new_action.triggered.connect(self._on_new)
         self.new_action.setShortcut("Ctrl+N")
+        self.new_action.setEnabled(False)  # Until the aliases are loaded
         self.open_terminal_action = QAction(get_icon("terminal.png"), "Open &Terminal", self)
         self.open_terminal_action.triggered.connect(self._open_terminal)
         self.open_terminal_action.setShortcut("Ctrl+T")
+        self.run_action = QAction("&Run Selected Alias...", self)
+        self.run_action.triggered.connect(self._on_run)
+        self.run_action.setShortcut("F5")
+        self.run_action.setEnabled(False)
+        self.move_to_top_action = QAction("Move to &Top", self)
+        self.move_to_top_action.triggered.connect(lambda: self._on_move_selection(0))
+        self.move_to_top_action.setShortcut("Ctrl+Home")
+        self.move_to_bottom_action = QAction("Move to &Bottom", self)
+        self.move_to_bottom_action.triggered.connect(lambda: self._on_move_selection(None))
+        self.move_to_bottom_action.setShortcut("Ctrl+End")
+        self.move_to_position_action = QAction("Move to &Position...", self)
+        self.move_to_position_action.triggered.connect(self._on_move_selection_to_position)
+        for action in (self.move_to_top_action, self.move_to_bottom_action, self.move_to_position_action):
+            action.setEnabled(False)
+        # Listed when shown, as the groups change.
+        self.move_to_group_menu = QMenu("Move to &Group", self)
+        self.move_to_group_menu.aboutToShow.connect(self._update_move_to_group_menu)
+        self.move_to_group_menu.menuAction().setEnabled(False)
+        self.groups_menu = QMenu("&Groups", self)
+        self.groups_menu.aboutToShow.connect(self._update_groups_menu)
+        self.groups_menu.menuAction().setEnabled(False)  # Until the aliases are loaded
+        self.replace_action = QAction("Find and &Replace in Commands...", self)
+        self.replace_action.triggered.connect(self._on_find_replace)
+        self.replace_action.setShortcut("Ctrl+H")
+        self.replace_action.setEnabled(False)  # Until the aliases are loaded
+        self.rename_action = QAction("Rena&me by Pattern...", self)
+        self.rename_action.triggered.connect(self._on_rename_by_pattern)
+        self.rename_action.setEnabled(False)  # Until the aliases are loaded
+        self.lint_all_action = QAction("&Check All Aliases", self)
+        self.lint_all_action.triggered.connect(self._on_lint_all)
+        self.lint_all_action.setShortcut("Ctrl+Shift+L")
+        self.lint_all_action.setEnabled(False)  # Until the aliases are loaded
+        self.next_problem_action = QAction("Go to &Next Problem", self)
+        self.next_problem_action.triggered.connect(self._on_next_problem)
+        self.next_problem_action.setShortcut("F8")
+        self.next_problem_action.setEnabled(False)  # Until the aliases are loaded
+        self.import_action = QAction("&Import Aliases...", self)
+        self.import_action.triggered.connect(self._on_import)
+        self.import_action.setEnabled(False)  # Until the aliases are loaded
+        self.export_action = QAction("E&xport Aliases...", self)
+        self.export_action.triggered.connect(self._on_export)
+        self.export_action.setEnabled(False)  # Until the aliases are loaded
+        self.filter_action = QAction("&Filter", self)
+        self.filter_action.triggered.connect(self._on_filter)
+        self.filter_action.setShortcut("Ctrl+F")
+        self.addAction(self.filter_action)
 
         preferences_menu = QMenu("&Preferences", self)
         theme_action_group = QActionGroup(self)
@@ -75,12 +261,47 @@ class MainWindow(QMainWindow):
         dark_theme_action.triggered.connect(lambda: self._change_theme("dark"))
         light_theme_action.triggered.connect(lambda: self._change_theme("light"))
 
+        # The theme itself is applied once the window is shown.
         if self.settings.theme == "dark":
             dark_theme_action.setChecked(True)
-            self._change_theme("dark")
         else:  # Default to light theme
             light_theme_action.setChecked(True)
-            self._change_theme("light")
+            self.settings.theme = "light"
+
+        file_format_menu = QMenu("Alias &File Format", self)
+        file_format_action_group = QActionGroup(self)
+        file_format_action_group.setExclusive(True)
+
+        inline_format_action = file_format_action_group.addAction("Inline (one DOSKEY per alias)")
+        macrofile_format_action = file_format_action_group.addAction("Macro File (single DOSKEY)")
+        assert inline_format_action is not None
+        assert macrofile_format_action is not None
+        inline_format_action.setCheckable(True)
+        macrofile_format_action.setCheckable(True)
+        inline_format_action.setChecked(self.settings.file_format == FILE_FORMAT_INLINE)
+        macrofile_format_action.setChecked(self.settings.file_format == FILE_FORMAT_MACROFILE)
+        file_format_menu.addAction(inline_format_action)
+        file_format_menu.addAction(macrofile_format_action)
+        self.file_format_actions = {
+            FILE_FORMAT_INLINE: inline_format_action,
+            FILE_FORMAT_MACROFILE: macrofile_format_action,
+        }
+        preferences_menu.addSeparator()
+        preferences_menu.addMenu(file_format_menu)
+        inline_format_action.triggered.connect(lambda: self._change_file_format(FILE_FORMAT_INLINE))
+        macrofile_format_action.triggered.connect(lambda: self._change_file_format(FILE_FORMAT_MACROFILE))
+
+        # Copies of the aliases kept up to date for other shells, e.g. to source from a bash profile.
+        shell_exports_menu = QMenu("Shell E&xports", self)
+        for alias_format in FORMATS.values():
+            export_action = shell_exports_menu.addAction(alias_format.description)
+            assert export_action is not None
+            export_action.setCheckable(True)
+            export_action.setChecked(alias_format.name in self.settings.shell_exports)
+            export_action.toggled.connect(
+                lambda enabled, format_name=alias_format.name: self._change_shell_export(format_name, enabled)
+            )
+        preferences_menu.addMenu(shell_exports_menu)
 
         file_menu = QMenu("&File", self)
         file_menu.addAction(self.new_action)
@@ -88,49 +309,121 @@ class MainWindow(QMainWindow):
         file_menu.addAction(self.revert_action)
         file_menu.addAction(self.delete_action)
         file_menu.addSeparator()
-        file_menu.addAction("Create &Backup", self.alias_file.backup)
-        file_menu.addAction("&Open Alias Directory", self.alias_file.open)
+        file_menu.addAction(self.import_action)
+        file_menu.addAction(self.export_action)
+        file_menu.addSeparator()
+        file_menu.addAction("Create &Backup", self._on_backup)
+        file_menu.addAction("&Restore Backup...", self._on_restore_backup)
+        file_menu.addAction("&Open Alias Directory", lambda: self.alias_file.open())
         file_menu.addSeparator()
         file_menu.addMenu(preferences_menu)
         file_menu.addSeparator()
         file_menu.addAction("&Exit", self.close)
 
+        edit_menu = QMenu("&Edit", self)
+        edit_menu.addAction(self.undo_action)
+        edit_menu.addAction(self.redo_action)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.move_to_top_action)
+        edit_menu.addAction(self.move_to_bottom_action)
+        edit_menu.addAction(self.move_to_position_action)
+        edit_menu.addMenu(self.move_to_group_menu)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.replace_action)
+        edit_menu.addAction(self.rename_action)
+        edit_menu.addSeparator()
+        edit_menu.addAction(self.lint_all_action)
+        edit_menu.addAction(self.next_problem_action)
+        edit_menu.addSeparator()
+        # Listed when shown, as the recent aliases change.
+        self.recent_menu = QMenu("Recent &Aliases", self)
+        self.recent_menu.aboutToShow.connect(self._update_recent_menu)
+        edit_menu.addMenu(self.recent_menu)
+
+        self.run_pane = RunPane(self.backend, self)
+        self.run_pane.hide()
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.run_pane)
+        self._run_arguments: dict[str, str] = {}
+
         run_menu = QMenu("&Run", self)
+        run_menu.addAction(self.run_action)
+        run_menu.addAction(self.run_pane.toggleViewAction())
+        run_menu.addSeparator()
         run_menu.addAction(self.open_terminal_action)
 
         help_menu = QMenu("&Help", self)
+        help_menu.addAction("&Diagnostics", self._show_diagnostics)
         help_menu.addAction("&About", self._show_about)
 
         menu_bar = QMenuBar()
         menu_bar.addMenu(file_menu)
+        menu_bar.addMenu(edit_menu)
+        menu_bar.addMenu(self.groups_menu)
         menu_bar.addMenu(run_menu)
         menu_bar.addMenu(help_menu)
         self.setMenuBar(menu_bar)
 
         tool_bar = QToolBar()
+        tool_bar.setObjectName("tool_bar")
         tool_bar.addAction(self.new_action)
         tool_bar.addAction(self.save_action)
         tool_bar.addAction(self.revert_action)
         tool_bar.addAction(self.delete_action)
         tool_bar.addSeparator()
+        tool_bar.addAction(self.run_action)
         tool_bar.addAction(self.open_terminal_action)
         self.addToolBar(tool_bar)
 
         context_menu = QMenu(self)
         context_menu.addAction(self.new_action)
         context_menu.addAction(self.delete_action)
+        context_menu.addSeparator()
+        context_menu.addAction(self.move_to_top_action)
+        context_menu.addAction(self.move_to_bottom_action)
+        context_menu.addAction(self.move_to_position_action)
+        context_menu.addMenu(self.move_to_group_menu)
+        context_menu.addAction(self.rename_action)
 
-        self.alias_list = AliasList(context_menu)
+        self.alias_list = AliasList(context_menu, self.aliases)
         self.alias_list.alias_selected.connect(self._on_alias_selected)
-        self.alias_list.order_changed.connect(self._save)
-        self.alias_list.populate(list(self.aliases.keys()))
+        self.alias_list.selection_size_changed.connect(self._on_selection_size_changed)
+        self.alias_list.aliases_moved.connect(self._on_aliases_moved)
+        self.alias_list.collapsed_changed.connect(self.settings.set_collapsed_groups)
+        self.linter.aliases_linted.connect(self.alias_list.set_diagnostics)
+        self.alias_filter = AliasFilter(self.alias_list, self.search_index)
 
-        splitter = QSplitter(Qt.Orientation.Horizontal)
-        splitter.addWidget(self.alias_list)
-        splitter.addWidget(self.alias_edit)
-        splitter.setSizes([200, 400])
+        self.splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.splitter.addWidget(self.alias_filter)
+        self.splitter.addWidget(self.alias_edit)
+        if not self.splitter.restoreState(_decode_state(self.settings.session.splitter_state)):
+            self.splitter.setSizes([200, 400])
+        # The docked panes, e.g. whether the output pane is open.
+        self.restoreState(_decode_state(self.settings.session.window_state))
 
-        self.setCentralWidget(splitter)
+        # Remember where the user is, so the next session can pick up from there.
+        self.splitter.splitterMoved.connect(self._schedule_settings_save)
+        self.alias_list.selection_size_changed.connect(self._schedule_settings_save)
+        self.alias_list.verticalScrollBar().valueChanged.connect(self._schedule_settings_save)
+        self.alias_filter.filter_edit.textChanged.connect(self._schedule_settings_save)
+
+        self.setCentralWidget(self.splitter)
+        self.statusBar().addPermanentWidget(self.save_status)
+        self._mark_startup("window built")
+
+    def showEvent(self, event: QShowEvent):
+        super().showEvent(event)
+        if not self._started:
+            self._started = True
+            # Let the window paint before doing the slow parts of startup.
+            QTimer.singleShot(0, self._load_aliases)
+
+    def resizeEvent(self, event: QResizeEvent):
+        super().resizeEvent(event)
+        self._schedule_settings_save()
+
+    def moveEvent(self, event: QMoveEvent):
+        super().moveEvent(event)
+        self._schedule_settings_save()
 
     def closeEvent(self, event: QCloseEvent):
         if self.alias_edit.has_unsaved_changes:
@@ -146,11 +439,148 @@ class MainWindow(QMainWindow):
             )
             if reply == QMessageBox.StandardButton.Save:
                 self._on_save()
-                event.accept()
-            elif reply == QMessageBox.StandardButton.Discard:
-                event.accept()
-            else:
+            elif reply != QMessageBox.StandardButton.Discard:
                 event.ignore()
+                return
+        # Make sure every change is in the alias file before exiting.
+        if self.save_scheduler.flush():
+            self.journal.checkpoint(self._journal_position)
+        self.journal.flush()
+        self.alias_watcher.stop()
+        self.linter.shutdown()
+        self.run_pane.cancel_all()
+        self.event_loop_monitor.stop()
+        TIMINGS.stop_recording()
+        self._save_settings()
+        event.accept()
+
+    def _load_aliases(self):
+        """Set up the alias file and load the aliases into the list, then apply the theme."""
+        self._mark_startup("window shown")
+        self.alias_file.setup()
+        alias_index = self._reload_aliases()
+        self.new_action.setEnabled(True)
+        self.replace_action.setEnabled(True)
+        self.rename_action.setEnabled(True)
+        self.lint_all_action.setEnabled(True)
+        self.next_problem_action.setEnabled(True)
+        self.import_action.setEnabled(True)
+        self.export_action.setEnabled(True)
+        self.groups_menu.menuAction().setEnabled(True)
+        self.alias_watcher.start(alias_index)
+        self.event_loop_monitor.start()
+        self._replay_journal()
+        self._restore_session()
+        self._mark_startup("aliases loaded")
+        QTimer.singleShot(0, self._apply_initial_theme)
+
+    def _reload_aliases(self) -> AliasIndex:
+        """Load the aliases from the alias file, replacing any that are loaded. Unsaved edits are discarded.
+
+        Returns:
+            AliasIndex: The index the aliases were loaded from.
+        """
+        selected_alias = self.alias_edit.selected_alias
+        # Only the names are read, the commands of each alias are decoded the first time it is needed.
+        alias_index = self.alias_file.index()
+        self.alias_list.clear_diagnostics()
+        self.alias_list.set_groups(self.alias_file.groups, self.settings.collapsed_groups)
+        self.alias_list.populate(alias_index, self.alias_file.memberships(alias_index))
+        if alias_index.issues:
+            self.statusBar().showMessage(
+                f"{len(alias_index.issues)} problem(s) found in the alias file, see the log for details."
+            )
+
+        # The names are searchable straight away, the commands are indexed and linted in the background in batches.
+        self.search_index = AliasSearchIndex()
+        self.search_index.add_names(alias_index.names())
+        self.alias_filter.search_index = self.search_index
+        self.alias_filter.refresh()
+        self._unindexed_names = iter(alias_index.names())
+        self._search_index_timer.start(0)
+
+        if selected_alias in alias_index:
+            self.alias_list.select(selected_alias)
+        else:
+            self._on_alias_selected("")
+
+    def _restore_session(self):
+        """Select the aliases and filter that were selected when the app was closed, scrolled to where the list was."""
+        session = self.settings.session
+        selected = [name for name in session.selected_aliases if name in self.aliases]
+        if selected:
+            self.alias_list.select_names(selected)
+        if session.top_alias in self.aliases:
+            self.alias_list.scroll_to_top(session.top_alias)
+        elif selected:
+            self.alias_list.scrollTo(self.alias_list.currentIndex())
+        self.alias_filter.filter_edit.setText(session.filter_text)
+        self._session_restored = True
+
+    def _schedule_settings_save(self, *_args):
+        """Save the settings and where the user is once they stop changing them, e.g. after resizing the window."""
+        self._settings_timer.start()
+
+    def _save_settings(self):
+        if self._session_restored:
+            self.settings.set_session(self._session_state())
+        # Saving the session state schedules another save, which isn't needed.
+        self._settings_timer.stop()
+        self.settings.flush()
+
+    def _session_state(self) -> SessionState:
+        """Get where the user is, to pick up from there in the next session."""
+        if self.alias_list.selection_size() <= MAX_RESTORED_SELECTION:
+            selected = self.alias_list.selected_names()
+        else:
+            selected = [self.alias_edit.selected_alias] if self.alias_edit.selected_alias else []
+        return SessionState(
+            window_geometry=_encode_state(self.saveGeometry()),
+            window_state=_encode_state(self.saveState()),
+            splitter_state=_encode_state(self.splitter.saveState()),
+            selected_aliases=tuple(selected),
+            top_alias=self.alias_list.top_name() or "",
+            filter_text=self.alias_filter.filter_edit.text(),
+        )
+
+    def _update_recent_menu(self):
+        self.recent_menu.clear()
+        recent = [name for name in self.settings.recent_aliases if name in self.aliases]
+        for name in recent:
+            action = self.recent_menu.addAction(name)
+            assert action is not None
+            action.triggered.connect(lambda _checked, name=name: self._go_to_alias(name))
+        if not recent:
+            empty_action = self.recent_menu.addAction("No recent aliases")
+            assert empty_action is not None
+            empty_action.setEnabled(False)
+
+    def _go_to_alias(self, name: str):
+        if name in self.aliases:
+            # Show the full list so the alias is visible.
+            self.alias_filter.clear()
+            self.alias_list.select(name)
+
+    def _replay_journal(self):
+        """Restore the undo history, and apply any changes that did not reach the alias file before the app exited."""
+        steps = self.journal.load()
+        for step in steps:
+            self._apply_operations(step)
+        if steps:
+            self.statusBar().showMessage(f"Recovered {len(steps)} change(s) that had not been saved to the alias file.")
+        self._update_undo_actions()
+
+    def _apply_initial_theme(self):
+        self._change_theme(self.settings.theme)
+        self._mark_startup("theme applied")
+        # So switching theme later is instant.
+        self.theme_cache.preload(THEMES)
+        if self.startup_profile is not None:
+            self.startup_profile.report(os.path.join(self.paths.directory, "startup_profile.json"))
+
+    def _mark_startup(self, phase: str):
+        if self.startup_profile is not None:
+            self.startup_profile.mark(phase)
 
     def _set_title(self, title: str):
         self.title = title
@@ -158,81 +588,813 @@ class MainWindow(QMainWindow):
 
     def _show_about(self):
         """Show the about dialog."""
+        # Rarely used, so only imported when needed.
+        from app.about_dialog import AboutDialog
+
         about_dialog = AboutDialog()
         about_dialog.exec_()
 
+    def _show_diagnostics(self):
+        # Rarely used, so only imported when needed.
+        from app.diagnostics_dialog import DiagnosticsDialog
+
+        log_name, trace_name = os.path.basename(self.paths.timing_log), os.path.basename(self.paths.timing_trace)
+        recording_description = f"{log_name} and a Chrome trace ({trace_name})"
+        dialog = DiagnosticsDialog(TIMINGS, self._diagnostic_statistics, recording_description, self)
+        dialog.record_check.toggled.connect(self._on_record_timings)
+        dialog.exec_()
+
+    def _diagnostic_statistics(self) -> list[tuple[str, str]]:
+        """Get statistics about the aliases and the app for the diagnostics."""
+        from app.version import __version__
+
+        def size(path: str) -> str:
+            try:
+                return f"{os.path.getsize(path) / 1024:,.1f} KiB"
+            except OSError:
+                return "missing"
+
+        running = sum(run.running for run in self.run_pane.runs())
+        groups = self.alias_file.groups
+        autoload = sum(group.autoload for group in groups)
+        return [
+            ("Aliases", f"{len(self.aliases):,}"),
+            ("Alias file format", self.alias_file.file_format),
+            ("Alias file", size(self.paths.alias_cmd)),
+            ("Macro file", size(self.paths.macrofile)),
+            ("Alias groups", f"{len(groups)} ({autoload} loaded at startup)" if groups else "none"),
+            ("Edit journal", size(self.paths.journal)),
+            ("Backups", str(len(self.alias_file.backups.snapshots()))),
+            ("Shell exports", ", ".join(self.alias_file.exports.formats) or "none"),
+            ("Save pending", "no" if self.save_scheduler.is_idle() else "yes"),
+            ("Aliases running", str(running)),
+            ("Event loop stalls", str(self.event_loop_monitor.stall_count)),
+            ("Version", f"{__version__} ({self.backend.name} backend)"),
+            ("Python and Qt", f"{platform.python_version()}, {QT_VERSION_STR}"),
+        ]
+
+    def _on_record_timings(self, enabled: bool):
+        self._record_timings(enabled)
+        self.settings.set_record_timings(TIMINGS.is_recording())
+
+    def _record_timings(self, enabled: bool):
+        """Start or stop recording the timings to the timing log and Chrome trace in the app directory."""
+        if not enabled:
+            TIMINGS.stop_recording()
+            return
+        try:
+            TIMINGS.start_recording(self.paths.timing_log, self.paths.timing_trace)
+        except OSError as error:
+            logging.warning(f"Failed to start recording timings: {error}")
+
     def _on_alias_selected(self, name: str):
-        something_selected = bool(name)
-        self.delete_action.setEnabled(something_selected)
-        if something_selected:
+        with TIMINGS.span("select alias"):
+            self._show_alias(name)
+        self.run_action.setEnabled(bool(name))
+
+    def _show_alias(self, name: str):
+        if name:
             assert name in self.aliases
-            self.alias_edit.set(name, self.aliases[name])
+            self.alias_edit.set(name, self.aliases.text(name))
+            # Show the problems found while linting the saved alias until the editor has been linted.
+            self.alias_edit.set_diagnostics(self.alias_list.diagnostics(name))
             self._set_title(f"Aliasaurus - {name}")
         else:
             self.alias_edit.clear()
             self._set_title("Aliasaurus")
 
+    def _on_selection_size_changed(self, size: int):
+        for action in (
+            self.delete_action,
+            self.move_to_top_action,
+            self.move_to_bottom_action,
+            self.move_to_position_action,
+            self.move_to_group_menu.menuAction(),
+        ):
+            action.setEnabled(size > 0)
+        if size > 1:
+            self.statusBar().showMessage(f"{size} aliases selected.")
+
     def _on_unsaved_changes(self, unsaved: bool):
         """Update the save and revert actions based on unsaved changes."""
         self.save_action.setEnabled(unsaved)
         self.revert_action.setEnabled(unsaved)
+        self._update_undo_actions()
         self.setWindowTitle(f"{self.title}{'*' if unsaved else ''}")
 
     def _on_save(self):
         """Save the current alias."""
         old_name, new_name, commands = self.alias_edit.get()
+        previous = self.aliases[old_name]
+        step = []
         if new_name != old_name:
             # Make sure we haven't changed the alias name to something that already exists
             if new_name in self.aliases:
                 QMessageBox.warning(self, "Duplicate Alias", "An alias with this name already exists.")
                 return
+            step.append(Operation(RENAME, old_name, new_name=new_name))
             self.alias_list.update(old_name, new_name)
-            self.aliases.pop(old_name)
-        self.alias_edit.set(new_name, commands)
-        self.aliases[new_name] = commands
-        self._save()
+            self.settings.rename_recent_alias(old_name, new_name)
+            self.search_index.remove(old_name)
+            self.search_index.add(new_name)
+        if commands != previous:
+            step.append(Operation(EDIT, new_name, commands=commands, previous=previous))
+            self.aliases.set_commands(new_name, commands)
+        self.alias_edit.set(new_name, self.aliases.text(new_name))
+        self.search_index.set_commands(new_name, commands)
+        self.settings.add_recent_alias(new_name)
+        self.alias_filter.refresh()
+        self._record(step)
 
     def _on_revert(self):
         """Revert the current alias."""
         self.alias_edit.revert()
 
     def _on_delete(self):
-        """Delete the current alias."""
-        selected_alias, _, _ = self.alias_edit.get()
-        reply = QMessageBox.question(
-            self, "Delete Alias", f"Are you sure you want to delete the alias '{selected_alias}'?"
-        )
+        """Delete the selected aliases."""
+        names = self.alias_list.selected_names()
+        if not names:
+            return
+        if len(names) == 1:
+            question = f"Are you sure you want to delete the alias '{names[0]}'?"
+        else:
+            question = f"Are you sure you want to delete the {len(names)} selected aliases?"
+        reply = QMessageBox.question(self, "Delete Alias", question)
         if reply == QMessageBox.StandardButton.Yes:
-            self.aliases.pop(selected_alias)
-            self.alias_list.remove(selected_alias)
-            self._save()
+            order = self.alias_list.get_all_in_order()
+            self._commit(delete_operations(order, names, self.aliases, self.aliases.group))
 
     def _on_new(self):
-        """Create a new alias."""
+        """Create a new alias at the end of the group of the current alias."""
         suffix = 1
         while f"alias{suffix}" in self.aliases:
             suffix += 1
         new_alias = f"alias{suffix}"
-        self.aliases[new_alias] = ["echo Implement me!"]
-        self.alias_list.add(new_alias)
-        self._save()
-
-    def _save(self):
-        """Save the aliases to the file."""
-        in_list_order = self.alias_list.get_all_in_order()
-        assert set(in_list_order) == set(self.aliases.keys())
-        self.aliases = {name: self.aliases[name] for name in in_list_order}
-        self.alias_file.encode(self.aliases)
+        commands = ["echo Implement me!"]
+        self.search_index.add(new_alias, commands)
+        # Show the full list so the new alias is visible.
+        self.alias_filter.clear()
+        group = self.alias_list.current_group()
+        self.alias_list.add(new_alias, commands, group)
+        self._record([Operation(ADD, new_alias, self.alias_list.row(new_alias), commands, group=group)])
+        self.settings.add_recent_alias(new_alias)
+
+    def _on_aliases_moved(self, moves: list[tuple[str, int, int, str, str]]):
+        self._record(
+            [
+                Operation(MOVE, name, position=new_row, previous=old_row, group=new_group, previous_group=old_group)
+                for name, old_row, new_row, old_group, new_group in moves
+            ]
+        )
+
+    def _on_move_selection(self, position: int | None, group: str | None = None):
+        """Move the selected aliases together to a position in a group.
+
+        Args:
+            position (int | None): The position among the other aliases of the group, or None for its end.
+            group (str | None): The group to move them to. Defaults to the group of the first selected alias.
+        """
+        names = self.alias_list.selected_names()
+        if not names:
+            return
+        group = self.aliases.group(names[0]) if group is None else group
+        row = self._position_in_group(group, names, position)
+        step = move_operations(self.alias_list.get_all_in_order(), names, row, group, self.aliases.group)
+        if step:
+            self._commit(step)
+            self.alias_list.scrollTo(self.alias_list.currentIndex())
+
+    def _on_move_selection_to_position(self):
+        names = self.alias_list.selected_names()
+        if not names:
+            return
+        group = self.aliases.group(names[0])
+        count = self.aliases.group_size(group)
+        label = f"Position in {group_label(group)}" if self.alias_file.groups else "Position"
+        position, ok = QInputDialog.getInt(self, "Move to Position", f"{label} (1 to {count}):", 1, 1, count)
+        if ok:
+            self._on_move_selection(position - 1)
+
+    def _position_in_group(self, group: str, names: list[str], position: int | None) -> int:
+        """Get the row to move aliases to, from their position among the other aliases of a group.
+
+        Args:
+            group (str): The group to move the aliases to.
+            names (list[str]): The aliases to move.
+            position (int | None): The position among the other aliases of the group, or None for its end.
+
+        Returns:
+            int: The row of the first moved alias, among the aliases that are not moved.
+        """
+        start, end = self.aliases.group_range(group)
+        rows = [self.aliases.row(name) for name in names]
+        others = end - start - sum(start <= row < end for row in rows)
+        offset = others if position is None else max(0, min(position, others))
+        return start - sum(row < start for row in rows) + offset
+
+    def _update_move_to_group_menu(self):
+        self.move_to_group_menu.clear()
+        for group in self.aliases.groups:
+            action = self.move_to_group_menu.addAction(group_label(group))
+            assert action is not None
+            action.triggered.connect(lambda _checked, group=group: self._on_move_selection(None, group))
+        self.move_to_group_menu.addSeparator()
+        self.move_to_group_menu.addAction("&New Group...", lambda: self._on_new_group(move_selection=True))
+
+    def _update_groups_menu(self):
+        self.groups_menu.clear()
+        self.groups_menu.addAction("&New Group...", self._on_new_group)
+        self.groups_menu.addMenu(self.move_to_group_menu)
+        self.groups_menu.addSeparator()
+        autoload_menu = self.groups_menu.addMenu("Load at &Startup")
+        assert autoload_menu is not None
+        for group in self.alias_file.groups:
+            action = autoload_menu.addAction(group.name)
+            assert action is not None
+            action.setCheckable(True)
+            action.setChecked(group.autoload)
+            action.toggled.connect(lambda enabled, name=group.name: self._on_autoload_group(name, enabled))
+        autoload_menu.setEnabled(bool(self.alias_file.groups))
+        delete_action = self.groups_menu.addAction("&Delete Group...", self._on_delete_group)
+        assert delete_action is not None
+        delete_action.setEnabled(bool(self.alias_file.groups))
+
+    def _on_new_group(self, move_selection: bool = False):
+        """Create a named group, which is loaded on demand until it is set to load at startup.
+
+        Args:
+            move_selection (bool): Move the selected aliases to the new group.
+        """
+        name, ok = QInputDialog.getText(self, "New Group", "Group name (letters, digits, '-' and '_'):")
+        if not ok:
+            return
+        name = name.strip()
+        try:
+            check_group_name(name, self.alias_file.groups)
+        except ValueError as error:
+            QMessageBox.warning(self, "New Group", str(error))
+            return
+        selected = self.alias_list.selected_names()
+        if self._set_groups([*self.alias_file.groups, AliasGroup(name)]):
+            self.alias_list.select_names(selected)
+            if move_selection:
+                self._on_move_selection(None, name)
+            self.statusBar().showMessage(f"Created the group {name}, load it with: aliasaurus load {name}", 10000)
+
+    def _on_autoload_group(self, name: str, enabled: bool):
+        """Load a group at startup, or only on demand."""
+        groups = self.alias_file.groups
+        self._set_groups([group._replace(autoload=enabled) if group.name == name else group for group in groups])
+
+    def _on_delete_group(self):
+        """Delete a named group. Its aliases are moved to the core group first, as one undo step."""
+        names = [group.name for group in self.alias_file.groups]
+        name, ok = QInputDialog.getItem(self, "Delete Group", "Group to delete:", names, editable=False)
+        if not ok:
+            return
+        start, end = self.aliases.group_range(name)
+        members = self.alias_list.get_all_in_order()[start:end]
+        if members:
+            reply = QMessageBox.question(
+                self,
+                "Delete Group",
+                f"Move the {len(members)} aliases of {name} to {group_label(CORE_GROUP)} and delete the group?",
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            self.alias_list.select_names(members)
+            self._on_move_selection(None, CORE_GROUP)
+        self._set_groups([group for group in self.alias_file.groups if group.name != name])
+
+    def _set_groups(self, groups: list[AliasGroup]) -> bool:
+        """Change the named groups, writing the group manifest and macro files straight away.
+
+        Returns:
+            bool: Whether the groups were changed. Errors are reported to the user.
+        """
+        # The groups are written on this thread, so finish any write of the aliases first.
+        self.save_scheduler.flush()
+        try:
+            self.alias_file.set_groups(groups)
+        except OSError as error:
+            QMessageBox.warning(self, "Groups", f"The groups could not be saved:\n{error}")
+            return False
+        self.alias_list.set_groups(groups, self.alias_list.collapsed_groups())
+        # So alias.cmd loads the groups it should.
+        self.save_scheduler.schedule()
+        return True
+
+    def _on_find_replace(self):
+        """Find and replace text in the commands of the selected aliases, or of every alias."""
+        if not self._check_no_unsaved_edits():
+            return
+        # Every alias may be searched, so decode them all at once rather than one by one.
+        self.aliases.load(self.aliases)
+
+        def operations(dialog: PatternDialog) -> list[Operation]:
+            names = self._pattern_targets(dialog)
+            return replace_operations(self.aliases, names, dialog.find_text(), dialog.replacement(), dialog.is_regex())
+
+        step = self._ask_pattern("Find and Replace in Commands", operations)
+        if step:
+            self._commit(step)
+            self.statusBar().showMessage(f"Replaced text in {len(step)} alias(es).", 5000)
+
+    def _on_rename_by_pattern(self):
+        """Rename the selected aliases, or every alias, by replacing part of their names."""
+        if not self._check_no_unsaved_edits():
+            return
+
+        def operations(dialog: PatternDialog) -> list[Operation]:
+            names = self._pattern_targets(dialog)
+            return rename_operations(self.aliases, names, dialog.find_text(), dialog.replacement(), dialog.is_regex())
+
+        step = self._ask_pattern("Rename by Pattern", operations)
+        if step:
+            self._commit(step)
+            self.statusBar().showMessage(f"Renamed {len(step)} alias(es).", 5000)
+
+    def _ask_pattern(self, title: str, operations: Callable[[PatternDialog], list[Operation]]) -> list[Operation]:
+        """Ask for a find and replace pattern, previewing the operations it would make. Returns the operations to
+        apply, or an empty list if cancelled."""
+
+        def preview(dialog: PatternDialog) -> tuple[str, bool]:
+            try:
+                step = operations(dialog)
+            except re.error as error:
+                return f"Invalid pattern: {error}", False
+            except ValueError as error:
+                return str(error), False
+            return f"{len(step)} alias(es) will change.", bool(step)
+
+        dialog = PatternDialog(title, self.alias_list.selection_size(), preview, self)
+        if not dialog.exec_():
+            return []
+        try:
+            return operations(dialog)
+        except (re.error, ValueError) as error:
+            # The aliases may have changed since the preview, e.g. merged from another program.
+            QMessageBox.warning(self, title, str(error))
+            return []
+
+    def _on_import(self):
+        """Import aliases from a file of another shell or format, resolving name conflicts in one go."""
+        if not self._check_no_unsaved_edits():
+            return
+        filters = _file_filters()
+        path, selected_filter = QFileDialog.getOpenFileName(self, "Import Aliases", "", ";;".join(filters))
+        if not path:
+            return
+        alias_format = filters.get(selected_filter) or format_for_path(path) or FORMATS[FORMAT_DOSKEY]
+        try:
+            with open(path, encoding="utf-8-sig", errors="replace") as file:
+                imported, issues = read_aliases(file, path, alias_format)
+        except OSError as error:
+            QMessageBox.warning(self, "Import Failed", f"The aliases could not be imported:\n{error}")
+            return
+        existing = [name for name in imported if name in self.aliases]
+        self.aliases.load(existing)
+        conflicts = sum(self.aliases[name] != imported[name] for name in existing)
+        policy = CONFLICT_SKIP
+        if conflicts:
+            labels = {
+                "Keep the existing aliases": CONFLICT_SKIP,
+                "Overwrite the existing aliases": CONFLICT_OVERWRITE,
+                "Import them with a new name": CONFLICT_RENAME,
+            }
+            label, ok = QInputDialog.getItem(
+                self,
+                "Import Aliases",
+                f"{conflicts} of the imported aliases already exist with different commands.",
+                list(labels),
+                editable=False,
+            )
+            if not ok:
+                return
+            policy = labels[label]
+        plan = plan_import(imported, self.aliases, policy, issues)
+        # Imported aliases are added to the end of the core group.
+        end = self.aliases.group_range(CORE_GROUP)[1]
+        step = [Operation(ADD, name, end + row, commands) for row, (name, commands) in enumerate(plan.added.items())]
+        step += [
+            Operation(EDIT, name, commands=commands, previous=self.aliases[name])
+            for name, commands in plan.overwritten.items()
+        ]
+        # Show the full list so the imported aliases are visible.
+        self.alias_filter.clear()
+        self._commit(step)
+        summary, *details = plan.report.describe()
+        message = QMessageBox(
+            QMessageBox.Icon.Information,
+            "Import Aliases",
+            f"Imported from {path}:\n{summary}",
+            QMessageBox.StandardButton.Ok,
+            self,
+        )
+        if details:
+            message.setDetailedText("\n".join(details))
+        message.exec_()
+
+    def _on_export(self):
+        """Export the saved aliases to a file of another shell or format."""
+        filters = _file_filters()
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Export Aliases", "", ";;".join(filters))
+        if not path:
+            return
+        alias_format = format_for_path(path) or filters.get(selected_filter) or FORMATS[FORMAT_DOSKEY]
+        try:
+            count = export_aliases(self.aliases.snapshot().items(), path, alias_format)
+        except OSError as error:
+            QMessageBox.warning(self, "Export Failed", f"The aliases could not be exported:\n{error}")
+            return
+        self.statusBar().showMessage(f"Exported {count} aliases to {path}.", 5000)
+
+    def _pattern_targets(self, dialog: PatternDialog) -> list[str]:
+        return self.alias_list.selected_names() if dialog.selected_only() else self.alias_list.get_all_in_order()
+
+    def _check_no_unsaved_edits(self) -> bool:
+        if self.alias_edit.has_unsaved_changes:
+            QMessageBox.information(self, "Unsaved Changes", "Save or revert the alias you are editing first.")
+            return False
+        return True
+
+    def _on_undo(self):
+        """Undo the last change that was saved."""
+        description = describe_step(self.journal.peek_undo())
+        self._apply_operations(self.journal.undo())
+        self.statusBar().showMessage(f"Undid {description}.", 5000)
+
+    def _on_redo(self):
+        """Redo the last change that was undone."""
+        step = self.journal.redo()
+        self._apply_operations(step)
+        self.statusBar().showMessage(f"Redid {describe_step(step)}.", 5000)
+
+    def _commit(self, step: list[Operation]):
+        """Apply a change made of several operations as one undo step, with a single write of the alias file."""
+        if step:
+            self.journal.record(step)
+            self._apply_operations(step)
+
+    def _record(self, step: list[Operation]):
+        """Journal a change as one undo step and schedule a save of the aliases."""
+        if not step:
+            self._save()
+            return
+        self.journal.record(step)
+        self._update_undo_actions()
+        self._lint_step(step)
+        self._save(reorder_only=_is_reorder(step))
+
+    def _apply_operations(self, step: list[Operation]):
+        """Apply journaled operations to the aliases, e.g. to undo or redo a change, and schedule a save.
+
+        Operations that no longer apply, because another program changed the aliases since, are skipped.
+        """
+        for group in group_operations(step):
+            if len(group) > 1 and group[0].kind != EDIT:
+                self._apply_group(group)
+                continue
+            for operation in group:
+                if not self._apply_operation(operation):
+                    logging.warning(f"Skipped a change that no longer applies: {operation.describe()}")
+        self.alias_filter.refresh()
+        self._update_undo_actions()
+        self._lint_step(step)
+        self._save(reorder_only=_is_reorder(step))
+
+    def _apply_group(self, group: list[Operation]):
+        """Apply many operations of the same kind with one update of the list."""
+        order = apply_to_order(self.alias_list.get_all_in_order(), group)
+        if order is None:
+            logging.warning(f"Skipped {len(group)} changes that no longer apply, starting with {group[0].describe()}")
+            return
+        kind = group[0].kind
+        selected = self.alias_list.selected_names()
+        added = {}
+        # The store puts aliases of groups that no longer exist in the core group.
+        groups = {operation.name: operation.group for operation in group if kind in (ADD, MOVE)}
+        for operation in group:
+            name = operation.name
+            if kind == ADD and operation.commands is not None:
+                added[name] = operation.commands
+                self.search_index.add(name, operation.commands)
+                selected.append(name)
+            elif kind == DELETE:
+                self.search_index.remove(name)
+            elif kind == RENAME:
+                # Renamed in place, so the list keeps its selection.
+                self.aliases.rename(name, operation.new_name)
+                self.settings.rename_recent_alias(name, operation.new_name)
+                self.search_index.remove(name)
+                self.search_index.add(operation.new_name, self.aliases[operation.new_name])
+        self.alias_list.set_names(order, added, groups)
+        if kind in (ADD, DELETE):
+            # The list was rebuilt, so select the same aliases again.
+            self.alias_list.select_names([name for name in selected if name in self.aliases])
+
+    def _apply_operation(self, operation: Operation) -> bool:
+        name = operation.name
+        if operation.kind == ADD:
+            if name in self.aliases or operation.commands is None:
+                return False
+            self.alias_list.insert(operation.position, name, operation.commands, self._known_group(operation.group))
+            self.search_index.add(name, operation.commands)
+            return True
+        if name not in self.aliases:
+            return False
+        if operation.kind == DELETE:
+            self.alias_list.remove(name)
+            self.search_index.remove(name)
+        elif operation.kind == RENAME:
+            if operation.new_name in self.aliases:
+                return False
+            self.alias_list.update(name, operation.new_name)
+            self.settings.rename_recent_alias(name, operation.new_name)
+            self.search_index.remove(name)
+            self.search_index.add(operation.new_name, self.aliases[operation.new_name])
+            if self.alias_edit.selected_alias == name:
+                self.alias_edit.set(operation.new_name, self.aliases.text(operation.new_name))
+                self._set_title(f"Aliasaurus - {operation.new_name}")
+        elif operation.kind == EDIT:
+            if operation.commands is None:
+                return False
+            self.aliases.set_commands(name, operation.commands)
+            self.search_index.set_commands(name, operation.commands)
+            if self.alias_edit.selected_alias == name:
+                self.alias_edit.set(name, self.aliases.text(name))
+        elif operation.kind == MOVE:
+            self.alias_list.move(name, operation.position, self._known_group(operation.group))
+        return True
+
+    def _known_group(self, group: str) -> str:
+        """Get the group to put an alias in, which is the core group if its own group was deleted since."""
+        return group if group in self.aliases.groups else CORE_GROUP
+
+    def _update_undo_actions(self):
+        # Disabled while there are unsaved edits, so Ctrl+Z reverts them first.
+        unsaved = self.alias_edit.has_unsaved_changes
+        self.undo_action.setEnabled(self.journal.can_undo() and not unsaved)
+        self.redo_action.setEnabled(self.journal.can_redo() and not unsaved)
+
+    def _save(self, reorder_only: bool = False):
+        """Schedule a save of the aliases to the file. Bursts of changes are coalesced into a single background write.
+
+        Args:
+            reorder_only (bool): Only the order of the aliases changed, so the write can wait longer.
+        """
+        self.save_scheduler.schedule(REORDER_SAVE_DELAY_MS if reorder_only else None)
         self._set_title(f"Aliasaurus - {self.alias_edit.selected_alias}")
 
+    def _snapshot(self) -> AliasSnapshot:
+        """Get a copy of the aliases in list order for the save scheduler to write."""
+        # Merge in any changes made by other programs first, so they are not overwritten.
+        self.alias_watcher.check()
+        self._journal_position = self.journal.position()
+        return self.aliases.snapshot()
+
+    def _on_external_changes(self, changes: ExternalChanges):
+        """Merge aliases changed by another program into the list. Unsaved edits are never overwritten."""
+        editing = self.alias_edit.selected_alias if self.alias_edit.has_unsaved_changes else None
+        conflicts = []
+        for name in changes.removed:
+            if name == editing:
+                # Keep the alias so the edits can still be saved.
+                conflicts.append(name)
+            elif name in self.aliases:
+                self.alias_list.remove(name)
+                self.search_index.remove(name)
+        new_order = changes.index.names() if changes.added else []
+        memberships = self.alias_file.memberships(changes.index) if changes.added else {}
+        positions = {name: position for position, name in enumerate(new_order)}
+        for name, commands in (changes.changed | changes.added).items():
+            if name not in self.aliases:
+                # Insert it after the closest preceding alias that is also in the list.
+                position = positions.get(name, len(new_order))
+                previous_name = next(
+                    (new_order[i] for i in range(position - 1, -1, -1) if new_order[i] in self.aliases), None
+                )
+                self.alias_list.insert_after(previous_name, name, commands, memberships.get(name, CORE_GROUP))
+                self.search_index.add(name)
+            else:
+                self.aliases.set_commands(name, commands)
+            self.search_index.set_commands(name, commands)
+            if name == editing:
+                conflicts.append(name)
+                self.alias_edit.set_original(self.aliases.text(name))
+            elif name == self.alias_edit.selected_alias:
+                self.alias_edit.set(name, self.aliases.text(name))
+        self.alias_filter.refresh()
+        self.linter.lint_aliases({name: self.aliases[name] for name in changes.changed | changes.added})
+        logging.info(
+            f"Merged external changes: {len(changes.added)} added, {len(changes.changed)} changed, "
+            f"{len(changes.removed)} removed."
+        )
+        self.statusBar().showMessage("The alias file was changed by another program, the changes were merged.", 5000)
+        if conflicts:
+            QMessageBox.warning(
+                self,
+                "Conflicting Changes",
+                f"The alias '{conflicts[0]}' was changed by another program while you were editing it. Your unsaved "
+                "changes have been kept: save them to overwrite the other change, or revert to discard them.",
+            )
+
+    def _lint_edit(self):
+        """Lint the alias being edited in the background."""
+        if self.alias_edit.selected_alias:
+            _, name, commands = self.alias_edit.get()
+            self.linter.lint_edit(self._edit_tag(), name, commands)
+
+    def _edit_tag(self) -> tuple[str, str, int]:
+        # Identifies the state of the editor, so results for older edits are ignored.
+        return self.alias_edit.selected_alias, self.alias_edit.name_edit.text(), self.alias_edit.document.revision()
+
+    def _on_edit_linted(self, tag: object, diagnostics: tuple[Diagnostic, ...]):
+        if tag == self._edit_tag():
+            self.alias_edit.set_diagnostics(diagnostics)
+
+    def _lint_step(self, step: list[Operation]):
+        """Lint the aliases added, edited or renamed by a change."""
+        names = {operation.new_name if operation.kind == RENAME else operation.name for operation in step}
+        self.linter.lint_aliases({name: self.aliases[name] for name in names if name in self.aliases})
+
+    def _on_lint_all(self):
+        """Lint every alias. Aliases that have not changed since they were last linted are not checked again."""
+        self.aliases.load(self.aliases)
+        self.statusBar().showMessage(f"Checking {len(self.aliases)} aliases...")
+        self.linter.lint_all(dict(self.aliases))
+
+    def _on_all_linted(self, summary: LintSummary):
+        if not summary.errors and not summary.warnings:
+            self.statusBar().showMessage(f"Checked {summary.aliases} aliases, no problems found.", 10000)
+            return
+        self.statusBar().showMessage(
+            f"Checked {summary.aliases} aliases: {summary.errors} with errors and {summary.warnings} with warnings. "
+            "Press F8 to go to the next one.",
+            10000,
+        )
+
+    def _on_next_problem(self):
+        """Select the next alias with a lint problem, after the selected one."""
+        self.alias_filter.clear()
+        name = self.alias_list.next_with_diagnostics()
+        if name is None:
+            self.statusBar().showMessage("No problems found.", 5000)
+        else:
+            self.alias_list.select(name)
+
+    def _on_filter(self):
+        """Focus the filter box."""
+        self.alias_filter.filter_edit.setFocus()
+        self.alias_filter.filter_edit.selectAll()
+
+    def _index_next_batch(self):
+        """Index the commands of the next batch of aliases that were loaded at startup."""
+        batch = list(itertools.islice(self._unindexed_names, SEARCH_INDEX_BATCH_SIZE))
+        if not batch:
+            self._search_index_timer.stop()
+            return
+        self.aliases.load(batch)
+        # Aliases deleted since startup are skipped, edited ones are re-indexed with their current commands.
+        loaded = {name: self.aliases[name] for name in batch if name in self.aliases}
+        for name, commands in loaded.items():
+            self.search_index.set_commands(name, commands)
+        self.linter.lint_aliases(loaded)
+        if self.alias_filter.is_active():
+            self.alias_filter.refresh()
+
+    def _on_save_failed(self, error: str):
+        self.save_status.setText("Save failed")
+        QMessageBox.warning(self, "Save Failed", f"The aliases could not be saved:\n{error}")
+
+    def _on_backup(self):
+        """Create a backup of the alias file, including any changes that are still waiting to be saved."""
+        self.save_scheduler.flush()
+        snapshot, created = self.alias_file.backup(retention=self.settings.backup_retention())
+        if created:
+            self.statusBar().showMessage(f"Created backup {snapshot.id}.", 5000)
+        else:
+            self.statusBar().showMessage(f"No changes since backup {snapshot.id}, nothing to back up.", 5000)
+
+    def _on_restore_backup(self):
+        """Choose a backup and restore it, replacing the aliases."""
+        # Rarely used, so only imported when needed.
+        from app.backup_dialog import BackupDialog
+
+        self.save_scheduler.flush()
+        dialog = BackupDialog(self.alias_file.backups, self.alias_edit.has_unsaved_changes, self)
+        if not dialog.exec_() or dialog.selected_snapshot is None:
+            return
+        snapshot = dialog.selected_snapshot
+        try:
+            previous = self.alias_file.restore(snapshot, self.settings.backup_retention())
+        except OSError as error:
+            # Some of the files may have been restored already.
+            self.alias_watcher.acknowledge(self._reload_aliases())
+            self.journal.checkpoint(self.journal.position())
+            QMessageBox.warning(self, "Restore Failed", f"The backup could not be restored:\n{error}")
+            return
+        self.alias_watcher.acknowledge(self._reload_aliases())
+        self.journal.checkpoint(self.journal.position())
+        self.statusBar().showMessage(
+            f"Restored backup {snapshot.id}. The aliases from before were backed up as {previous.id}.", 10000
+        )
+
+    def _on_run(self):
+        """Run the alias being edited, including any unsaved edits, and show its output without waiting for it."""
+        if not self.alias_edit.selected_alias:
+            return
+        _, name, commands = self.alias_edit.get()
+        arguments = ""
+        if any(uses_arguments(command) for command in commands):
+            arguments, ok = QInputDialog.getText(
+                self, "Run Alias", f"Arguments for {name} ($1 to $9, $*):", text=self._run_arguments.get(name, "")
+            )
+            if not ok:
+                return
+            self._run_arguments[name] = arguments
+        self.run_pane.run(name, commands, arguments, self.settings.run_timeout_s)
+        if name in self.aliases:
+            self.settings.add_recent_alias(name)
+
     def _open_terminal(self):
         """Open a new terminal window."""
-        subprocess.Popen(["start", "cmd"], shell=True)
+        self.backend.open_terminal()
 
     def _change_theme(self, theme: str):
         """Change the application theme."""
-        stylesheet = qdarktheme.load_stylesheet(theme)
-        application = QApplication.instance()
-        assert isinstance(application, QApplication)
-        application.setStyleSheet(stylesheet)
+        with TIMINGS.span("apply theme", theme=theme):
+            stylesheet = self.theme_cache.load_stylesheet(theme)
+            application = QApplication.instance()
+            assert isinstance(application, QApplication)
+            application.setStyleSheet(stylesheet)
         self.settings.set_theme(theme)
+
+    def _change_file_format(self, file_format: str):
+        """Change the alias file format, migrating the existing alias file. The escapes of the aliases that move to the
+        new format are translated, and the user is told about the aliases that can't be translated exactly."""
+        if file_format == self.alias_file.file_format:
+            return
+        if not self._check_no_unsaved_edits():
+            self.file_format_actions[self.alias_file.file_format].setChecked(True)
+            return
+        self.save_scheduler.flush()
+        migration = self.alias_file.migrate(file_format)
+        # Some problems only break aliases in the inline format.
+        self.linter.set_inline(file_format == FILE_FORMAT_INLINE)
+        alias_index = self.alias_file.index()
+        self.aliases.set_index(alias_index)
+        for name, commands in migration.translated.items():
+            if name in self.aliases:
+                self.aliases.set_commands(name, commands)
+                self.search_index.set_commands(name, commands)
+        if self.alias_edit.selected_alias in migration.translated:
+            self.alias_edit.set(self.alias_edit.selected_alias, self.aliases.text(self.alias_edit.selected_alias))
+        self.aliases.load(self.aliases)
+        self.linter.lint_aliases(dict(self.aliases))
+        self._lint_edit()
+        self.alias_watcher.acknowledge(alias_index)
+        self.journal.checkpoint(self.journal.position())
+        self.settings.set_file_format(file_format)
+        if migration.expanded:
+            QMessageBox.warning(
+                self,
+                "Alias File Format",
+                f"{len(migration.expanded)} aliases use %VARIABLES%, which are now expanded when the alias runs rather "
+                f"than when the command prompt starts. Check that they still do what you expect: "
+                f"{', '.join(migration.expanded[:10])}{', ...' if len(migration.expanded) > 10 else ''}",
+            )
+
+    def _change_shell_export(self, format_name: str, enabled: bool):
+        """Start or stop keeping a copy of the aliases in the format of another shell."""
+        formats = [name for name in FORMATS if name != format_name and name in self.settings.shell_exports]
+        if enabled:
+            formats.append(format_name)
+        self.settings.set_shell_exports(formats)
+        self.alias_file.exports.set_formats(formats)
+        if enabled:
+            # Write the new export now rather than on the next change.
+            self.save_scheduler.schedule()
+
+
+def _encode_state(state: QByteArray) -> str:
+    """Encode the state saved by a Qt widget to store it in the settings."""
+    return bytes(state.toBase64().data()).decode("ascii")
+
+
+def _decode_state(text: str) -> QByteArray:
+    return QByteArray.fromBase64(text.encode("ascii", errors="ignore"))
+
+
+def _is_reorder(step: list[Operation]) -> bool:
+    """Check whether a change only reorders aliases, without moving any to another group (and so another file)."""
+    return all(operation.kind == MOVE and operation.group == operation.previous_group for operation in step)
+
+
+def _file_filters() -> dict[str, AliasFormat]:
+    """Get the file dialog filters of the import and export formats."""
+    filters = {}
+    for alias_format in FORMATS.values():
+        patterns = " ".join(f"*{extension}" for extension in alias_format.extensions)
+        filters[f"{alias_format.description} ({patterns})"] = alias_format
+    return filters
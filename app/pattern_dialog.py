@@ -0,0 +1,105 @@
+from collections.abc import Callable
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QCheckBox, QDialog, QDialogButtonBox, QFormLayout, QLabel, QLineEdit, QVBoxLayout
+
+PREVIEW_DELAY_MS = 200
+
+
+class PatternDialog(QDialog):
+    """Asks for text to find and its replacement, for bulk find and replace or rename. A preview of what would change
+    is shown while typing."""
+
+    def __init__(
+        self,
+        title: str,
+        selection_size: int,
+        preview: Callable[["PatternDialog"], tuple[str, bool]],
+        parent=None,
+    ):
+        """
+        Args:
+            title (str): The window title, e.g. "Rename by Pattern".
+            selection_size (int): The number of selected aliases. If any are selected, only they are changed by default.
+            preview (Callable[[PatternDialog], tuple[str, bool]]): Describes what the current input would change, and
+                whether it can be applied.
+        """
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setWindowFlag(Qt.WindowType.WindowContextHelpButtonHint, False)
+        self.preview = preview
+
+        self.find_edit = QLineEdit()
+        self.replace_edit = QLineEdit()
+        self.regex_check = QCheckBox(r"Regular expression (use \1 to insert groups)")
+        self.selected_only_check = QCheckBox(f"Only the {selection_size} selected alias(es)")
+        self.selected_only_check.setChecked(selection_size > 0)
+        self.selected_only_check.setEnabled(selection_size > 0)
+        self.preview_label = QLabel()
+        self.preview_label.setWordWrap(True)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.buttons.accepted.connect(self._on_accepted)
+        self.buttons.rejected.connect(self.reject)
+
+        # Previewing every alias on each key press would be slow for large alias files.
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(PREVIEW_DELAY_MS)
+        self._preview_timer.timeout.connect(self._update_preview)
+        for edit in (self.find_edit, self.replace_edit):
+            edit.textChanged.connect(self._schedule_preview)
+        for check in (self.regex_check, self.selected_only_check):
+            check.toggled.connect(self._schedule_preview)
+
+        form = QFormLayout()
+        form.addRow("Find:", self.find_edit)
+        form.addRow("Replace with:", self.replace_edit)
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.regex_check)
+        layout.addWidget(self.selected_only_check)
+        layout.addWidget(self.preview_label)
+        layout.addWidget(self.buttons)
+        self.setLayout(layout)
+        self._update_preview()
+
+    def find_text(self) -> str:
+        return self.find_edit.text()
+
+    def replacement(self) -> str:
+        return self.replace_edit.text()
+
+    def is_regex(self) -> bool:
+        return self.regex_check.isChecked()
+
+    def selected_only(self) -> bool:
+        return self.selected_only_check.isChecked()
+
+    def _schedule_preview(self):
+        # The input can only be applied once it has been previewed.
+        ok_button = self.buttons.button(QDialogButtonBox.StandardButton.Ok)
+        assert ok_button is not None
+        ok_button.setEnabled(False)
+        self._preview_timer.start()
+
+    def _on_accepted(self):
+        # Enter can still be pressed before the preview is updated.
+        if self._preview_timer.isActive():
+            self._preview_timer.stop()
+            self._update_preview()
+        ok_button = self.buttons.button(QDialogButtonBox.StandardButton.Ok)
+        assert ok_button is not None
+        if ok_button.isEnabled():
+            self.accept()
+
+    def _update_preview(self):
+        ok_button = self.buttons.button(QDialogButtonBox.StandardButton.Ok)
+        assert ok_button is not None
+        if not self.find_text():
+            self.preview_label.setText("Enter the text to find.")
+            ok_button.setEnabled(False)
+            return
+        description, can_apply = self.preview(self)
+        self.preview_label.setText(description)
+        ok_button.setEnabled(can_apply)
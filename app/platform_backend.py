@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import re
+import subprocess
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+from app.atomic_write import atomic_write
+
+APP_DIRECTORY_NAME = "aliasaurus"
+AUTORUN_KEY_PATH = r"Software\Microsoft\Command Processor"
+AUTORUN_VALUE_NAME = "AutoRun"
+FAKE_REGISTRY_NAME = "fake_registry.json"
+
+VARIABLE_PATTERN = re.compile(r"%([^%]+)%")
+
+
+class AppPaths(NamedTuple):
+    """Where the app keeps its files."""
+
+    directory: str
+    alias_cmd: str
+    macrofile: str
+    journal: str
+    backups: str
+    settings: str
+    theme_cache: str
+    setup_state: str
+    exports: str
+    timing_log: str
+    timing_trace: str
+    groups: str
+
+    @classmethod
+    def in_directory(cls, directory: str) -> "AppPaths":
+        return cls(
+            directory=directory,
+            alias_cmd=os.path.join(directory, "alias.cmd"),
+            macrofile=os.path.join(directory, "macros.doskey"),
+            journal=os.path.join(directory, "journal.jsonl"),
+            backups=os.path.join(directory, "backups"),
+            settings=os.path.join(directory, "settings.json"),
+            theme_cache=os.path.join(directory, "theme_cache"),
+            setup_state=os.path.join(directory, "setup_state.json"),
+            exports=os.path.join(directory, "exports"),
+            timing_log=os.path.join(directory, "timings.jsonl"),
+            timing_trace=os.path.join(directory, "timings.trace.json"),
+            groups=os.path.join(directory, "groups"),
+        )
+
+
+class ShellCommand(NamedTuple):
+    """How to run some commands in the shell of the platform, without a console window."""
+
+    program: str
+    arguments: list[str]
+    native_arguments: str = ""
+    """A command line passed to the program as is, after the arguments. cmd.exe parses its own command line, so it
+    can't be quoted like the arguments of other programs."""
+    encoding: str = "utf-8"
+    """The encoding of the output."""
+
+
+class PlatformBackend(ABC):
+    """Everything that depends on the operating system: the AutoRun registry value, where the app's files live, and
+    opening directories and terminals. Nothing touches the system until a method is called."""
+
+    name = ""
+
+    @abstractmethod
+    def app_directory(self) -> str:
+        """Get the directory the app keeps its files in, i.e. `%APPDATA%\\aliasaurus`."""
+
+    @abstractmethod
+    def expand(self, path: str) -> str:
+        """Expand the `%VARIABLES%` in a path as cmd.exe would, e.g. the macro file path in `alias.cmd`."""
+
+    @abstractmethod
+    def read_autorun(self) -> str | None:
+        """Get the command cmd.exe runs when it starts, or None if there isn't one."""
+
+    @abstractmethod
+    def write_autorun(self, value: str):
+        """Set the command cmd.exe runs when it starts."""
+
+    @abstractmethod
+    def open_directory(self, path: str):
+        """Show a directory in the file manager."""
+
+    @abstractmethod
+    def open_terminal(self):
+        """Open a new terminal window."""
+
+    @abstractmethod
+    def shell_command(self, commands: list[str]) -> ShellCommand:
+        """Get how to run commands one after another, e.g. the expansion of a macro."""
+
+    def paths(self) -> AppPaths:
+        return AppPaths.in_directory(self.app_directory())
+
+
+class WindowsBackend(PlatformBackend):
+    """The real Windows registry, `%APPDATA%`, File Explorer and Command Prompt."""
+
+    name = "windows"
+
+    def app_directory(self) -> str:
+        return os.path.join(os.environ["APPDATA"], APP_DIRECTORY_NAME)
+
+    def expand(self, path: str) -> str:
+        return os.path.expandvars(path)
+
+    def read_autorun(self) -> str | None:
+        import winreg
+
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, AUTORUN_KEY_PATH, 0, winreg.KEY_READ) as key:
+                return winreg.QueryValueEx(key, AUTORUN_VALUE_NAME)[0]
+        except FileNotFoundError:
+            return None
+
+    def write_autorun(self, value: str):
+        import winreg
+
+        # Opens the key, creating it if needed.
+        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, AUTORUN_KEY_PATH) as key:
+            winreg.SetValueEx(key, AUTORUN_VALUE_NAME, 0, winreg.REG_SZ, value)
+
+    def open_directory(self, path: str):
+        os.startfile(path)
+
+    def open_terminal(self):
+        subprocess.Popen(["start", "cmd"], shell=True)
+
+    def shell_command(self, commands: list[str]) -> ShellCommand:
+        # /d skips AutoRun, so the aliases are not loaded for nothing: macros only expand at an interactive prompt.
+        # /s takes everything between the outer quotes literally. Console programs write in the OEM code page.
+        return ShellCommand("cmd.exe", [], f'/d /s /c "{" & ".join(commands)}"', "oem")
+
+
+class FakeBackend(PlatformBackend):
+    """A stand-in for Windows, so the app runs on other platforms (e.g. for development and CI) and in tests.
+
+    `%APPDATA%` is a directory of your choosing and the registry is a dictionary, optionally saved to a JSON file so it
+    persists between runs. Directories and terminals are only recorded, not opened.
+    """
+
+    name = "fake"
+
+    def __init__(self, appdata: str, persistent: bool = False):
+        """
+        Args:
+            appdata (str): The directory that stands in for `%APPDATA%`.
+            persistent (bool): Save the registry to a file in the app directory, rather than keep it in memory.
+        """
+        self.appdata = appdata
+        self.registry_path = os.path.join(self.app_directory(), FAKE_REGISTRY_NAME) if persistent else None
+        self.registry: dict[str, str] = {}
+        self.opened_directories: list[str] = []
+        self.opened_terminals = 0
+        if self.registry_path is not None and os.path.exists(self.registry_path):
+            with open(self.registry_path, encoding="utf-8") as file:
+                self.registry = json.load(file)
+
+    def app_directory(self) -> str:
+        return os.path.join(self.appdata, APP_DIRECTORY_NAME)
+
+    def expand(self, path: str) -> str:
+        def variable(match: re.Match) -> str:
+            if match.group(1).upper() == "APPDATA":
+                return self.appdata
+            return os.environ.get(match.group(1), match.group(0))
+
+        return VARIABLE_PATTERN.sub(variable, path).replace("\\", os.sep)
+
+    def read_autorun(self) -> str | None:
+        return self.registry.get(AUTORUN_VALUE_NAME)
+
+    def write_autorun(self, value: str):
+        self.registry[AUTORUN_VALUE_NAME] = value
+        if self.registry_path is not None:
+            atomic_write(self.registry_path, json.dumps(self.registry, indent=2))
+
+    def open_directory(self, path: str):
+        logging.info(f"Not opening {path}, directories can't be opened on this platform.")
+        self.opened_directories.append(path)
+
+    def open_terminal(self):
+        logging.info("Not opening a terminal, Command Prompt is not available on this platform.")
+        self.opened_terminals += 1
+
+    def shell_command(self, commands: list[str]) -> ShellCommand:
+        # cmd.exe is not available, so the commands are run by the POSIX shell instead.
+        return ShellCommand("/bin/sh", ["-c", "\n".join(commands)])
+
+
+def default_backend() -> PlatformBackend:
+    """Get the backend for the current platform. Other platforms keep the app's files in `$APPDATA` if it is set, or
+    the user's data directory, with a persistent fake registry."""
+    if os.name == "nt":
+        return WindowsBackend()
+    appdata = os.environ.get("APPDATA") or os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return FakeBackend(appdata, persistent=True)
@@ -0,0 +1,131 @@
+import logging
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from app.alias_file import AliasFile
+from app.alias_store import AliasSnapshot
+from app.timings import TIMINGS
+
+DEFAULT_DELAY_MS = 500
+
+
+class SaveScheduler(QObject):
+    """Coalesces bursts of save requests into a single write of the alias file on a worker thread.
+
+    Each request restarts a short timer. When the timer fires, a snapshot of the aliases is taken on the GUI thread and
+    encoded on the worker thread. Writes are serialised: the snapshot for the next write is only taken once the previous
+    write has finished, so changes made by other programs in the meantime are merged before they could be overwritten.
+    """
+
+    saving = pyqtSignal()
+    written = pyqtSignal(object)
+    """Emitted with the `AliasSnapshot` that was written after each successful write, even if another one is waiting to
+    start."""
+    saved = pyqtSignal()
+    """Emitted once every requested write has succeeded."""
+    failed = pyqtSignal(str)
+    _write_finished = pyqtSignal(object)
+
+    def __init__(
+        self,
+        alias_file: AliasFile,
+        snapshot: Callable[[], AliasSnapshot],
+        delay_ms: int = DEFAULT_DELAY_MS,
+        dry_run: bool = False,
+        parent: QObject | None = None,
+    ):
+        """
+        Args:
+            alias_file (AliasFile): The alias file to write to.
+            snapshot (Callable[[], AliasSnapshot]): Called on the GUI thread to get a copy of the aliases and their
+                groups to write. The copy must not be modified afterwards.
+            delay_ms (int): How long to wait for more requests before writing.
+            dry_run (bool): Count the writes without touching the alias file. Used to test the coalescing.
+        """
+        super().__init__(parent)
+        self.alias_file = alias_file
+        self.snapshot = snapshot
+        self.delay_ms = delay_ms
+        self.dry_run = dry_run
+        self.write_count = 0
+        self._pending = False
+        self._in_flight: Future | None = None
+        """The write that is running or whose result has not been handled yet. Only one write is in flight at a time."""
+        self._succeeded = True
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alias-save")
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._start_write)
+        self._write_finished.connect(self._on_write_finished)
+
+    def schedule(self, delay_ms: int | None = None):
+        """Request a save. The write happens once no more requests have arrived for the delay.
+
+        Args:
+            delay_ms (int | None): Wait this long instead of the default delay. A longer delay never postpones a write
+                that was already due sooner.
+        """
+        delay_ms = self.delay_ms if delay_ms is None else delay_ms
+        if not (self._pending and self._timer.isActive() and self._timer.remainingTime() < delay_ms):
+            self._timer.start(delay_ms)
+        self._pending = True
+        self.saving.emit()
+
+    def is_idle(self) -> bool:
+        """Check whether there is nothing waiting to be written."""
+        return not self._pending and self._in_flight is None
+
+    def flush(self) -> bool:
+        """Write any pending changes immediately and wait for all writes to finish.
+
+        Returns:
+            bool: Whether the last write succeeded. Errors are also reported by the `failed` signal.
+        """
+        self._timer.stop()
+        if self._pending and self._in_flight is None:
+            self._start_write()
+        while self._in_flight is not None:
+            # Finishing a write starts the pending one, as the timer is stopped.
+            self._in_flight.exception()
+            self._on_write_finished(self._in_flight)
+        return self._succeeded
+
+    def _start_write(self):
+        if self._in_flight is not None:
+            # The snapshot is taken once the write in flight is finished and acknowledged, so changes made by other
+            # programs since can be merged first.
+            return
+        self._pending = False
+        with TIMINGS.span("save snapshot"):
+            aliases = self.snapshot()
+        future = self._executor.submit(self._write, aliases)
+        # Set before adding the callback, which runs straight away if the write is already done.
+        self._in_flight = future
+        future.add_done_callback(self._write_finished.emit)
+
+    def _write(self, aliases: AliasSnapshot) -> AliasSnapshot:
+        # Runs on the worker thread.
+        self.write_count += 1
+        if not self.dry_run:
+            with TIMINGS.span("save", aliases=len(aliases)):
+                self.alias_file.encode(aliases, aliases.groups)
+        return aliases
+
+    def _on_write_finished(self, future: Future):
+        if future is not self._in_flight:
+            # Already finished by `flush`.
+            return
+        self._in_flight = None
+        error = future.exception()
+        self._succeeded = error is None
+        if error is not None:
+            logging.error(f"Failed to save the alias file: {error}")
+            self.failed.emit(str(error))
+        else:
+            self.written.emit(future.result())
+        if self._pending and not self._timer.isActive():
+            self._start_write()
+        elif error is None and self.is_idle():
+            self.saved.emit()
@@ -1,39 +1,215 @@
 import json
+import logging
 import os
+from collections.abc import Callable
+from typing import Any, NamedTuple
 
+from app.alias_formats import FORMATS
+from app.atomic_write import atomic_write
+from app.backup_store import DEFAULT_KEEP_DAYS, DEFAULT_KEEP_LAST, RetentionPolicy
+from app.platform_backend import default_backend
+
+# This module must never import PyQt5, the command line interface uses it.
+
+SETTINGS_VERSION = 2
+"""The version of the settings file. Version 1 had no version number and no session state."""
 DEFAULT_THEME = "light"
-SETTINGS_PATH = os.path.join(os.environ["APPDATA"], "aliasaurus", "settings.json")
+DEFAULT_FILE_FORMAT = "inline"
+"""The format alias files were written in before there was a choice, so existing files are kept as they are until the
+user picks another format."""
+DEFAULT_RUN_TIMEOUT_S = 60
+"""How long an alias run from the app may take before it is killed, or 0 for no limit."""
+MAX_RECENT_ALIASES = 20
+
+
+class SessionState(NamedTuple):
+    """Where the user left off, so the window reopens the same way."""
+
+    window_geometry: str = ""
+    """The size and position of the window, as saved by Qt and encoded in base64."""
+    window_state: str = ""
+    """The docked panes of the window, as saved by Qt and encoded in base64."""
+    splitter_state: str = ""
+    """The sizes of the list and the editor, as saved by Qt and encoded in base64."""
+    selected_aliases: tuple[str, ...] = ()
+    """The selected aliases in list order."""
+    top_alias: str = ""
+    """The alias at the top of the list, to scroll back to."""
+    filter_text: str = ""
 
 
 class Settings:
-    """Settings for the application. These are saved to disk and loaded on startup."""
+    """Settings for the application. These are saved to disk and loaded on startup.
 
-    def __init__(self, theme: str = DEFAULT_THEME):
+    Every change is saved, atomically. If the caller batches the writes, a change only marks the settings as changed and
+    the caller saves them with `flush`.
+    """
+
+    def __init__(
+        self,
+        theme: str = DEFAULT_THEME,
+        file_format: str = DEFAULT_FILE_FORMAT,
+        path: str | None = None,
+        on_change: Callable[[], None] | None = None,
+    ):
+        """
+        Args:
+            theme (str): The theme, until the settings are loaded.
+            file_format (str): The alias file format, until the settings are loaded.
+            path (str | None): The settings file. Defaults to the one in the app directory of this platform.
+            on_change (Callable[[], None] | None): Called when a setting changes, instead of saving straight away, so
+                a burst of changes can be written once with `flush`.
+        """
+        self.path = default_backend().paths().settings if path is None else path
+        self.on_change = on_change
         self.theme = theme
+        self.file_format = file_format
+        self.backup_keep_last = DEFAULT_KEEP_LAST
+        self.backup_keep_days = DEFAULT_KEEP_DAYS
+        self.shell_exports: list[str] = []
+        self.run_timeout_s = DEFAULT_RUN_TIMEOUT_S
+        self.record_timings = False
+        self.collapsed_groups: list[str] = []
+        self.session = SessionState()
+        self.recent_aliases: list[str] = []
+        """The aliases most recently selected or run, most recent first."""
+        self._unknown: dict[str, Any] = {}
+        """Settings of a newer version of the app, kept so saving doesn't lose them."""
+        self._saved_text = ""
 
     def set_theme(self, value: str):
         self.theme = value
-        self.save()
+        self._changed()
+
+    def set_file_format(self, value: str):
+        self.file_format = value
+        self._changed()
+
+    def set_shell_exports(self, value: list[str]):
+        self.shell_exports = value
+        self._changed()
+
+    def set_record_timings(self, value: bool):
+        self.record_timings = value
+        self._changed()
+
+    def set_collapsed_groups(self, value: list[str]):
+        self.collapsed_groups = value
+        self._changed()
+
+    def set_session(self, value: SessionState):
+        if value != self.session:
+            self.session = value
+            self._changed()
+
+    def add_recent_alias(self, name: str):
+        """Move an alias to the top of the recently used aliases."""
+        if self.recent_aliases[:1] != [name]:
+            self.recent_aliases = [name, *(other for other in self.recent_aliases if other != name)]
+            del self.recent_aliases[MAX_RECENT_ALIASES:]
+            self._changed()
+
+    def rename_recent_alias(self, old_name: str, new_name: str):
+        if old_name in self.recent_aliases:
+            self.recent_aliases = [new_name if name == old_name else name for name in self.recent_aliases]
+            self._changed()
+
+    def backup_retention(self) -> RetentionPolicy:
+        return RetentionPolicy(self.backup_keep_last, self.backup_keep_days)
 
     def load(self) -> None:
-        if not os.path.exists(SETTINGS_PATH):
+        if not os.path.exists(self.path):
             self._from_json({})
             return
-        with open(SETTINGS_PATH) as file:
-            try:
-                self._from_json(json.load(file))
-            except json.JSONDecodeError:
-                self._from_json({})
+        with open(self.path, encoding="utf-8") as file:
+            self._saved_text = file.read()
+        try:
+            settings = json.loads(self._saved_text)
+        except json.JSONDecodeError:
+            settings = {}
+        self._from_json(settings if isinstance(settings, dict) else {})
 
     def save(self):
-        if not os.path.exists(os.path.dirname(SETTINGS_PATH)):
-            os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
-        with open(SETTINGS_PATH, "w") as file:
-            json.dump(self._to_json(), file)
+        """Atomically write the settings, unless they are unchanged since they were last loaded or saved."""
+        text = json.dumps({**self._unknown, **self._to_json()}, indent=2)
+        if text != self._saved_text:
+            atomic_write(self.path, text)
+            self._saved_text = text
+
+    def flush(self):
+        """Write any changes that are waiting to be saved. Errors are logged, as the settings are not worth losing the
+        user's work over."""
+        try:
+            self.save()
+        except OSError as error:
+            logging.warning(f"Failed to save the settings: {error}")
+
+    def _changed(self):
+        if self.on_change is None:
+            self.save()
+        else:
+            self.on_change()
 
     def _to_json(self):
-        return {"theme": self.theme}
+        return {
+            "version": SETTINGS_VERSION,
+            "theme": self.theme,
+            "file_format": self.file_format,
+            "backup_keep_last": self.backup_keep_last,
+            "backup_keep_days": self.backup_keep_days,
+            "shell_exports": self.shell_exports,
+            "run_timeout_s": self.run_timeout_s,
+            "record_timings": self.record_timings,
+            "collapsed_groups": self.collapsed_groups,
+            "session": {**self.session._asdict(), "selected_aliases": list(self.session.selected_aliases)},
+            "recent_aliases": self.recent_aliases,
+        }
 
     def _from_json(self, json: dict):
+        # Version 1 is read the same way, it only lacks the newer settings.
+        version = json.get("version", 1)
+        if not isinstance(version, int) or version > SETTINGS_VERSION:
+            logging.warning(f"The settings are from a newer version ({version}) of Aliasaurus, reading what is known.")
+        self._unknown = {key: value for key, value in json.items() if key not in self._to_json()}
         if "theme" in json:
             self.theme = json["theme"]
+        if "file_format" in json:
+            self.file_format = json["file_format"]
+        if "backup_keep_last" in json:
+            self.backup_keep_last = _at_least_one(json["backup_keep_last"], DEFAULT_KEEP_LAST)
+        if "backup_keep_days" in json:
+            self.backup_keep_days = _at_least_one(json["backup_keep_days"], DEFAULT_KEEP_DAYS)
+        if "shell_exports" in json:
+            self.shell_exports = [name for name in json["shell_exports"] if name in FORMATS]
+        if "run_timeout_s" in json:
+            self.run_timeout_s = json["run_timeout_s"]
+        if "record_timings" in json:
+            self.record_timings = json["record_timings"]
+        if "collapsed_groups" in json:
+            self.collapsed_groups = list(json["collapsed_groups"])
+        if isinstance(json.get("session"), dict):
+            self.session = _session_from_json(json["session"])
+        if "recent_aliases" in json:
+            self.recent_aliases = [name for name in json["recent_aliases"] if isinstance(name, str)]
+            del self.recent_aliases[MAX_RECENT_ALIASES:]
+
+
+def _at_least_one(value: object, default: int) -> int:
+    """Read a number of backups or days to keep. Keeping none would prune every backup as soon as it is made."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        logging.warning(f"Invalid backup retention setting {value!r}, using {default}.")
+        return default
+    return max(1, value)
+
+
+def _session_from_json(json: dict) -> SessionState:
+    """Read the session state, ignoring any values of the wrong type, e.g. from a hand-edited file."""
+    defaults = SessionState()
+    values = {}
+    for field in SessionState._fields:
+        value = json.get(field)
+        if field == "selected_aliases" and isinstance(value, list):
+            values[field] = tuple(name for name in value if isinstance(name, str))
+        elif isinstance(value, type(getattr(defaults, field))):
+            values[field] = value
+    return defaults._replace(**values)
@@ -0,0 +1,42 @@
+import json
+import logging
+import os
+import time
+
+
+class StartupProfile:
+    """Records how long each phase of startup takes, enabled with the --profile-startup flag."""
+
+    def __init__(self, start: float | None = None):
+        """
+        Args:
+            start (float | None): The time.perf_counter() value startup began at. Defaults to now.
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.phases: list[tuple[str, float]] = []
+        self._last = self.start
+
+    def mark(self, phase: str):
+        """Record the end of a phase. Its duration is the time since the previous phase ended."""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def total_ms(self) -> float:
+        return (self._last - self.start) * 1000
+
+    def report(self, path: str):
+        """Log the phase timings and save them as JSON so regressions can be tracked.
+
+        Args:
+            path (str): The JSON file to write.
+        """
+        logging.info("Startup profile:")
+        for phase, duration_ms in self.phases:
+            logging.info(f"  {phase:<24} {duration_ms:8.1f} ms")
+        logging.info(f"  {'total':<24} {self.total_ms():8.1f} ms")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        phases = [{"phase": phase, "ms": round(duration_ms, 3)} for phase, duration_ms in self.phases]
+        with open(path, "w") as file:
+            json.dump({"phases": phases, "total_ms": round(self.total_ms(), 3)}, file, indent=2)
+        logging.info(f"Startup profile saved to {path}")
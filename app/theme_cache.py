@@ -0,0 +1,104 @@
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import threading
+
+from app.atomic_write import atomic_write
+from app.version import get_version
+
+VERSION_PATTERN = re.compile(r"""^__version__\s*=\s*["']([^"']+)["']""", re.MULTILINE)
+URL_PATTERN = re.compile(r"url\(([^)]+)\)")
+
+
+@functools.cache
+def qdarktheme_version() -> str:
+    """Get the version of qdarktheme, without importing it if possible because the import is slow."""
+    spec = importlib.util.find_spec("qdarktheme")
+    if spec is not None and spec.origin is not None and os.path.exists(spec.origin):
+        with open(spec.origin, encoding="utf-8") as file:
+            match = VERSION_PATTERN.search(file.read())
+        if match is not None:
+            return match.group(1)
+    import qdarktheme
+
+    return qdarktheme.__version__
+
+
+class ThemeCache:
+    """A cache of compiled qdarktheme stylesheets, kept in memory and on disk.
+
+    Each cached stylesheet is keyed by the theme, the qdarktheme version and the app version, so it is recompiled
+    automatically whenever either version changes.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._stylesheets: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load_stylesheet(self, theme: str) -> str:
+        """Get the stylesheet of a theme, compiling and caching it if needed.
+
+        Args:
+            theme (str): The theme, "light" or "dark".
+
+        Returns:
+            str: The stylesheet.
+        """
+        with self._lock:
+            stylesheet = self._stylesheets.get(theme)
+            if stylesheet is None:
+                stylesheet = self._read(theme)
+                if stylesheet is None:
+                    stylesheet = self._compile(theme)
+                self._stylesheets[theme] = stylesheet
+            return stylesheet
+
+    def preload(self, themes: list[str]):
+        """Load the stylesheets of themes on a background thread so switching to them later is instant."""
+
+        def preload_all():
+            for theme in themes:
+                try:
+                    self.load_stylesheet(theme)
+                except Exception as error:
+                    logging.warning(f"Failed to preload the {theme} theme: {error}")
+
+        threading.Thread(target=preload_all, name="theme-preload", daemon=True).start()
+
+    def _path(self, theme: str) -> str:
+        key = f"{theme}\n{qdarktheme_version()}\n{get_version()}"
+        return os.path.join(self.directory, f"{theme}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.qss")
+
+    def _read(self, theme: str) -> str | None:
+        path = self._path(theme)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as file:
+            stylesheet = file.read()
+        # The stylesheet refers to icons that qdarktheme writes to its own cache, which may have been cleared.
+        if not all(os.path.exists(url.strip("\"'")) for url in URL_PATTERN.findall(stylesheet)):
+            logging.info(f"Cached {theme} theme refers to missing icons, recompiling it...")
+            return None
+        return stylesheet
+
+    def _compile(self, theme: str) -> str:
+        import qdarktheme
+
+        logging.info(f"Compiling the {theme} theme...")
+        stylesheet = qdarktheme.load_stylesheet(theme)
+        path = self._path(theme)
+        try:
+            atomic_write(path, stylesheet)
+            # Remove stylesheets cached for other versions.
+            for name in os.listdir(self.directory):
+                if name.startswith(f"{theme}-") and name.endswith(".qss") and name != os.path.basename(path):
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(self.directory, name))
+        except OSError as error:
+            logging.warning(f"Failed to cache the {theme} theme: {error}")
+        return stylesheet
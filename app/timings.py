@@ -0,0 +1,180 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from typing import IO, Any, NamedTuple
+
+# This module must never import PyQt5, the command line interface uses it.
+
+ROLLING_WINDOW = 500
+"""The most recent timings of each operation kept for the percentiles."""
+MAX_LOG_BYTES = 10 * 2**20
+"""The size a timing log can grow to before it is moved aside and started afresh."""
+
+
+class TimingSummary(NamedTuple):
+    """The recent timings of an operation."""
+
+    name: str
+    count: int
+    """The number of times the operation ran, including those no longer in the rolling window."""
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    last_ms: float
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Get a percentile of some sorted values by the nearest rank, e.g. 0.99 for the 99th percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(fraction * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+class Timings:
+    """Times the operations on the hot paths of the app and keeps their recent timings for the diagnostics.
+
+    Every timing can also be recorded, as one JSON object per line and as a Chrome trace that can be opened in
+    chrome://tracing or https://ui.perfetto.dev. Timings are recorded from any thread.
+    """
+
+    def __init__(self, window: int = ROLLING_WINDOW):
+        """
+        Args:
+            window (int): The most recent timings of each operation kept for the percentiles.
+        """
+        self.window = window
+        self._recent: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._log: IO[str] | None = None
+        self._trace: IO[str] | None = None
+        # The trace shows times relative to when recording started.
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """Time a block of code.
+
+        Args:
+            name (str): The operation, e.g. `encode`.
+            **args (Any): Details of this run of the operation to record with it, e.g. the number of aliases. More can
+                be added to the yielded dictionary inside the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, start, time.perf_counter() - start, args)
+
+    def add(
+        self, name: str, start: float, duration_s: float, args: dict[str, Any] | None = None, recorded: bool = True
+    ):
+        """Add a timing that was measured elsewhere.
+
+        Args:
+            name (str): The operation.
+            start (float): The time.perf_counter() value the operation started at.
+            duration_s (float): How long it took, in seconds.
+            args (dict[str, Any] | None): Details of this run of the operation.
+            recorded (bool): Write the timing to the files being recorded to. Frequent timings that are only
+                interesting in aggregate can be left out.
+        """
+        duration_ms = duration_s * 1000
+        with self._lock:
+            recent = self._recent.get(name)
+            if recent is None:
+                recent = self._recent[name] = deque(maxlen=self.window)
+            recent.append(duration_ms)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            if recorded and (self._log is not None or self._trace is not None):
+                self._record(name, start, duration_ms, args or {})
+
+    def summary(self) -> list[TimingSummary]:
+        """Get the recent timings of each operation, by name."""
+        with self._lock:
+            recent = {name: list(durations) for name, durations in self._recent.items()}
+            counts = dict(self._counts)
+        summaries = []
+        for name in sorted(recent):
+            durations = sorted(recent[name])
+            summaries.append(
+                TimingSummary(
+                    name,
+                    counts[name],
+                    percentile(durations, 0.5),
+                    percentile(durations, 0.99),
+                    durations[-1],
+                    recent[name][-1],
+                )
+            )
+        return summaries
+
+    def start_recording(self, log_path: str | None, trace_path: str | None = None):
+        """Append every timing from now on to files. Stops any recording already going.
+
+        Args:
+            log_path (str | None): A file to write each timing to as a line of JSON.
+            trace_path (str | None): A file to write the timings to in the Chrome trace event format.
+        """
+        self.stop_recording()
+        log = _open_log(log_path, append=True) if log_path is not None else None
+        trace = _open_log(trace_path, append=False) if trace_path is not None else None
+        if trace is not None:
+            # The trace event format allows the array to be left open, so events can be appended as they happen.
+            trace.write("[\n")
+        with self._lock:
+            self._log, self._trace = log, trace
+            self._origin = time.perf_counter()
+
+    def stop_recording(self):
+        with self._lock:
+            files, self._log, self._trace = [self._log, self._trace], None, None
+        for file in files:
+            if file is not None:
+                file.close()
+
+    def is_recording(self) -> bool:
+        return self._log is not None or self._trace is not None
+
+    def _record(self, name: str, start: float, duration_ms: float, args: dict[str, Any]):
+        # Called with the lock held.
+        try:
+            if self._log is not None:
+                event = {"time": round(time.time() - (time.perf_counter() - start), 6), "name": name}
+                self._log.write(json.dumps({**event, "ms": round(duration_ms, 3), **args}, default=str) + "\n")
+            if self._trace is not None:
+                event = {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((start - self._origin) * 1e6, 1),
+                    "dur": round(duration_ms * 1000, 1),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+                self._trace.write(json.dumps(event, default=str) + ",\n")
+        except OSError as error:
+            logging.warning(f"Stopped recording timings: {error}")
+            self._log = self._trace = None
+
+
+def _open_log(path: str, append: bool) -> IO[str]:
+    """Open a file to record timings to. The previous file is moved aside if it is started afresh or has grown too
+    large, so there is always at most one old file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with contextlib.suppress(OSError):
+        if not append or os.path.getsize(path) > MAX_LOG_BYTES:
+            os.replace(path, path + ".old")
+    # Line buffered, so the timings up to a crash or a hang are on disk.
+    return open(path, "a", encoding="utf-8", buffering=1)
+
+
+TIMINGS = Timings()
+"""The timings of the app, shared like a logger so any module can time its hot paths."""
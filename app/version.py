@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 
@@ -6,13 +7,27 @@ git_sha_path = "resources/GIT_SHA"
 
 if hasattr(sys, "_MEIPASS"):
     version_path = os.path.join(sys._MEIPASS, version_path)
-with open(version_path) as version_file:
-    __version__ = version_file.read().strip()
-
-if hasattr(sys, "_MEIPASS"):
     git_sha_path = os.path.join(sys._MEIPASS, git_sha_path)
-if not os.path.exists(git_sha_path):
-    GIT_SHA = "unknown"  # Needs to be published to get the Git SHA
-else:
+
+
+@functools.cache
+def get_version() -> str:
+    with open(version_path) as version_file:
+        return version_file.read().strip()
+
+
+@functools.cache
+def get_git_sha() -> str:
+    if not os.path.exists(git_sha_path):
+        return "unknown"  # Needs to be published to get the Git SHA
     with open(git_sha_path) as git_sha_file:
-        GIT_SHA = git_sha_file.read().strip()
+        return git_sha_file.read().strip()
+
+
+def __getattr__(name: str) -> str:
+    # The files are only read the first time __version__ or GIT_SHA is used, not when the module is imported.
+    if name == "__version__":
+        return get_version()
+    if name == "GIT_SHA":
+        return get_git_sha()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
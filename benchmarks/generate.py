@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+
+from app.alias_index import encode_commands
+
+WORDS = ["git", "status", "log", "push", "pull", "docker", "compose", "up", "build", "cd", "dir", "echo", "npm", "run"]
+LONG_ALIAS_INTERVAL = 50
+"""Every this many aliases, one has a long body of many commands."""
+LONG_ALIAS_COMMANDS = 40
+LONG_COMMAND_LENGTH = 200
+
+
+def generate_aliases(count: int, seed: int = 0) -> dict[str, list[str]]:
+    """Generate a realistic but synthetic set of aliases. The same count and seed always give the same aliases.
+
+    Most aliases have one to four commands, every `LONG_ALIAS_INTERVAL`th has `LONG_ALIAS_COMMANDS` long commands.
+
+    Args:
+        count (int): The number of aliases.
+        seed (int): The random seed.
+
+    Returns:
+        dict[str, list[str]]: A dictionary of aliases and their commands, in order.
+    """
+    rng = random.Random(seed)
+    aliases = {}
+    for i in range(count):
+        name = f"{rng.choice(WORDS)}{i}"
+        if i % LONG_ALIAS_INTERVAL == LONG_ALIAS_INTERVAL - 1:
+            aliases[name] = [_command(rng, LONG_COMMAND_LENGTH) for _ in range(LONG_ALIAS_COMMANDS)]
+        else:
+            aliases[name] = [_command(rng, rng.randint(8, 60)) for _ in range(rng.randint(1, 4))]
+    return aliases
+
+
+def long_commands(count: int, seed: int = 0) -> list[str]:
+    """Generate the commands of a single alias with a very long body."""
+    rng = random.Random(seed)
+    return [_command(rng, LONG_COMMAND_LENGTH) for _ in range(count)]
+
+
+def write_alias_file(directory: str, aliases: dict[str, list[str]], macrofile: bool):
+    """Write aliases to `alias.cmd` (and `macros.doskey`) in a directory, the way the app lays them out.
+
+    The files are written directly, so decoding can be measured independently of encoding.
+
+    Args:
+        directory (str): The directory, e.g. `%APPDATA%\\aliasaurus`.
+        aliases (dict[str, list[str]]): The aliases to write.
+        macrofile (bool): Write the aliases to a macro file loaded by `alias.cmd`, rather than inline.
+    """
+    os.makedirs(directory, exist_ok=True)
+    alias_cmd_path = os.path.join(directory, "alias.cmd")
+    macrofile_path = os.path.join(directory, "macros.doskey")
+    prefix = "" if macrofile else "DOSKEY "
+    definitions = "".join(f"{prefix}{name}={encode_commands(commands)}\r\n" for name, commands in aliases.items())
+    # The loader uses the full path so the macro file is found on any platform.
+    header = f'@echo off\r\nDOSKEY /MACROFILE="{macrofile_path}"\r\n' if macrofile else "@echo off\r\n"
+    with open(alias_cmd_path, "w", encoding="utf-8", newline="") as file:
+        file.write(header if macrofile else header + definitions)
+    if macrofile:
+        with open(macrofile_path, "w", encoding="utf-8", newline="") as file:
+            file.write(definitions)
+    elif os.path.exists(macrofile_path):
+        os.remove(macrofile_path)
+
+
+def _command(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic alias file, e.g. to try the app with many aliases.")
+    parser.add_argument("count", type=int, help="the number of aliases")
+    parser.add_argument("directory", help="the directory to write alias.cmd (and macros.doskey) to")
+    parser.add_argument("--macrofile", action="store_true", help="write the aliases to a macro file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_alias_file(args.directory, generate_aliases(args.count, args.seed), args.macrofile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+from collections.abc import Callable
+
+from app.alias_index import decode_commands, encode_commands, parse_definition
+from app.alias_store import AliasStore, join_commands
+from benchmarks.generate import generate_aliases
+
+DEFAULT_COUNT = 100_000
+
+
+def allocated(build: Callable[[], object]) -> tuple[int, object]:
+    """Measure the memory held by the result of a function, not counting what it freed along the way.
+
+    Returns:
+        tuple[int, object]: The number of bytes held, and the result, which must be kept alive until measured.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory",
+        description="Measure the memory held by the aliases as a dictionary of lists and as an alias store.",
+    )
+    parser.add_argument("count", type=int, nargs="?", default=DEFAULT_COUNT, help="the number of aliases")
+    options = parser.parse_args(args)
+
+    # As read from the alias file, so every name and command is a separate string.
+    lines = [f"{name}={encode_commands(commands)}" for name, commands in generate_aliases(options.count).items()]
+
+    def definitions() -> list[tuple[str, str]]:
+        return [definition for line in lines if (definition := parse_definition(line, macrofile=True)) is not None]
+
+    def as_dict() -> object:
+        aliases = {name: decode_commands(body) for name, body in definitions()}
+        # The list model and the editor each kept a copy of the names and the selected commands.
+        return aliases, list(aliases), {name: row for row, name in enumerate(aliases)}
+
+    def as_store() -> object:
+        store = AliasStore()
+        for row, (name, body) in enumerate(definitions()):
+            store.insert(row, name, decode_commands(body))
+        return store
+
+    dict_size, result = allocated(as_dict)
+    del result
+    store_size, result = allocated(as_store)
+    assert isinstance(result, AliasStore)
+    assert all(join_commands(result[name]) == result.text(name) for name in list(result)[:100])
+    del result
+
+    print(f"{options.count} aliases")
+    print(f"{'dict[str, list[str]] + list model':<36} {dict_size / 2**20:8.1f} MiB")
+    print(f"{'AliasStore':<36} {store_size / 2**20:8.1f} MiB  ({store_size / dict_size - 1:+.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
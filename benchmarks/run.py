@@ -0,0 +1,314 @@
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+
+from PyQt5.QtWidgets import QApplication
+
+from app.alias_edit import AliasEdit
+from app.alias_file import FILE_FORMAT_MACROFILE, FILE_FORMATS, AliasFile
+from app.alias_store import join_commands
+from app.macro_lint import LintCache
+from app.main_window import MainWindow
+from app.platform_backend import FakeBackend
+from benchmarks.generate import generate_aliases, long_commands, write_alias_file
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = [1, 100, 1_000, 10_000, 100_000]
+QUICK_SIZES = [1, 100, 1_000]
+DEFAULT_REPEAT = 5
+LONG_ALIAS_COMMANDS = 5_000
+"""The number of commands in the alias that is edited when measuring the unsaved changes check."""
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+"""A benchmark regresses if its median is this fraction slower than the baseline..."""
+MIN_REGRESSION_MS = 1.0
+"""...and at least this many milliseconds slower, so timer noise on tiny benchmarks is not reported."""
+
+
+def measure(run: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None) -> dict:
+    """Time a function. The setup is run before each repetition and is not timed.
+
+    Args:
+        run (Callable[[], object]): The code to time.
+        repeat (int): The number of times to run it.
+        setup (Callable[[], object] | None): Prepares each run, e.g. by making a change to save.
+
+    Returns:
+        dict: The fastest and median time in milliseconds, and the number of repetitions.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3), "repeat": repeat}
+
+
+def codec_benchmarks(backend: FakeBackend, sizes: list[int], repeat: int) -> Iterator[tuple[str, Callable[[], dict]]]:
+    """The benchmarks of decoding and encoding the alias file, in both file formats."""
+    directory = backend.app_directory()
+    for size in sizes:
+        aliases = generate_aliases(size)
+        first = next(iter(aliases))
+        for file_format in FILE_FORMATS:
+            macrofile = file_format == FILE_FORMAT_MACROFILE
+
+            def decode(macrofile: bool = macrofile, file_format: str = file_format) -> dict:
+                write_alias_file(directory, aliases, macrofile)
+                return measure(AliasFile(file_format, defer_setup=True, backend=backend).decode, repeat)
+
+            def encode_all(file_format: str = file_format) -> dict:
+                # Every definition is new, as when migrating or importing.
+                alias_files = []
+
+                def setup():
+                    write_alias_file(directory, {}, macrofile=False)
+                    alias_files[:] = [AliasFile(file_format, defer_setup=True, backend=backend)]
+
+                return measure(lambda: alias_files[0].encode(aliases), repeat, setup)
+
+            def encode_one(macrofile: bool = macrofile, file_format: str = file_format) -> dict:
+                # A single alias changed, as when saving an edit.
+                write_alias_file(directory, aliases, macrofile)
+                alias_file = AliasFile(file_format, defer_setup=True, backend=backend)
+                alias_file.encode(aliases)
+                changed = dict(aliases)
+                edits = iter(range(repeat))
+                return measure(
+                    lambda: alias_file.encode(changed),
+                    repeat,
+                    lambda: changed.__setitem__(first, [f"echo {next(edits)}"]),
+                )
+
+            yield f"decode.{file_format}[{size}]", decode
+            yield f"encode.{file_format}.all[{size}]", encode_all
+            yield f"encode.{file_format}.one[{size}]", encode_one
+
+
+def lint_benchmarks(sizes: list[int], repeat: int) -> Iterator[tuple[str, Callable[[], dict]]]:
+    """The benchmarks of linting every alias, as on startup and after a change to the file format."""
+    for size in sizes:
+        aliases = generate_aliases(size)
+
+        def lint(cache: LintCache, aliases: dict[str, list[str]] = aliases):
+            for name, commands in aliases.items():
+                cache.lint(name, commands, inline=False)
+
+        def cold() -> dict:
+            caches = []
+
+            def setup():
+                caches[:] = [LintCache()]
+
+            return measure(lambda: lint(caches[0]), repeat, setup)
+
+        def cached() -> dict:
+            cache = LintCache()
+            lint(cache)
+            return measure(lambda: lint(cache), repeat)
+
+        yield f"lint.cold[{size}]", cold
+        yield f"lint.cached[{size}]", cached
+
+
+def gui_benchmarks(backend: FakeBackend, sizes: list[int], repeat: int) -> Iterator[tuple[str, Callable[[], dict]]]:
+    """The benchmarks of the main window's hot paths, on a window with the aliases loaded."""
+    application = QApplication.instance() or QApplication(sys.argv[:1])
+    directory = backend.app_directory()
+    closed_windows: list[MainWindow] = []
+
+    def process_events(seconds: float = 0.0):
+        deadline = time.perf_counter() + seconds
+        application.processEvents()
+        while time.perf_counter() < deadline:
+            application.processEvents()
+
+    for size in sizes:
+        aliases = generate_aliases(size)
+        window: MainWindow | None = None
+
+        def load(aliases: dict[str, list[str]] = aliases) -> MainWindow:
+            nonlocal window
+            if window is None:
+                journal_path = os.path.join(directory, "journal.jsonl")
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+                write_alias_file(directory, aliases, macrofile=True)
+                window = MainWindow(backend=backend)
+                window._load_aliases()
+                # Wait for the commands to be indexed in the background, so they don't slow down the measurements.
+                while window._search_index_timer.isActive():
+                    process_events()
+            return window
+
+        def save() -> dict:
+            window = load()
+            first = window.alias_list.get_all_in_order()[0]
+            edits = iter(range(repeat))
+
+            def run():
+                window._save()
+                window.save_scheduler.flush()
+
+            def setup():
+                process_events()
+                window.aliases.set_commands(first, [f"echo {next(edits)}"])
+
+            return measure(run, repeat, setup)
+
+        def populate() -> dict:
+            window = load()
+            index = window.alias_file.index()
+            return measure(lambda: window.alias_list.populate(index), repeat)
+
+        def get_all_in_order() -> dict:
+            window = load()
+            return measure(window.alias_list.get_all_in_order, repeat)
+
+        def close() -> None:
+            nonlocal window
+            if window is not None:
+                window.close()
+                # Closed windows are kept alive, deleting them while Qt may still deliver their events is not safe.
+                closed_windows.append(window)
+                window = None
+
+        yield f"gui.save[{size}]", save
+        yield f"gui.populate[{size}]", populate
+        yield f"gui.get_all_in_order[{size}]", get_all_in_order
+        close()
+
+    alias_edit = AliasEdit()
+
+    def check_unsaved_changes() -> dict:
+        alias_edit.set("long", join_commands(long_commands(LONG_ALIAS_COMMANDS)))
+        alias_edit.commands_edit.insertPlainText("x")
+        return measure(alias_edit._check_unsaved_changes, repeat)
+
+    def type_in_commands() -> dict:
+        # A key press in the commands of a long alias, including the unsaved changes check it triggers.
+        alias_edit.set("long", join_commands(long_commands(LONG_ALIAS_COMMANDS)))
+        return measure(lambda: alias_edit.commands_edit.insertPlainText("x"), repeat)
+
+    yield f"gui.check_unsaved_changes[{LONG_ALIAS_COMMANDS}]", check_unsaved_changes
+    yield f"gui.type_in_commands[{LONG_ALIAS_COMMANDS}]", type_in_commands
+
+
+def run(sizes: list[int], repeat: int, patterns: list[str]) -> dict[str, dict]:
+    """Run the benchmarks whose names match any of the patterns.
+
+    Returns:
+        dict[str, dict]: The measurements of each benchmark, by name.
+    """
+    # A fake registry and a temporary %APPDATA%, so the real aliases and registry are never touched.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="aliasaurus-bench-", ignore_cleanup_errors=True) as appdata:
+        backend = FakeBackend(appdata)
+        for benchmarks in (
+            codec_benchmarks(backend, sizes, repeat),
+            lint_benchmarks(sizes, repeat),
+            gui_benchmarks(backend, sizes, repeat),
+        ):
+            for name, benchmark in benchmarks:
+                if not any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+                    continue
+                results[name] = benchmark()
+                print(f"{name:<40} {results[name]['median_ms']:10.2f} ms  (min {results[name]['min_ms']:.2f} ms)")
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Compare the results to a baseline and print the change in each benchmark.
+
+    Args:
+        results (dict[str, dict]): The new measurements.
+        baseline (dict[str, dict]): The baseline measurements.
+        threshold (float): The fraction a benchmark may slow down by before it counts as a regression.
+
+    Returns:
+        list[str]: The names of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>12} {result['median_ms']:>9.2f} ms {'new':>8}")
+            continue
+        old, new = baseline[name]["median_ms"], result["median_ms"]
+        change = (new - old) / old if old else 0.0
+        regressed = new > old * (1 + threshold) and new - old >= MIN_REGRESSION_MS
+        if regressed:
+            regressions.append(name)
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:<40} {old:>9.2f} ms {new:>9.2f} ms {change:>+8.0%}{marker}")
+    return regressions
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the alias file codec and the GUI hot paths, and compare them to a baseline.",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="the numbers of aliases")
+    parser.add_argument("--quick", action="store_true", help=f"only measure {QUICK_SIZES} aliases")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="the number of times to run each benchmark")
+    parser.add_argument(
+        "-k", dest="patterns", action="append", help="only run benchmarks matching this pattern, e.g. 'decode.*'"
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the baseline to compare to")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="the slowdown that counts as a regression"
+    )
+    options = parser.parse_args(args)
+    if not options.save and not os.path.exists(options.baseline):
+        # Baselines depend on the machine, so none is committed. Without one there is nothing to catch a regression.
+        print(
+            f"There is no baseline at {options.baseline}. Save one on this machine before making a change with "
+            "`python -m benchmarks.run --save`, or pass --baseline."
+        )
+        return 1
+
+    results = run(QUICK_SIZES if options.quick else options.sizes, options.repeat, options.patterns or ["*"])
+    document = {
+        "version": RESULTS_VERSION,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    for path in (options.output, options.baseline if options.save else None):
+        if path:
+            with open(path, "w") as file:
+                json.dump(document, file, indent=2)
+            print(f"Results saved to {path}")
+
+    if options.save:
+        return 0
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("version") != RESULTS_VERSION:
+        print(f"The baseline {options.baseline} is from an incompatible version, save a new one with --save.")
+        return 1
+    regressions = compare(results, baseline["results"], options.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {options.threshold:.0%}.")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+from PyQt5.QtCore import QEventLoop, QTimer, pyqtBoundSignal
+from PyQt5.QtWidgets import QApplication
+
+from app.platform_backend import FakeBackend
+
+# The GUI tests run headless.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def backend(tmp_path) -> FakeBackend:
+    """A fake Windows with `%APPDATA%` in a temporary directory."""
+    return FakeBackend(str(tmp_path))
+
+
+@pytest.fixture(scope="session")
+def application() -> QApplication:
+    return QApplication.instance() or QApplication([])
+
+
+def wait_for(signal: pyqtBoundSignal, timeout_ms: int = 5000) -> bool:
+    """Run the event loop until a signal is emitted.
+
+    Returns:
+        bool: False if it timed out.
+    """
+    loop = QEventLoop()
+    emitted = []
+    signal.connect(lambda *_args: (emitted.append(True), loop.quit()))
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec_()
+    return bool(emitted)
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from app.alias_exchange import CONFLICT_OVERWRITE, CONFLICT_RENAME, CONFLICT_SKIP, plan_import, read_aliases
+from app.alias_formats import FORMATS
+from app.alias_index import ParseIssue
+
+EXISTING = {"ll": ["dir /b"], "gs": ["git status"], "gs_2": ["git status -s"]}
+IMPORTED = {"new": ["echo new"], "ll": ["dir /b"], "gs": ["git status --short"]}
+
+
+def test_skip_keeps_existing_aliases():
+    plan = plan_import(IMPORTED, EXISTING, CONFLICT_SKIP, [])
+    assert plan.added == {"new": ["echo new"]}
+    assert plan.overwritten == {}
+    assert plan.report.skipped == ["gs"]
+    assert plan.report.unchanged == ["ll"]
+
+
+def test_overwrite_replaces_conflicting_commands():
+    plan = plan_import(IMPORTED, EXISTING, CONFLICT_OVERWRITE, [])
+    assert plan.added == {"new": ["echo new"]}
+    assert plan.overwritten == {"gs": ["git status --short"]}
+    assert plan.report.overwritten == ["gs"]
+    assert plan.report.unchanged == ["ll"]
+
+
+def test_rename_picks_a_free_name():
+    imported = {**IMPORTED, "gs_3": ["echo taken by the import"]}
+    plan = plan_import(imported, EXISTING, CONFLICT_RENAME, [])
+    assert plan.added == {"new": ["echo new"], "gs_4": ["git status --short"], "gs_3": ["echo taken by the import"]}
+    assert plan.report.renamed == {"gs": "gs_4"}
+    assert plan.overwritten == {}
+
+
+def test_report_counts_every_outcome():
+    issue = ParseIssue("import.json", 3, "invalid alias name 'a b'")
+    plan = plan_import(IMPORTED, EXISTING, CONFLICT_SKIP, [issue])
+    assert plan.report.describe()[0] == "1 added, 0 overwritten, 0 renamed, 1 skipped, 1 unchanged, 1 problem(s)"
+
+
+@pytest.mark.parametrize("name", sorted(FORMATS))
+def test_formats_round_trip(name):
+    alias_format = FORMATS[name]
+    # Shells pass the arguments on after the last command, so the aliases to round trip do too.
+    aliases = {"ll": ["dir /b $*"], "gs": ["git status", "git diff $*"]}
+    file = io.StringIO()
+    alias_format.write(aliases.items(), file)
+    file.seek(0)
+    assert read_aliases(file, f"aliases.{name}", alias_format) == (aliases, [])
+
+
+def test_commands_with_line_breaks_are_not_imported():
+    file = io.StringIO('{"a": "echo hi\\r\\nDOSKEY evil=del /q *", "b": ["echo b", "echo\\u2028c"], "c": "echo c"}')
+    aliases, issues = read_aliases(file, "import.json", FORMATS["json"])
+    assert aliases == {"c": ["echo c"]}
+    assert [issue.message for issue in issues] == [
+        "alias 'a' has a command with a line break",
+        "alias 'b' has a command with a line break",
+    ]
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from app.alias_file import FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE, AliasFile
+from app.alias_groups import (
+    GROUP_MANIFEST_NAME,
+    LOAD_MACRO_NAME,
+    AliasGroup,
+    check_group_name,
+    group_loader,
+    load_groups,
+    save_groups,
+)
+
+
+@pytest.mark.parametrize("file_format", [FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE])
+def test_groups_round_trip(backend, file_format):
+    alias_file = AliasFile(file_format, backend=backend)
+    alias_file.set_groups([AliasGroup("git", autoload=True), AliasGroup("work")])
+    aliases = {"ll": ["dir $*"], "gs": ["git status"], "vpn": ["vpn connect $1"]}
+    alias_file.encode(aliases, {"gs": "git", "vpn": "work"})
+    with open(alias_file.paths.alias_cmd, encoding="utf-8") as file:
+        alias_cmd = file.read()
+    assert group_loader("git") in alias_cmd
+    assert group_loader("work") not in alias_cmd
+    index = alias_file.index()
+    assert index.read_all() == aliases
+    assert LOAD_MACRO_NAME not in index.entries
+    assert alias_file.memberships(index) == {"gs": "git", "vpn": "work"}
+
+
+def test_moving_an_alias_keeps_its_group_by_default(backend):
+    alias_file = AliasFile(backend=backend)
+    alias_file.set_groups([AliasGroup("git")])
+    alias_file.encode({"gs": ["git status"], "ll": ["dir"]}, {"gs": "git"})
+    alias_file.encode({"gs": ["git status -s"], "ll": ["dir"]})
+    index = alias_file.index()
+    assert alias_file.memberships(index) == {"gs": "git"}
+    assert index.get("gs") == ["git status -s"]
+
+
+def test_removed_groups_lose_their_macro_file(backend):
+    alias_file = AliasFile(backend=backend)
+    alias_file.set_groups([AliasGroup("git"), AliasGroup("work")])
+    paths = alias_file.group_paths()
+    alias_file.set_groups([AliasGroup("work")])
+    assert [os.path.exists(path) for path in paths] == [False, True]
+    assert load_groups(alias_file.paths.groups) == [AliasGroup("work")]
+
+
+@pytest.mark.parametrize("name", ["", "has space", "a/b", "core", "GIT"])
+def test_invalid_or_taken_group_names_are_rejected(name):
+    with pytest.raises(ValueError):
+        check_group_name(name, [AliasGroup("git")])
+
+
+def test_manifest_round_trip(tmp_path):
+    groups = [AliasGroup("work", autoload=True), AliasGroup("git")]
+    save_groups(str(tmp_path), groups)
+    assert load_groups(str(tmp_path)) == groups
+
+
+@pytest.mark.parametrize("text", ["not json", '{"groups": [{"name": "a b"}]}', '{"groups": [{}]}', "[]"])
+def test_an_invalid_manifest_means_no_groups(tmp_path, text):
+    (tmp_path / GROUP_MANIFEST_NAME).write_text(text, encoding="utf-8")
+    assert load_groups(str(tmp_path)) == []
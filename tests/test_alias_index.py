@@ -0,0 +1,82 @@
+import pytest
+
+from app.alias_document import AliasDocument
+from app.alias_file import FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE, AliasFile
+from app.alias_index import AliasIndex, escape_batch, unescape_batch
+
+ALIASES = {
+    "ll": ["dir /b"],
+    "gs": ["git status", "git diff --stat"],
+    "piped": ['findstr "a|b" $* | sort'],
+    "empty": [""],
+}
+
+
+@pytest.mark.parametrize("file_format", [FILE_FORMAT_INLINE, FILE_FORMAT_MACROFILE])
+def test_encode_then_index_round_trips(backend, file_format):
+    alias_file = AliasFile(file_format, backend=backend)
+    alias_file.encode(ALIASES)
+    index = alias_file.index()
+    assert index.names() == list(ALIASES)
+    assert index.read_all() == ALIASES
+    assert index.get("gs") == ALIASES["gs"]
+    assert not index.issues
+
+
+def test_document_keeps_lines_it_does_not_manage(tmp_path):
+    path = str(tmp_path / "alias.cmd")
+    text = "@echo off\r\nREM my aliases\r\nDOSKEY ll=dir /b\r\nset EDITOR=notepad\r\nDOSKEY gs=git status\r\n"
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(text)
+    document = AliasDocument(path, macrofile=False)
+    assert document.render() == text
+    assert not document.update({"ll": ["dir /b"], "gs": ["git status"]})
+    assert document.update({"gs": ["git status"], "new": ["echo new"]})
+    document.save()
+    with open(path, encoding="utf-8", newline="") as file:
+        assert file.read() == (
+            "@echo off\r\nREM my aliases\r\nDOSKEY gs=git status\r\nset EDITOR=notepad\r\nDOSKEY new=echo new\r\n"
+        )
+
+
+def test_index_reports_issues_and_last_definition_wins(tmp_path):
+    path = str(tmp_path / "macros.doskey")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("a=echo 1\nmalformed\na=echo 2\n")
+    index = AliasIndex(str(tmp_path / "missing.cmd"), macrofiles=[path])
+    assert index.read_all() == {"a": ["echo 2"]}
+    messages = [issue.message for issue in index.issues]
+    assert messages[0] == "file not found"
+    assert messages[1] == "malformed definition: malformed"
+    assert messages[2].startswith("duplicate alias 'a'")
+
+
+def test_index_reuses_unchanged_files(tmp_path):
+    core = str(tmp_path / "macros.doskey")
+    group = str(tmp_path / "group.doskey")
+    with open(core, "w", encoding="utf-8") as file:
+        file.write("a=echo a\nb=echo b\n")
+    with open(group, "w", encoding="utf-8") as file:
+        file.write("c=echo c\n")
+    alias_cmd = str(tmp_path / "alias.cmd")
+    with open(alias_cmd, "w", encoding="utf-8") as file:
+        file.write(f'@echo off\nDOSKEY /MACROFILE="{core}"\nDOSKEY d=echo d\n')
+    previous = AliasIndex(alias_cmd, macrofiles=[group])
+    with open(group, "w", encoding="utf-8") as file:
+        file.write("b=echo shadowed\nc=echo changed\n")
+    index = AliasIndex(alias_cmd, macrofiles=[group], previous=previous, changed=[group])
+    fresh = AliasIndex(alias_cmd, macrofiles=[group])
+    assert index.entries == fresh.entries
+    assert index.names() == fresh.names()
+    assert index.names_in(group) == ["b", "c"]
+    assert index.read_all() == {"a": ["echo a"], "b": ["echo shadowed"], "c": ["echo changed"], "d": ["echo d"]}
+
+
+@pytest.mark.parametrize(
+    "body",
+    ['echo "a|b" ^& more', "echo 100%% done", "type x ^> y", 'findstr "^" $*'],
+)
+def test_batch_escapes_round_trip(body):
+    unescaped, expanded = unescape_batch(body)
+    assert not expanded
+    assert escape_batch(unescaped) == body
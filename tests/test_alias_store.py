@@ -0,0 +1,65 @@
+import pytest
+
+from app.alias_groups import CORE_GROUP
+from app.alias_index import AliasIndex, StaleIndexError
+from app.alias_store import AliasStore
+
+
+def write_aliases(path, count: int, extra: str = ""):
+    path.write_text(extra + "".join(f"a{number}=echo number{number}\n" for number in range(count)), encoding="utf-8")
+
+
+def test_edits_keep_rows_and_groups_consistent():
+    store = AliasStore({"a": ["echo a"], "b": ["echo b", "echo c"], "c": ["echo c"]})
+    store.set_groups(["git"])
+    store.move_rows(0, 1, 2, group="git")
+    assert store.names() == ["b", "c", "a"]
+    assert (store.group("a"), store.group_range("git")) == ("git", (2, 3))
+    store.rename("b", "B")
+    store.insert(1, "d", ["echo d"])
+    assert [store.row(name) for name in ["B", "d", "c", "a"]] == [0, 1, 2, 3]
+    assert store.record_at(0).command(1) == "echo c"
+    store.remove("d")
+    snapshot = store.snapshot()
+    assert dict(snapshot) == {"B": ["echo b", "echo c"], "c": ["echo c"], "a": ["echo a"]}
+    assert snapshot.groups == {"a": "git"}
+
+
+def test_set_order_adds_and_removes():
+    store = AliasStore({"a": ["echo a"], "b": ["echo b"]})
+    store.set_order(["c", "a"], added={"c": ["echo c"]})
+    assert list(store.items()) == [("c", ["echo c"]), ("a", ["echo a"])]
+    assert store.group("c") == CORE_GROUP
+
+
+def test_loads_from_the_index_on_demand(tmp_path):
+    path = tmp_path / "macros.doskey"
+    write_aliases(path, 3)
+    store = AliasStore()
+    store.reset(AliasIndex(str(tmp_path / "missing.cmd"), macrofiles=[str(path)]))
+    assert store.record_at(1).text is None
+    assert store.text("a1") == "echo number1"
+    assert store.record_at(2).text is None
+
+
+def test_indexes_again_if_lines_moved(tmp_path):
+    path = tmp_path / "macros.doskey"
+    write_aliases(path, 50)
+    index = AliasIndex(str(tmp_path / "missing.cmd"), macrofiles=[str(path)])
+    store = AliasStore()
+    store.reset(index)
+    write_aliases(path, 50, extra="REM added by a script\n")
+    with pytest.raises(StaleIndexError):
+        index.read(["a40"])
+    assert store.text("a40") == "echo number40"
+    assert store["a10"] == ["echo number10"]
+
+
+@pytest.mark.parametrize("new_text", ["a0=echo number0 and more\na1=x\n", "a0=echo\na1=echo number1\n"])
+def test_a_line_that_changed_length_is_stale(tmp_path, new_text):
+    path = tmp_path / "macros.doskey"
+    write_aliases(path, 2)
+    index = AliasIndex(str(tmp_path / "missing.cmd"), macrofiles=[str(path)])
+    path.write_text(new_text, encoding="utf-8")
+    with pytest.raises(StaleIndexError):
+        index.get("a0")
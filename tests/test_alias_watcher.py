@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from app.alias_file import AliasFile
+from app.alias_store import AliasSnapshot
+from app.alias_watcher import AliasWatcher, ExternalChanges
+from app.main_window import MainWindow
+
+
+@pytest.fixture
+def alias_file(backend) -> AliasFile:
+    return AliasFile(backend=backend)
+
+
+def start_watcher(alias_file: AliasFile) -> tuple[AliasWatcher, list[ExternalChanges]]:
+    watcher = AliasWatcher(
+        alias_file.paths.alias_cmd, [alias_file.paths.macrofile], lambda: False, alias_file.backend.expand
+    )
+    changes: list[ExternalChanges] = []
+    watcher.changed_externally.connect(changes.append)
+    watcher.start()
+    return watcher, changes
+
+
+def append(path: str, text: str):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(text)
+
+
+def test_reports_aliases_added_changed_and_removed(application, alias_file):
+    alias_file.encode({"a": ["echo a"], "b": ["echo b"], "c": ["echo c"]})
+    watcher, changes = start_watcher(alias_file)
+    with open(alias_file.paths.alias_cmd, encoding="utf-8") as file:
+        text = file.read()
+    with open(alias_file.paths.alias_cmd, "w", encoding="utf-8") as file:
+        file.write(text.replace("DOSKEY a=echo a\n", "").replace("echo b", "echo B") + "DOSKEY d=echo d\n")
+    watcher.check()
+    assert [(change.added, change.changed, change.removed) for change in changes] == [
+        ({"d": ["echo d"]}, {"b": ["echo B"]}, ["a"])
+    ]
+
+
+def test_own_writes_are_not_reported(application, alias_file):
+    with open(alias_file.paths.alias_cmd, "w", encoding="utf-8") as file:
+        file.write("@echo off\nDOSKEY a=x$Ty\nDOSKEY b=echo b\n")
+    watcher, changes = start_watcher(alias_file)
+    snapshot = AliasSnapshot({"a": "x\ny", "b": "echo B"})
+    alias_file.encode(snapshot)
+    watcher.acknowledge_written(snapshot)
+    watcher.check()
+    assert changes == []
+    # The alias formatted by hand was kept as it was, and is still the same as what was written.
+    append(alias_file.paths.alias_cmd, "DOSKEY c=echo c\n")
+    watcher.check()
+    assert [(change.added, change.changed, change.removed) for change in changes] == [({"c": ["echo c"]}, {}, [])]
+
+
+def test_store_follows_lines_that_moved(application, backend, alias_file):
+    alias_file.encode({f"a{number}": [f"echo number{number}"] for number in range(50)})
+    window = MainWindow(backend=backend)
+    window._load_aliases()
+    with open(alias_file.paths.alias_cmd, encoding="utf-8") as file:
+        text = file.read()
+    with open(alias_file.paths.alias_cmd, "w", encoding="utf-8") as file:
+        file.write(text.replace("DOSKEY a10=", "REM added by a script\nDOSKEY a10="))
+    window.alias_watcher.check()
+    assert window.aliases.text("a40") == "echo number40"
+    assert window.save_scheduler.flush()
+    window.close()
+    assert os.path.getsize(alias_file.paths.alias_cmd) == len(text) + len("REM added by a script\n")
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+import app.backup_store
+from app.alias_file import FILE_FORMAT_MACROFILE, AliasFile
+from app.backup_store import DEFAULT_KEEP_LAST, RetentionPolicy
+from app.settings import Settings
+
+
+@pytest.fixture
+def alias_file(backend) -> AliasFile:
+    alias_file = AliasFile(FILE_FORMAT_MACROFILE, backend=backend)
+    alias_file.encode({"a": ["echo a"], "b": ["echo b"]})
+    return alias_file
+
+
+def test_restore_brings_back_the_aliases(alias_file):
+    first, created = alias_file.backup()
+    assert created
+    assert alias_file.backup() == (first, False)
+    alias_file.encode({"a": ["echo A"], "c": ["echo c"]})
+    diff = alias_file.backups.diff(first, None)
+    assert (diff.added, diff.removed, diff.changed) == (["c"], ["b"], ["a"])
+    previous = alias_file.restore(first)
+    assert alias_file.decode() == {"a": ["echo a"], "b": ["echo b"]}
+    assert alias_file.backups.aliases(previous) == {"a": ["echo A"], "c": ["echo c"]}
+
+
+def test_the_new_backup_is_never_pruned(alias_file):
+    for number in range(3):
+        alias_file.encode({"a": [f"echo {number}"]})
+        snapshot, _ = alias_file.backup(retention=RetentionPolicy(0, 0))
+    assert alias_file.backups.snapshots() == [snapshot]
+    assert alias_file.backups.aliases(snapshot) == {"a": ["echo 2"]}
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"), [(0, 1), (-5, 1), (3, 3), ("10", DEFAULT_KEEP_LAST), (True, DEFAULT_KEEP_LAST)]
+)
+def test_retention_settings_keep_at_least_one(tmp_path, value, expected):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"backup_keep_last": value, "backup_keep_days": value}), encoding="utf-8")
+    settings = Settings(path=str(path))
+    settings.load()
+    assert settings.backup_retention().keep_last == expected
+    assert settings.backup_retention().keep_days >= 1
+
+
+def test_a_corrupt_manifest_is_moved_aside(alias_file):
+    first, _ = alias_file.backup()
+    manifest_path = os.path.join(alias_file.backups.directory, "manifest.json")
+    with open(manifest_path, "a", encoding="utf-8") as file:
+        file.write("garbage")
+    assert alias_file.backups.snapshots() == []
+    alias_file.encode({"z": ["echo z"]})
+    second, _ = alias_file.backup(retention=RetentionPolicy(1, 1))
+    assert alias_file.backups.snapshots() == [second]
+    corrupt = [name for name in os.listdir(alias_file.backups.directory) if name.endswith(".corrupt")]
+    assert len(corrupt) == 1
+    # The files of the backups in it are kept, so it can be repaired.
+    assert alias_file.backups.aliases(first) == {"a": ["echo a"], "b": ["echo b"]}
+
+
+def test_a_failed_restore_lists_the_restored_files(alias_file, monkeypatch):
+    first, _ = alias_file.backup()
+    alias_file.encode({"c": ["echo c"]})
+    written = []
+
+    def atomic_write(path: str, data: bytes):
+        if path == alias_file.paths.alias_cmd:
+            raise PermissionError("access denied")
+        written.append(os.path.basename(path))
+        original_atomic_write(path, data)
+
+    original_atomic_write = app.backup_store.atomic_write
+    monkeypatch.setattr(app.backup_store, "atomic_write", atomic_write)
+    with pytest.raises(OSError, match="access denied") as error:
+        alias_file.restore(first)
+    macrofile_name = os.path.basename(alias_file.paths.macrofile)
+    assert f"Restored {macrofile_name} before the error" in str(error.value)
+    assert written[-1] == macrofile_name
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+from PyQt5.QtWidgets import QDialogButtonBox
+
+from app.alias_groups import CORE_GROUP
+from app.bulk_edit import delete_operations, move_operations, rename_operations, replace_operations
+from app.edit_journal import DELETE, EDIT, MOVE, RENAME, Operation
+from app.pattern_dialog import PatternDialog
+
+ALIASES = {"ga": ["git add $*"], "gs": ["git status"], "ll": ["dir /b"]}
+
+
+def core_group(_name: str) -> str:
+    return CORE_GROUP
+
+
+def test_replace_changes_only_matching_commands():
+    step = replace_operations(ALIASES, list(ALIASES), r"git (\w+)", r"git \1 -v", regex=True)
+    assert step == [
+        Operation(EDIT, "ga", commands=["git add -v $*"], previous=["git add $*"]),
+        Operation(EDIT, "gs", commands=["git status -v"], previous=["git status"]),
+    ]
+    assert replace_operations(ALIASES, ["ll"], r"\1", "x", regex=False) == []
+
+
+def test_replace_rejects_line_breaks():
+    with pytest.raises(ValueError, match="line break"):
+        replace_operations(ALIASES, list(ALIASES), "git", "echo\ngit", regex=False)
+    with pytest.raises(ValueError, match="line break"):
+        replace_operations(ALIASES, list(ALIASES), " ", r"\n", regex=True)
+    with pytest.raises(re.error):
+        replace_operations(ALIASES, list(ALIASES), "(", "", regex=True)
+
+
+def test_rename_rejects_invalid_and_taken_names():
+    assert rename_operations(ALIASES, ["ga", "gs"], "g", "git_", regex=False) == [
+        Operation(RENAME, "ga", new_name="git_a"),
+        Operation(RENAME, "gs", new_name="git_s"),
+    ]
+    with pytest.raises(ValueError, match="not a valid alias name"):
+        rename_operations(ALIASES, ["ga"], "g", "g ", regex=False)
+    with pytest.raises(ValueError, match="already exists"):
+        rename_operations(ALIASES, ["ga"], "a", "s", regex=False)
+
+
+def test_delete_undoes_from_the_top():
+    step = delete_operations(list(ALIASES), ["ll", "ga"], ALIASES, core_group)
+    assert [(operation.kind, operation.name, operation.position) for operation in step] == [
+        (DELETE, "ll", 2),
+        (DELETE, "ga", 0),
+    ]
+
+
+def test_move_keeps_the_order_of_the_moved_aliases():
+    step = move_operations(list(ALIASES), ["ll", "ga"], 0, CORE_GROUP, core_group)
+    assert [(operation.kind, operation.name, operation.position) for operation in step] == [
+        (MOVE, "ga", 0),
+        (MOVE, "ll", 1),
+    ]
+    assert move_operations(list(ALIASES), ["ga"], 0, CORE_GROUP, core_group) == []
+
+
+def test_pattern_dialog_only_accepts_previewed_input(application):
+    def preview(dialog: PatternDialog) -> tuple[str, bool]:
+        try:
+            re.compile(dialog.find_text())
+        except re.error as error:
+            return f"Invalid pattern: {error}", False
+        return "1 alias(es) will change.", True
+
+    dialog = PatternDialog("Replace", 0, preview)
+    ok_button = dialog.buttons.button(QDialogButtonBox.StandardButton.Ok)
+    dialog.find_edit.setText("(")
+    assert not ok_button.isEnabled()
+    dialog.buttons.accepted.emit()
+    assert dialog.result() == 0
+    assert dialog.preview_label.text().startswith("Invalid pattern")
+    dialog.find_edit.setText("a")
+    dialog.buttons.accepted.emit()
+    assert dialog.result() == 1
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from app.alias_file import AliasFile
+from app.cli import main
+from app.platform_backend import FakeBackend
+
+
+@pytest.fixture
+def appdata(tmp_path, monkeypatch) -> str:
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    return str(tmp_path)
+
+
+def aliases(appdata: str) -> dict[str, list[str]]:
+    return AliasFile(backend=FakeBackend(appdata, persistent=True)).decode()
+
+
+def run_batch(appdata: str, tmp_path, operations: list[dict]) -> int:
+    path = tmp_path / "operations.jsonl"
+    path.write_text("".join(json.dumps(operation) + "\n" for operation in operations), encoding="utf-8")
+    return main(["batch", str(path)])
+
+
+def test_add_rename_move_and_remove(appdata, capsys):
+    assert main(["add", "ll=dir /b", "gs=git status $T git diff"]) == 0
+    assert main(["mv", "gs", "0"]) == 0
+    assert main(["rename", "ll", "l"]) == 0
+    assert aliases(appdata) == {"gs": ["git status", "git diff"], "l": ["dir /b"]}
+    assert main(["rm", "l"]) == 0
+    assert aliases(appdata) == {"gs": ["git status", "git diff"]}
+    assert main(["add", "gs=echo again"]) == 1
+    assert "already exists" in capsys.readouterr().err
+
+
+def test_batch_applies_every_operation(appdata, tmp_path):
+    operations = [
+        {"op": "add", "name": "a", "commands": "echo a"},
+        {"op": "add", "name": "b", "commands": ["echo b", "echo c"]},
+        {"op": "rename", "name": "a", "new_name": "c"},
+        {"op": "mv", "name": "b", "position": 0},
+    ]
+    assert run_batch(appdata, tmp_path, operations) == 0
+    assert list(aliases(appdata).items()) == [("b", ["echo b", "echo c"]), ("c", ["echo a"])]
+
+
+@pytest.mark.parametrize("commands", [[1, 2], [], "echo a\r\nDOSKEY z=bad", ["echo a", "echo\nb"], None])
+def test_batch_rejects_invalid_commands(appdata, tmp_path, capsys, commands):
+    operations = [{"op": "add", "name": "ok", "commands": "echo ok"}, {"op": "add", "name": "x", "commands": commands}]
+    assert run_batch(appdata, tmp_path, operations) == 1
+    assert "operations.jsonl:2: invalid commands" in capsys.readouterr().err
+    assert aliases(appdata) == {}
@@ -0,0 +1,83 @@
+import pytest
+
+from app.edit_journal import ADD, COMPACT_THRESHOLD, EDIT, MOVE, EditJournal, Operation, apply_to_order, invert_step
+
+
+@pytest.fixture
+def alias_path(tmp_path) -> str:
+    path = tmp_path / "alias.cmd"
+    path.write_text("@echo off\n", encoding="utf-8")
+    return str(path)
+
+
+def open_journal(tmp_path, alias_path: str) -> EditJournal:
+    journal = EditJournal(str(tmp_path / "journal.jsonl"), lambda: [alias_path])
+    journal.load()
+    return journal
+
+
+def edit(name: str, number: int) -> list[Operation]:
+    return [Operation(EDIT, name, commands=[f"echo {number}"], previous=[f"echo {number - 1}"])]
+
+
+def test_replays_changes_after_the_last_checkpoint(tmp_path, alias_path):
+    journal = open_journal(tmp_path, alias_path)
+    journal.record([Operation(ADD, "a", position=0, commands=["echo 0"])])
+    journal.checkpoint(journal.position())
+    journal.record(edit("a", 1))
+    journal.record(edit("a", 2))
+    journal.undo()
+    journal.flush()
+
+    reopened = EditJournal(str(tmp_path / "journal.jsonl"), lambda: [alias_path])
+    assert reopened.load() == [edit("a", 1), edit("a", 2), invert_step(edit("a", 2))]
+    assert reopened.peek_undo() == edit("a", 1)
+    assert reopened.peek_redo() == edit("a", 2)
+
+
+def test_drops_changes_if_the_alias_file_changed(tmp_path, alias_path):
+    journal = open_journal(tmp_path, alias_path)
+    journal.checkpoint(journal.position())
+    journal.record(edit("a", 1))
+    journal.flush()
+    with open(alias_path, "a", encoding="utf-8") as file:
+        file.write("DOSKEY a=echo edited elsewhere\n")
+
+    reopened = EditJournal(str(tmp_path / "journal.jsonl"), lambda: [alias_path])
+    assert reopened.load() == []
+    assert reopened.can_undo()
+
+
+def test_ignores_a_line_cut_short(tmp_path, alias_path):
+    journal = open_journal(tmp_path, alias_path)
+    journal.checkpoint(journal.position())
+    journal.record(edit("a", 1))
+    journal.flush()
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as file:
+        file.write('{"do": [{"kind": "edit"')
+
+    reopened = EditJournal(str(tmp_path / "journal.jsonl"), lambda: [alias_path])
+    assert reopened.load() == [edit("a", 1)]
+
+
+def test_compacts_once_everything_is_written(tmp_path, alias_path):
+    journal = open_journal(tmp_path, alias_path)
+    for number in range(COMPACT_THRESHOLD + 1):
+        journal.record(edit("a", number))
+    journal.undo()
+    journal.checkpoint(journal.position())
+    journal.record(edit("b", 1))
+    journal.flush()
+
+    lines = (tmp_path / "journal.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) < COMPACT_THRESHOLD
+    reopened = EditJournal(str(tmp_path / "journal.jsonl"), lambda: [alias_path])
+    assert reopened.load() == [edit("b", 1)]
+    assert reopened.peek_undo() == edit("b", 1)
+    assert not reopened.can_redo()
+
+
+def test_moves_are_applied_together():
+    step = [Operation(MOVE, "c", position=0, previous=2), Operation(MOVE, "b", position=1, previous=1)]
+    assert apply_to_order(["a", "b", "c"], step) == ["c", "b", "a"]
+    assert apply_to_order(["a", "b"], step) is None
@@ -0,0 +1,80 @@
+import pytest
+
+from app.alias_linter import LINT_BATCH_SIZE, AliasLinter, LintSummary
+from app.macro_lint import ERROR, MAX_LINE_LENGTH, WARNING, LintCache, lint, worst_severity
+from tests.conftest import wait_for
+
+
+def messages(diagnostics) -> list[tuple[str, int, int]]:
+    return [(diagnostic.severity, diagnostic.line, diagnostic.column) for diagnostic in diagnostics]
+
+
+@pytest.mark.parametrize("commands", [["dir $*"], ["git log $1 $2"], ['echo "a | b"'], ["echo a ^| b $B more"]])
+def test_valid_aliases_have_no_diagnostics(commands):
+    assert lint("alias", commands, inline=True) == ()
+
+
+def test_operators_are_errors_only_inline():
+    assert messages(lint("a", ["dir | more"], inline=True)) == [(ERROR, 0, 4)]
+    assert messages(lint("a", ["dir | more"], inline=False)) == [(WARNING, 0, 4)]
+
+
+@pytest.mark.parametrize(
+    "command, column",
+    [("echo %1", 5), ("echo $", 5), ("echo $x", 5), ("echo $10", 5), ("cd $T dir", 3)],
+)
+def test_suspicious_codes_are_warnings(command, column):
+    assert [(diagnostic.severity, diagnostic.column) for diagnostic in lint("a", [command], inline=False)][:1] == [
+        (WARNING, column)
+    ]
+
+
+def test_skipped_arguments_and_names():
+    assert lint("a", ["echo $2"], inline=False)[0].message.startswith("$2 is used but $1 isn't")
+    assert messages(lint("", ["dir"], inline=False)) == [(ERROR, -1, 0)]
+    assert messages(lint("a b", ["dir"], inline=False)) == [(ERROR, -1, 0)]
+    assert messages(lint("a|b", ["dir"], inline=False)) == [(WARNING, -1, 1)]
+
+
+def test_long_aliases_only_fail_inline():
+    commands = ["echo " + "x" * (MAX_LINE_LENGTH // 2)] * 2
+    assert lint("a", commands, inline=False) == ()
+    assert messages(lint("a", commands, inline=True)) == [(ERROR, -1, 0)]
+    assert worst_severity(lint("a", ["x" * (MAX_LINE_LENGTH + 1)], inline=False)) == ERROR
+
+
+def test_worst_severity():
+    assert worst_severity([]) is None
+    assert worst_severity(lint("a", ["echo %1"], inline=True)) == WARNING
+    assert worst_severity(lint("a", ["echo %1 | more"], inline=True)) == ERROR
+
+
+def test_cache_keys_on_the_format():
+    cache = LintCache(max_results=2)
+    assert cache.lint("a", ["dir | more"], inline=True)[0].severity == ERROR
+    assert cache.lint("a", ["dir | more"], inline=False)[0].severity == WARNING
+    assert cache.lint("a", ["dir | more"], inline=True) is cache.lint("a", ["dir | more"], inline=True)
+    cache.lint("b", ["dir"], inline=True)
+    assert cache.lint("a", ["dir | more"], inline=True)[0].severity == ERROR
+
+
+def test_linter_summarises_every_batch(application):
+    linter = AliasLinter(inline=True)
+    aliases = {f"a{number}": ["dir"] for number in range(LINT_BATCH_SIZE * 2)}
+    aliases.update({"pipe": ["dir | more"], "percent": ["echo %1"]})
+    summaries = []
+    linter.all_linted.connect(summaries.append)
+    linter.lint_all(aliases)
+    assert summaries or wait_for(linter.all_linted)
+    assert summaries == [LintSummary(len(aliases), 1, 1)]
+    linter.shutdown()
+
+
+def test_linter_reports_edits_with_their_tag(application):
+    linter = AliasLinter(inline=False)
+    results = []
+    linter.edit_linted.connect(lambda tag, diagnostics: results.append((tag, worst_severity(diagnostics))))
+    linter.lint_edit("edit", "a", ["dir | more"])
+    assert results or wait_for(linter.edit_linted)
+    assert results == [("edit", WARNING)]
+    linter.shutdown()
@@ -0,0 +1,74 @@
+import threading
+
+from PyQt5.QtTest import QTest
+
+from app.alias_file import AliasFile
+from app.alias_store import AliasSnapshot
+from app.main_window import MainWindow
+from app.save_scheduler import SaveScheduler
+from tests.conftest import wait_for
+
+REQUESTS = 50
+
+
+def test_a_burst_of_requests_is_written_once(application, backend):
+    scheduler = SaveScheduler(AliasFile(backend=backend), lambda: AliasSnapshot({}), delay_ms=50, dry_run=True)
+    for _ in range(REQUESTS):
+        scheduler.schedule()
+    assert wait_for(scheduler.saved)
+    assert scheduler.write_count == 1
+
+
+def test_written_carries_the_snapshot(application, backend):
+    alias_file = AliasFile(backend=backend)
+    snapshot = AliasSnapshot({"ll": "dir /b"})
+    scheduler = SaveScheduler(alias_file, lambda: snapshot, delay_ms=0)
+    written = []
+    scheduler.written.connect(written.append)
+    scheduler.schedule()
+    assert wait_for(scheduler.saved)
+    assert written == [snapshot]
+    assert alias_file.decode() == {"ll": ["dir /b"]}
+
+
+def test_reordering_in_the_window_is_written_once(application, backend):
+    AliasFile(backend=backend).encode({f"a{number}": [f"echo {number}"] for number in range(REQUESTS)})
+    window = MainWindow(backend=backend)
+    window._load_aliases()
+    window.save_scheduler.dry_run = True
+    window.alias_list.select("a0")
+    for position in range(1, REQUESTS):
+        window._on_move_selection(position)
+    # Reorders wait longer for more of them before writing, so write them now.
+    assert window.save_scheduler.write_count == 0
+    assert window.save_scheduler.flush()
+    assert window.save_scheduler.write_count == 1
+    assert window.alias_list.get_all_in_order()[-1] == "a0"
+    window.close()
+
+
+class BlockingAliasFile:
+    """Stands in for the alias file, holding each write until it is released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def encode(self, _aliases: AliasSnapshot, _groups: dict[str, str]):
+        assert self.release.wait(5)
+
+
+def test_the_next_snapshot_waits_for_the_write_in_flight(application):
+    alias_file = BlockingAliasFile()
+    snapshots = []
+    scheduler = SaveScheduler(alias_file, lambda: snapshots.append(True) or AliasSnapshot({}), delay_ms=0)
+    scheduler.schedule()
+    QTest.qWait(50)
+    scheduler.schedule()
+    QTest.qWait(50)
+    # Changes made by other programs are merged before the snapshot, which can't be done while the files are written.
+    assert len(snapshots) == 1
+    assert not scheduler.is_idle()
+    alias_file.release.set()
+    assert wait_for(scheduler.saved)
+    assert len(snapshots) == 2
+    assert scheduler.write_count == 2